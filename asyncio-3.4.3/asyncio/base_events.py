@@ -19,9 +19,9 @@ to modify the meaning of the API call itself.
 
 import collections
 import concurrent.futures      # 注意
-import heapq                   # 注意
 import inspect                 # 注意
 import logging
+import math
 import os
 import socket                  # 注意
 import subprocess
@@ -37,7 +37,9 @@ import warnings
 from . import coroutines   # 协程
 from . import events       # 事件
 from . import futures
+from . import protocols
 from . import tasks
+from . import timers       # 定时器存储
 from .coroutines import coroutine
 from .log import logger
 
@@ -51,13 +53,8 @@ __all__ = ['BaseEventLoop']
 #
 _MAX_WORKERS = 5
 
-# Minimum number of _scheduled timer handles before cleanup of
-# cancelled handles is performed.
-_MIN_SCHEDULED_TIMER_HANDLES = 100
-
-# Minimum fraction of _scheduled timer handles that are cancelled
-# before cleanup of cancelled handles is performed.
-_MIN_CANCELLED_TIMER_HANDLES_FRACTION = 0.5
+# Size of the blocks read from the file by the sendfile() fallback.
+_SENDFILE_FALLBACK_READBUFFER_SIZE = 1024 * 256
 
 
 def _format_handle(handle):
@@ -78,10 +75,49 @@ def _format_pipe(fd):
         return repr(fd)
 
 
+def _set_reuseport(sock):
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except OSError:
+        raise ValueError('reuse_port not supported by socket module, '
+                         'SO_REUSEPORT defined but not implemented.')
+
+
 class _StopError(BaseException):
     """Raised to stop the event loop."""
 
 
+# Number of buckets of the ready queue depth histogram: bucket i counts
+# the iterations which had from 2**(i-1) to 2**i-1 ready callbacks, the
+# last bucket also counts the deeper queues.
+_READY_HISTOGRAM_SIZE = 16
+
+
+#
+# 事件循环统计:
+#   - 每次迭代只做几次加法, 生产环境常开
+#   - 其他线程可以通过 get_stats() 读取
+#
+class _LoopStats:
+    """Counters updated by BaseEventLoop._run_once()."""
+
+    __slots__ = ('iterations', 'callbacks', 'select_time', 'callback_time',
+                 'ready_histogram', 'timer_lag', 'timer_lag_max',
+                 'timer_lag_total', 'timer_lag_count', 'budget_exhausted')
+
+    def __init__(self):
+        self.iterations = 0
+        self.callbacks = 0
+        self.select_time = 0.0
+        self.callback_time = 0.0
+        self.ready_histogram = [0] * _READY_HISTOGRAM_SIZE
+        self.timer_lag = 0.0
+        self.timer_lag_max = 0.0
+        self.timer_lag_total = 0.0
+        self.timer_lag_count = 0
+        self.budget_exhausted = 0
+
+
 #
 # 检查地址:
 #
@@ -214,6 +250,83 @@ class Server(events.AbstractServer):
         yield from waiter            # 异步返回
 
 
+#
+# sendfile() 回退实现使用的临时协议:
+#   - 接管传输层的写流控 (pause_writing/resume_writing)
+#   - 其他回调转发给原协议
+#
+class _SendfileFallbackProtocol(protocols.Protocol):
+    """Protocol set on a transport by the sendfile() fallback.
+
+    It turns the flow control of the transport into a future which
+    drain() waits on, and forwards everything else to the protocol of
+    the transport.  restore() sets the original protocol back.
+    """
+
+    def __init__(self, transp):
+        self._transport = transp
+        self._proto = transp.get_protocol()
+        self._should_resume_writing = transp._protocol_paused
+        self._closed = False
+        if self._should_resume_writing:
+            self._write_ready_fut = futures.Future(loop=transp._loop)
+        else:
+            self._write_ready_fut = None
+        transp.set_protocol(self)
+
+    @coroutine
+    def drain(self):
+        if self._closed:
+            raise ConnectionError("Connection closed by peer")
+        fut = self._write_ready_fut
+        if fut is not None:
+            yield from fut
+
+    def connection_made(self, transport):
+        raise RuntimeError("Invalid state: "
+                           "connection should have been established already.")
+
+    def connection_lost(self, exc):
+        self._closed = True
+        if self._write_ready_fut is not None:
+            if exc is None:
+                self._write_ready_fut.set_exception(
+                    ConnectionError("Connection is closed by peer"))
+            else:
+                self._write_ready_fut.set_exception(exc)
+            self._write_ready_fut = None
+        self._proto.connection_lost(exc)
+
+    def pause_writing(self):
+        if self._write_ready_fut is None:
+            self._write_ready_fut = futures.Future(
+                loop=self._transport._loop)
+
+    def resume_writing(self):
+        if self._write_ready_fut is not None:
+            self._write_ready_fut.set_result(None)
+            self._write_ready_fut = None
+
+    def data_received(self, data):
+        if isinstance(self._proto, protocols.BufferedProtocol):
+            protocols._feed_data_to_buffered_proto(self._proto, data)
+        else:
+            self._proto.data_received(data)
+
+    def eof_received(self):
+        return self._proto.eof_received()
+
+    def restore(self):
+        self._transport.set_protocol(self._proto)
+        if self._write_ready_fut is not None:
+            # Still paused: the protocol will get resume_writing().
+            self._write_ready_fut.cancel()
+            if not self._should_resume_writing:
+                self._proto.pause_writing()
+        elif self._should_resume_writing:
+            self._proto.resume_writing()
+
+
 #########################################
 #             基类: 事件循环
 #
@@ -223,11 +336,11 @@ class Server(events.AbstractServer):
 class BaseEventLoop(events.AbstractEventLoop):
 
     def __init__(self):
-        self._timer_cancelled_count = 0
         self._closed = False
         self._ready = collections.deque()
-        self._scheduled = []
+        self._scheduled = timers.TimerHeap()    # 定时器存储, 默认: 堆
         self._default_executor = None
+        self._ssl_session_cache = None
         self._internal_fds = 0
         # Identifier of the thread running the event loop, or None if the
         # event loop is not running
@@ -240,6 +353,17 @@ class BaseEventLoop(events.AbstractEventLoop):
         # exceed this duration in seconds, the slow callback/task is logged.
         self.slow_callback_duration = 0.1
         self._current_handle = None
+        # Default slack of call_at() and call_later(), see set_timer_slack().
+        self._timer_slack = 0
+        self._stats = _LoopStats()
+        # Per-iteration callback budget, see set_callback_budget().
+        self._callback_budget_count = None
+        self._callback_budget_time = None
+        self._callback_budget_exhausted = False
+        # (callback, args) pairs queued by other threads, see
+        # call_soon_threadsafe_batch().  _run_once() drains them after
+        # the ready callbacks, within the callback budget.
+        self._inbound = collections.deque()
 
     def __repr__(self):
         return ('<%s running=%s closed=%s debug=%s>'
@@ -278,7 +402,8 @@ class BaseEventLoop(events.AbstractEventLoop):
         raise NotImplementedError
 
     def _make_datagram_transport(self, sock, protocol,
-                                 address=None, waiter=None, extra=None):
+                                 address=None, waiter=None, extra=None,
+                                 batch_size=None):
         """Create datagram transport."""
         raise NotImplementedError
 
@@ -446,7 +571,7 @@ class BaseEventLoop(events.AbstractEventLoop):
         """
         return time.monotonic()
 
-    def call_later(self, delay, callback, *args):
+    def call_later(self, delay, callback, *args, slack=None):
         """Arrange for a callback to be called at a given time.
 
         Return a Handle: an opaque object with a cancel() method that
@@ -461,13 +586,18 @@ class BaseEventLoop(events.AbstractEventLoop):
 
         Any positional arguments after the callback will be passed to
         the callback when it is called.
+
+        slack is the delay, in seconds, by which the call may be
+        postponed so that it runs in the same loop iteration as other
+        timers; it defaults to the loop's timer slack.
         """
-        timer = self.call_at(self.time() + delay, callback, *args)
+        timer = self.call_at(self.time() + delay, callback, *args,
+                             slack=slack)
         if timer._source_traceback:
             del timer._source_traceback[-1]
         return timer
 
-    def call_at(self, when, callback, *args):
+    def call_at(self, when, callback, *args, slack=None):
         """Like call_later(), but uses an absolute time.
 
         Absolute time corresponds to the event loop's time() method.
@@ -478,11 +608,18 @@ class BaseEventLoop(events.AbstractEventLoop):
         self._check_closed()
         if self._debug:
             self._check_thread()
+        if slack is None:
+            slack = self._timer_slack
+        elif slack < 0:
+            raise ValueError('slack must be >= 0, got %r' % (slack,))
+        if slack:
+            # Round the deadline up to a multiple of the slack: the timers
+            # of the same bucket share their deadline and so run together.
+            when = math.ceil(when / slack) * slack
         timer = events.TimerHandle(when, callback, args, self)
         if timer._source_traceback:
             del timer._source_traceback[-1]
-        heapq.heappush(self._scheduled, timer)
-        timer._scheduled = True
+        self._scheduled.push(timer)
         return timer
 
     #
@@ -541,6 +678,63 @@ class BaseEventLoop(events.AbstractEventLoop):
         self._write_to_self()
         return handle
 
+    def call_soon_threadsafe_batch(self, calls):
+        """Schedule a batch of callbacks from another thread.
+
+        calls is an iterable of (callback, args) pairs.  They are queued
+        without creating a Handle each and the event loop is woken up
+        once; the callbacks are called in order by its next iteration.
+        Unlike call_soon_threadsafe(), queued calls cannot be cancelled.
+        """
+        self._check_closed()
+        self._inbound.extend(calls)
+        self._write_to_self()
+
+    def _run_inbound(self, count, deadline):
+        # Run at most count calls (None: no limit), stop once deadline is
+        # reached; the calls left over stay queued for the next iteration.
+        # Calls queued meanwhile by other threads wait for the next
+        # iteration, like the callbacks added to _ready.
+        inbound = self._inbound
+        ncalls = len(inbound)
+        if count is not None:
+            ncalls = min(ncalls, count)
+        nrun = ncalls
+        for i in range(ncalls):
+            callback, args = inbound.popleft()
+            try:
+                callback(*args)
+            except Exception as exc:
+                cb = events._format_callback(callback, args)
+                self.call_exception_handler({
+                    'message': 'Exception in callback {}'.format(cb),
+                    'exception': exc,
+                })
+            if deadline is not None and self.time() >= deadline:
+                nrun = i + 1
+                break
+        return nrun
+
+    def _wrap_executor_future(self, executor_future):
+        # Like futures.wrap_future(), but the result comes back through
+        # the inbound queue: completed jobs are handled in bulk.
+        if isinstance(executor_future, futures.Future):
+            return executor_future
+        future = futures.Future(loop=self)
+
+        def _check_cancel_other(f):
+            if f.cancelled():
+                executor_future.cancel()
+
+        def _copy_state(f):
+            self._check_closed()
+            self._inbound.append((future._copy_state, (f,)))
+            self._write_to_self()
+
+        future.add_done_callback(_check_cancel_other)
+        executor_future.add_done_callback(_copy_state)
+        return future
+
     def run_in_executor(self, executor, callback, *args):
         if (coroutines.iscoroutine(callback)
         or coroutines.iscoroutinefunction(callback)):
@@ -559,11 +753,43 @@ class BaseEventLoop(events.AbstractEventLoop):
             if executor is None:
                 executor = concurrent.futures.ThreadPoolExecutor(_MAX_WORKERS)
                 self._default_executor = executor
-        return futures.wrap_future(executor.submit(callback, *args), loop=self)
+        return self._wrap_executor_future(executor.submit(callback, *args))
 
     def set_default_executor(self, executor):
         self._default_executor = executor
 
+    def set_timer_store(self, store):
+        """Set the store used for callbacks scheduled with call_at().
+
+        store must be an empty timer store, such as timers.TimerHeap (the
+        default) or timers.TimerWheel.  Timers pending in the current
+        store are moved to the new one.
+        """
+        if len(store):
+            raise ValueError('the timer store must be empty')
+        scheduled = self._scheduled
+        self._scheduled = store
+        for handle in scheduled:
+            if handle._cancelled:
+                handle._scheduled = False
+            else:
+                store.push(handle)
+        scheduled.clear()
+
+    def set_ssl_session_cache(self, cache):
+        """Set the cache of TLS sessions of the client connections.
+
+        cache is a sslproto.SSLSessionCache, or None to disable session
+        resumption (the default).  Connections made after the call
+        resume the sessions of the previous connections to the same
+        server.
+        """
+        self._ssl_session_cache = cache
+
+    def get_ssl_session_cache(self):
+        """Return the cache of TLS sessions, or None."""
+        return self._ssl_session_cache
+
     def _getaddrinfo_debug(self, host, port, family, type, proto, flags):
         msg = ["%s:%r" % (host, port)]
         if family:
@@ -749,8 +975,12 @@ class BaseEventLoop(events.AbstractEventLoop):
     @coroutine
     def create_datagram_endpoint(self, protocol_factory,
                                  local_addr=None, remote_addr=None, *,
-                                 family=0, proto=0, flags=0):
+                                 family=0, proto=0, flags=0,
+                                 batch_size=None):
         """Create datagram connection."""
+        if batch_size is not None and batch_size < 1:
+            raise ValueError('batch_size must be at least 1, got %r'
+                             % (batch_size,))
         if not (local_addr or remote_addr):
             if family == 0:
                 raise ValueError('unexpected address family')
@@ -817,7 +1047,8 @@ class BaseEventLoop(events.AbstractEventLoop):
         protocol = protocol_factory()
         waiter = futures.Future(loop=self)
         transport = self._make_datagram_transport(sock, protocol, r_addr,
-                                                  waiter)
+                                                  waiter,
+                                                  batch_size=batch_size)
         if self._debug:
             if local_addr:
                 logger.info("Datagram endpoint local_addr=%r remote_addr=%r "
@@ -844,7 +1075,8 @@ class BaseEventLoop(events.AbstractEventLoop):
                       sock=None,
                       backlog=100,
                       ssl=None,
-                      reuse_address=None):
+                      reuse_address=None,
+                      reuse_port=None):
         """Create a TCP server bound to host and port.
 
         Return a Server object which can be used to stop the service.
@@ -858,6 +1090,10 @@ class BaseEventLoop(events.AbstractEventLoop):
                 raise ValueError(
                     'host/port and sock can not be specified at the same time')
 
+            if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+                raise ValueError(
+                    'reuse_port not supported by socket module')
+
             AF_INET6 = getattr(socket, 'AF_INET6', 0)
             if reuse_address is None:
                 reuse_address = os.name == 'posix' and sys.platform != 'cygwin'
@@ -888,6 +1124,8 @@ class BaseEventLoop(events.AbstractEventLoop):
                     if reuse_address:
                         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR,
                                         True)
+                    if reuse_port:
+                        _set_reuseport(sock)
                     # Disable IPv4/IPv6 dual stack support (enabled by
                     # default on Linux) which makes a single socket
                     # listen on both address families.
@@ -915,7 +1153,7 @@ class BaseEventLoop(events.AbstractEventLoop):
         for sock in sockets:
             sock.listen(backlog)
             sock.setblocking(False)
-            self._start_serving(protocol_factory, sock, ssl, server)
+            self._start_serving(protocol_factory, sock, ssl, server, backlog)
         if self._debug:
             logger.info("%r is serving", server)
         return server
@@ -1022,6 +1260,76 @@ class BaseEventLoop(events.AbstractEventLoop):
             logger.info('%s: %r' % (debug_log, transport))
         return transport, protocol
 
+    @coroutine
+    def sendfile(self, transport, file, offset=0, count=None,
+                 *, fallback=True):
+        """Send a file through a transport.
+
+        Return the total number of bytes sent.  See
+        AbstractEventLoop.sendfile() for the details.
+        """
+        if 'b' not in getattr(file, 'mode', 'b'):
+            raise ValueError("file should be opened in binary mode")
+        if not isinstance(offset, int):
+            raise TypeError(
+                "offset must be a non-negative integer (got {!r})".format(
+                    offset))
+        if offset < 0:
+            raise ValueError(
+                "offset must be a non-negative integer (got {!r})".format(
+                    offset))
+        if count is not None:
+            if not isinstance(count, int):
+                raise TypeError(
+                    "count must be a positive integer (got {!r})".format(
+                        count))
+            if count <= 0:
+                raise ValueError(
+                    "count must be a positive integer (got {!r})".format(
+                        count))
+
+        try:
+            return (yield from self._sendfile_native(transport, file,
+                                                     offset, count))
+        except events.SendfileNotAvailableError:
+            if not fallback:
+                raise
+        return (yield from self._sendfile_fallback(transport, file,
+                                                   offset, count))
+
+    @coroutine
+    def _sendfile_native(self, transport, file, offset, count):
+        raise events.SendfileNotAvailableError(
+            "sendfile syscall is not supported for this transport")
+
+    @coroutine
+    def _sendfile_fallback(self, transport, file, offset, count):
+        file.seek(offset)
+        blocksize = _SENDFILE_FALLBACK_READBUFFER_SIZE
+        if count:
+            blocksize = min(count, blocksize)
+        proto = _SendfileFallbackProtocol(transport)
+        total_sent = 0
+        try:
+            while True:
+                if count:
+                    blocksize = min(count - total_sent, blocksize)
+                    if blocksize <= 0:
+                        return total_sent
+                # The transport may keep a reference to the data it
+                # buffers: read each block into a new bytes object.
+                data = yield from self.run_in_executor(None, file.read,
+                                                       blocksize)
+                if not data:
+                    return total_sent
+                yield from proto.drain()
+                transport.write(data)
+                total_sent += len(data)
+        finally:
+            if total_sent > 0 and hasattr(file, 'seek'):
+                file.seek(offset + total_sent)
+            proto.restore()
+
     def set_exception_handler(self, handler):
         """Set handler as the new event loop exception handler.
 
@@ -1147,7 +1455,7 @@ class BaseEventLoop(events.AbstractEventLoop):
     def _timer_handle_cancelled(self, handle):
         """Notification that a TimerHandle has been cancelled."""
         if handle._scheduled:
-            self._timer_cancelled_count += 1
+            self._scheduled.timer_cancelled(handle)
 
     #
     # 启动
@@ -1160,39 +1468,24 @@ class BaseEventLoop(events.AbstractEventLoop):
         'call_later' callbacks.
         """
 
-        sched_count = len(self._scheduled)
-        if (sched_count > _MIN_SCHEDULED_TIMER_HANDLES and
-            self._timer_cancelled_count / sched_count >
-                _MIN_CANCELLED_TIMER_HANDLES_FRACTION):
-            # Remove delayed calls that were cancelled if their number
-            # is too high
-            new_scheduled = []
-            for handle in self._scheduled:
-                if handle._cancelled:
-                    handle._scheduled = False
-                else:
-                    new_scheduled.append(handle)
+        # Callbacks left over by the callback budget of the previous
+        # iteration.
+        nbacklog = 0
+        if self._callback_budget_exhausted:
+            nbacklog = len(self._ready)
 
-            heapq.heapify(new_scheduled)                # 堆, 类型转换:列表转换成堆
-            self._scheduled = new_scheduled
-            self._timer_cancelled_count = 0
-        else:
-            # Remove delayed calls that were cancelled from head of queue.
-            while self._scheduled and self._scheduled[0]._cancelled:
-                self._timer_cancelled_count -= 1
-                handle = heapq.heappop(self._scheduled)     # 堆, 最小出堆.
-                handle._scheduled = False
+        # The store also drops the cancelled delayed calls here.
+        when = self._scheduled.next_when()
 
         timeout = None
-        if self._ready:
+        if self._ready or self._inbound:
             timeout = 0
-        elif self._scheduled:
+        elif when is not None:
             # Compute the desired timeout.
-            when = self._scheduled[0]._when
             timeout = max(0, when - self.time())
 
+        t0 = self.time()
         if self._debug and timeout != 0:
-            t0 = self.time()
             event_list = self._selector.select(timeout)
             dt = self.time() - t0
             if dt >= 1.0:
@@ -1215,15 +1508,26 @@ class BaseEventLoop(events.AbstractEventLoop):
             event_list = self._selector.select(timeout)      # select 实现
         self._process_events(event_list)
 
+        stats = self._stats
+        stats.iterations += 1
+        now = self.time()
+        stats.select_time += now - t0
+
         # Handle 'later' callbacks that are ready.
-        end_time = self.time() + self._clock_resolution
-        while self._scheduled:
-            handle = self._scheduled[0]
-            if handle._when >= end_time:
-                break
-            handle = heapq.heappop(self._scheduled)     # 堆, 最小值出堆
-            handle._scheduled = False
-            self._ready.append(handle)
+        end_time = now + self._clock_resolution
+        ntimers, first_when = self._scheduled.pop_due(end_time, self._ready)
+        if ntimers:
+            # The earliest deadline is the one of the most late timer
+            lag = max(0, now - first_when)
+            stats.timer_lag = lag
+            stats.timer_lag_total += lag
+            stats.timer_lag_count += 1
+            if lag > stats.timer_lag_max:
+                stats.timer_lag_max = lag
+
+        if nbacklog:
+            # Run the new I/O callbacks and timers first.
+            self._ready.rotate(-nbacklog)
 
         # This is the only place where callbacks are actually *called*.
         # All other places just add them to ready.
@@ -1232,25 +1536,141 @@ class BaseEventLoop(events.AbstractEventLoop):
         # they will be run the next time (after another I/O poll).
         # Use an idiom that is thread-safe without using locks.
         ntodo = len(self._ready)
-        for i in range(ntodo):
-            handle = self._ready.popleft()
-            if handle._cancelled:
-                continue
-            if self._debug:
-                try:
-                    self._current_handle = handle
-                    t0 = self.time()
+        # Calls queued by other threads are drained after the ready
+        # callbacks, and count as a single callback in the statistics.
+        ninbound = len(self._inbound)
+        stats.ready_histogram[min((ntodo + bool(ninbound)).bit_length(),
+                                  _READY_HISTOGRAM_SIZE - 1)] += 1
+        nbudget = ntodo
+        if self._callback_budget_count is not None:
+            nbudget = min(ntodo, self._callback_budget_count)
+        deadline = None
+        if self._callback_budget_time is not None:
+            deadline = now + self._callback_budget_time
+        nrun = nbudget
+        ncalled = 0
+        ninbound_run = 0
+        try:
+            for i in range(nbudget):
+                handle = self._ready.popleft()
+                if handle._cancelled:
+                    continue
+                ncalled += 1
+                if self._debug:
+                    try:
+                        self._current_handle = handle
+                        t0 = self.time()
+                        handle._run()
+                        dt = self.time() - t0
+                        if dt >= self.slow_callback_duration:
+                            logger.warning('Executing %s took %.3f seconds',
+                                           _format_handle(handle), dt)
+                    finally:
+                        self._current_handle = None
+                else:
                     handle._run()
-                    dt = self.time() - t0
-                    if dt >= self.slow_callback_duration:
-                        logger.warning('Executing %s took %.3f seconds',
-                                       _format_handle(handle), dt)
-                finally:
-                    self._current_handle = None
-            else:
-                handle._run()
+                if deadline is not None and self.time() >= deadline:
+                    nrun = i + 1
+                    break
+            if ninbound and nrun == ntodo:
+                # The queued calls use what is left of the budget
+                count = self._callback_budget_count
+                if count is not None:
+                    count -= nrun
+                if ((count is None or count > 0) and
+                        (deadline is None or self.time() < deadline)):
+                    ncalled += 1
+                    ninbound_run = self._run_inbound(count, deadline)
+        finally:
+            # stop() leaves the loop by raising _StopError from a callback.
+            stats.callbacks += ncalled
+            stats.callback_time += self.time() - now
         handle = None  # Needed to break cycles when an exception occurs.
 
+        self._callback_budget_exhausted = nrun < ntodo
+        if nrun < ntodo or ninbound_run < ninbound:
+            stats.budget_exhausted += 1
+
+    def get_stats(self):
+        """Return a dict of counters describing the loop activity.
+
+        - 'iterations': number of loop iterations;
+        - 'callbacks': number of callbacks run;
+        - 'select_time': seconds spent polling for I/O and processing the
+          I/O events;
+        - 'callback_time': seconds spent running callbacks;
+        - 'ready_histogram': list where item i is the number of iterations
+          which started with 2**(i-1) to 2**i-1 ready callbacks (item 0:
+          none, the last item: that many or more);
+        - 'timers': number of timers currently scheduled, not counting
+          the cancelled timers the store has not dropped yet;
+        - 'timer_lag': delay, in seconds, between the deadline of the most
+          late timer of the last iteration which ran timers and the time
+          the loop noticed it was due;
+        - 'timer_lag_max', 'timer_lag_total', 'timer_lag_count': maximum,
+          sum and number of the timer_lag samples;
+        - 'budget_exhausted': number of iterations stopped by the callback
+          budget (see set_callback_budget()).
+
+        The counters are only updated by the thread running the loop and
+        are cheap enough to be always on; this method may be called from
+        any thread, for example by a metrics exporter.
+        """
+        stats = self._stats
+        return {
+            'iterations': stats.iterations,
+            'callbacks': stats.callbacks,
+            'select_time': stats.select_time,
+            'callback_time': stats.callback_time,
+            'ready_histogram': list(stats.ready_histogram),
+            'timers': self._scheduled.live_count(),
+            'timer_lag': stats.timer_lag,
+            'timer_lag_max': stats.timer_lag_max,
+            'timer_lag_total': stats.timer_lag_total,
+            'timer_lag_count': stats.timer_lag_count,
+            'budget_exhausted': stats.budget_exhausted,
+        }
+
+    def get_callback_budget(self):
+        """Return the (count, duration) callback budget of an iteration."""
+        return (self._callback_budget_count, self._callback_budget_time)
+
+    def set_callback_budget(self, count=None, duration=None):
+        """Limit the callbacks run by one iteration of the event loop.
+
+        By default, an iteration runs all the callbacks which were ready
+        when it started, so a burst of ready callbacks delays the next
+        poll for I/O.  With a budget, the iteration stops after count
+        callbacks or after duration seconds, and the next iteration polls
+        for I/O without blocking.  The I/O callbacks and the timers which
+        are due then run before the callbacks left over.
+
+        None means no limit; the default is no budget at all.
+        """
+        if count is not None and count < 1:
+            raise ValueError('count must be None or >= 1, got %r' % (count,))
+        if duration is not None and duration < 0:
+            raise ValueError('duration must be None or >= 0, got %r'
+                             % (duration,))
+        self._callback_budget_count = count
+        self._callback_budget_time = duration
+
+    def get_timer_slack(self):
+        """Return the default slack of call_at() and call_later()."""
+        return self._timer_slack
+
+    def set_timer_slack(self, slack):
+        """Set the default slack of call_at() and call_later().
+
+        Deadlines are rounded up to a multiple of slack seconds, so that
+        timers which don't need a precise deadline (keepalives, idle
+        timeouts, retries) are batched into fewer loop wakeups.  A slack
+        of 0 (the default) keeps the exact deadlines.
+        """
+        if slack < 0:
+            raise ValueError('slack must be >= 0, got %r' % (slack,))
+        self._timer_slack = slack
+
     def get_debug(self):
         return self._debug
 
@@ -83,6 +83,12 @@ class BaseSubprocessTransport(transports.SubprocessTransport):
     def _make_read_subprocess_pipe_proto(self, fd):
         raise NotImplementedError
 
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
     def close(self):
         if self._closed:
             return
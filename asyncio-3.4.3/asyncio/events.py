@@ -2,7 +2,7 @@
 
 __all__ = ['AbstractEventLoopPolicy',
            'AbstractEventLoop', 'AbstractServer',
-           'Handle', 'TimerHandle',
+           'Handle', 'TimerHandle', 'SendfileNotAvailableError',
            'get_event_loop_policy', 'set_event_loop_policy',
            'get_event_loop', 'set_event_loop', 'new_event_loop',
            'get_child_watcher', 'set_child_watcher',
@@ -199,6 +199,14 @@ class TimerHandle(Handle):
         super().cancel()
 
 
+class SendfileNotAvailableError(RuntimeError):
+    """Sendfile syscall is not available.
+
+    Raised if the OS does not support the sendfile syscall for the given
+    socket or file type.
+    """
+
+
 class AbstractServer:
     """Abstract server returned by create_server()."""
 
@@ -277,10 +285,10 @@ class AbstractEventLoop:
     def call_soon(self, callback, *args):
         return self.call_later(0, callback, *args)
 
-    def call_later(self, delay, callback, *args):
+    def call_later(self, delay, callback, *args, slack=None):
         raise NotImplementedError
 
-    def call_at(self, when, callback, *args):
+    def call_at(self, when, callback, *args, slack=None):
         raise NotImplementedError
 
     def time(self):
@@ -336,7 +344,8 @@ class AbstractEventLoop:
     #
     def create_server(self, protocol_factory, host=None, port=None, *,
                       family=socket.AF_UNSPEC, flags=socket.AI_PASSIVE,
-                      sock=None, backlog=100, ssl=None, reuse_address=None):
+                      sock=None, backlog=100, ssl=None, reuse_address=None,
+                      reuse_port=None):
         """A coroutine which creates a TCP server bound to host and port.
 
         The return value is a Server object which can be used to stop
@@ -365,6 +374,12 @@ class AbstractEventLoop:
         TIME_WAIT state, without waiting for its natural timeout to
         expire. If not specified will automatically be set to True on
         UNIX.
+
+        reuse_port tells the kernel to allow this endpoint to be bound to
+        the same port as other existing endpoints are bound to, so long as
+        they all set this flag when being created. The kernel balances
+        the incoming connections between them.  This option is not
+        supported on Windows.
         """
         raise NotImplementedError
 
@@ -399,7 +414,38 @@ class AbstractEventLoop:
 
     def create_datagram_endpoint(self, protocol_factory,
                                  local_addr=None, remote_addr=None, *,
-                                 family=0, proto=0, flags=0):
+                                 family=0, proto=0, flags=0,
+                                 batch_size=None):
+        """A coroutine which creates a datagram endpoint.
+
+        If batch_size is set, the transport reads up to batch_size
+        datagrams each time the socket is readable and passes them to
+        the protocol's datagrams_received() method in a single list.
+        """
+        raise NotImplementedError
+
+    def sendfile(self, transport, file, offset=0, count=None,
+                 *, fallback=True):
+        """Send a file through a transport.
+
+        This method is a coroutine; it returns the total number of bytes
+        sent.
+
+        file must be a regular file object opened in binary mode.  The
+        data is sent starting at offset; count is the number of bytes to
+        send, the file is sent up to its end if count is None.
+
+        The data buffered by the transport is flushed first.  Where the
+        transport and the platform allow it, the file is then sent with
+        os.sendfile(), without copying it to user space.  Otherwise, and
+        if fallback is true, the file is read and written to the
+        transport block by block, respecting the transport's flow
+        control; if fallback is false, SendfileNotAvailableError is
+        raised.
+
+        The transport must not be written to until sendfile() is done.
+        The position of file is moved after the last byte sent.
+        """
         raise NotImplementedError
 
     # Pipes and subprocesses.
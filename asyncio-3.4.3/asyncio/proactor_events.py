@@ -13,6 +13,7 @@ import warnings
 from . import base_events
 from . import constants
 from . import futures
+from . import protocols
 from . import sslproto
 from . import transports
 from .log import logger
@@ -62,6 +63,12 @@ class _ProactorBasePipeTransport(transports._FlowControlMixin,
             info.append('EOF written')
         return '<%s>' % ' '.join(info)
 
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
     def _set_extra(self, sock):
         self._extra['pipe'] = sock
 
@@ -206,7 +213,11 @@ class _ProactorReadPipeTransport(_ProactorBasePipeTransport,
             self._read_fut.add_done_callback(self._loop_reading)
         finally:
             if data:
-                self._protocol.data_received(data)
+                if isinstance(self._protocol, protocols.BufferedProtocol):
+                    protocols._feed_data_to_buffered_proto(self._protocol,
+                                                           data)
+                else:
+                    self._protocol.data_received(data)
             elif data is not None:
                 if self._loop.get_debug():
                     logger.debug("%r received EOF", self)
@@ -390,8 +401,10 @@ class BaseProactorEventLoop(base_events.BaseEventLoop):
                                       " or newer (ssl.MemoryBIO) to support "
                                       "SSL")
 
-        ssl_protocol = sslproto.SSLProtocol(self, protocol, sslcontext, waiter,
-                                            server_side, server_hostname)
+        ssl_protocol = sslproto.SSLProtocol(
+            self, protocol, sslcontext, waiter,
+            server_side, server_hostname,
+            session_cache=self._ssl_session_cache)
         _ProactorSocketTransport(self, rawsock, ssl_protocol,
                                  extra=extra, server=server)
         return ssl_protocol._app_transport
@@ -492,7 +505,9 @@ class BaseProactorEventLoop(base_events.BaseEventLoop):
         self._csock.send(b'\0')
 
     def _start_serving(self, protocol_factory, sock,
-                       sslcontext=None, server=None):
+                       sslcontext=None, server=None, backlog=100):
+        # backlog is unused: the proactor accepts one connection per
+        # overlapped accept() call.
 
         def loop(f=None):
             try:
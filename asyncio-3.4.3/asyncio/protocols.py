@@ -3,8 +3,8 @@
 
 """Abstract Protocol class."""
 
-__all__ = ['BaseProtocol', 'Protocol', 'DatagramProtocol',
-           'SubprocessProtocol']
+__all__ = ['BaseProtocol', 'Protocol', 'BufferedProtocol',
+           'DatagramProtocol', 'SubprocessProtocol']
 
 
 #########################################
@@ -119,6 +119,64 @@ class Protocol(BaseProtocol):
         """
 
 
+#########################################
+#         stream 协议接口: 自带缓冲区
+#
+# 说明:
+#   - 传输层直接 recv_into() 协议提供的缓冲区
+#
+#########################################
+class BufferedProtocol(BaseProtocol):
+    """Interface for stream protocol with manual control of the
+    receive buffer.
+
+    Instead of data_received(), the transport calls get_buffer() to
+    obtain a writable buffer, receives data directly into it with
+    socket.recv_into() and then calls buffer_updated() with the number
+    of bytes written.  No bytes object is allocated per read and the
+    data is not copied again by the protocol.
+
+    Selector socket transports use recv_into(); other transports feed
+    the data they receive to get_buffer() and buffer_updated().
+
+    State machine of calls:
+
+      start -> CM [-> GB [-> BU?]]* [-> ER?] -> CL -> end
+
+    * CM: connection_made()
+    * GB: get_buffer()
+    * BU: buffer_updated()
+    * ER: eof_received()
+    * CL: connection_lost()
+    """
+
+    def get_buffer(self, sizehint):
+        """Called to allocate a new receive buffer.
+
+        sizehint is the recommended minimal size for the returned
+        buffer; the buffer may be smaller or larger.  It must be a
+        non-empty object supporting the writable buffer protocol
+        (a bytearray or a memoryview of one, for example).
+        """
+        raise NotImplementedError
+
+    def buffer_updated(self, nbytes):
+        """Called when the buffer was updated with the received data.
+
+        nbytes is the total number of bytes that were written to the
+        buffer returned by the last get_buffer() call.
+        """
+        raise NotImplementedError
+
+    def eof_received(self):
+        """Called when the other end calls write_eof() or equivalent.
+
+        If this returns a false value (including None), the transport
+        will close itself.  If it returns a true value, closing the
+        transport is up to the protocol.
+        """
+
+
 #########################################
 #             datagram 协议接口
 #
@@ -131,6 +189,16 @@ class DatagramProtocol(BaseProtocol):
     def datagram_received(self, data, addr):
         """Called when some datagram is received."""
 
+    def datagrams_received(self, datagrams):
+        """Called with a list of (data, addr) pairs.
+
+        Transports created with a batch_size pass all the datagrams they
+        read on a wakeup in a single call.  The default implementation
+        calls datagram_received() for each datagram.
+        """
+        for data, addr in datagrams:
+            self.datagram_received(data, addr)
+
     def error_received(self, exc):
         """Called when a send or receive operation raises an OSError.
 
@@ -163,3 +231,24 @@ class SubprocessProtocol(BaseProtocol):
 
     def process_exited(self):
         """Called when subprocess has exited."""
+
+
+def _feed_data_to_buffered_proto(proto, data):
+    """Feed data to a BufferedProtocol, as data_received() would."""
+    data = memoryview(data)
+    data_len = len(data)
+    while data_len:
+        buf = proto.get_buffer(data_len)
+        buf_len = len(buf)
+        if not buf_len:
+            raise RuntimeError('get_buffer() returned an empty buffer')
+
+        if buf_len >= data_len:
+            buf[:data_len] = data
+            proto.buffer_updated(data_len)
+            return
+        else:
+            buf[:buf_len] = data[:buf_len]
+            proto.buffer_updated(buf_len)
+            data = data[buf_len:]
+            data_len -= buf_len
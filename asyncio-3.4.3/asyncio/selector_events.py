@@ -12,6 +12,9 @@ __all__ = ['BaseSelectorEventLoop']
 import collections
 import errno
 import functools
+import io
+import itertools
+import os
 import socket
 import sys
 import warnings
@@ -24,6 +27,7 @@ from . import base_events
 from . import constants
 from . import events
 from . import futures
+from . import protocols
 from . import selectors              # 选择器
 from . import transports             # 传输层
 from . import sslproto
@@ -31,6 +35,40 @@ from .coroutines import coroutine
 from .log import logger
 
 
+# socket.sendmsg() sends the chunks of the write buffer in one call; it
+# accepts at most SC_IOV_MAX of them.
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+_HAS_SENDFILE = hasattr(os, 'sendfile')
+# os.sendfile() errors meaning that the file or the socket cannot be
+# used with sendfile().
+_SENDFILE_UNSUPPORTED = frozenset(
+    getattr(errno, name) for name in ('EINVAL', 'ENOSYS', 'ENOTSOCK',
+                                      'EOPNOTSUPP', 'ENOTSUP')
+    if hasattr(errno, name))
+try:
+    _SC_IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _SC_IOV_MAX = -1
+if _SC_IOV_MAX <= 0:
+    # -1 means that the limit is indeterminate
+    _SC_IOV_MAX = 16
+
+
+def _set_nodelay(sock, enabled):
+    # Set TCP_NODELAY on a TCP socket, return its previous value, or None
+    # if the socket does not support it.
+    if (not hasattr(socket, 'TCP_NODELAY') or
+            sock.family not in (socket.AF_INET,
+                                getattr(socket, 'AF_INET6', None))):
+        return None
+    try:
+        previous = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, enabled)
+    except OSError:
+        return None
+    return bool(previous)
+
+
 def _test_selector_event(selector, fd, event):
     # Test if the selector is monitoring 'event' events
     # for the file descriptor 'fd'.
@@ -55,6 +93,12 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
             selector = selectors.DefaultSelector()
         logger.debug('Using selector: %s', selector.__class__.__name__)
         self._selector = selector
+        # True when a wakeup byte has been written and not read yet: the
+        # next wakeups are coalesced with it.
+        self._self_pipe_pending = False
+        # Edge-triggered mode of socket transports, see
+        # set_edge_triggered().
+        self._edge_triggered = False
         self._make_self_pipe()
 
     def _make_socket_transport(self, sock, protocol, waiter=None, *,
@@ -71,8 +115,10 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
                 server_side=server_side, server_hostname=server_hostname,
                 extra=extra, server=server)
 
-        ssl_protocol = sslproto.SSLProtocol(self, protocol, sslcontext, waiter,
-                                            server_side, server_hostname)
+        ssl_protocol = sslproto.SSLProtocol(
+            self, protocol, sslcontext, waiter,
+            server_side, server_hostname,
+            session_cache=self._ssl_session_cache)
         _SelectorSocketTransport(self, rawsock, ssl_protocol,
                                  extra=extra, server=server)
         return ssl_protocol._app_transport
@@ -88,9 +134,11 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
             server_side, server_hostname, extra, server)
 
     def _make_datagram_transport(self, sock, protocol,
-                                 address=None, waiter=None, extra=None):
+                                 address=None, waiter=None, extra=None,
+                                 batch_size=None):
         return _SelectorDatagramTransport(self, sock, protocol,
-                                          address, waiter, extra)
+                                          address, waiter, extra,
+                                          batch_size)
 
     def close(self):
         if self.is_running():
@@ -106,6 +154,37 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
     def _socketpair(self):
         raise NotImplementedError
 
+    def get_edge_triggered(self):
+        return self._edge_triggered
+
+    def set_edge_triggered(self, enabled):
+        """Enable or disable the edge-triggered mode of socket transports.
+
+        The socket of a transport created in this mode stays registered
+        in the selector for both reading and writing: waiting for the
+        socket to be writable again does not make a system call.  The
+        selector must support it, like selectors.EpollSelector.
+        """
+        if enabled and not hasattr(self._selector, 'set_edge_triggered'):
+            raise RuntimeError('%s does not support the edge-triggered mode'
+                               % self._selector.__class__.__name__)
+        self._edge_triggered = bool(enabled)
+
+    def _set_edge_triggered(self, fd):
+        try:
+            self._selector.set_edge_triggered(fd)
+        except KeyError:
+            # the file descriptor has been unregistered meanwhile
+            pass
+
+    def _mark_ready(self, fd, events):
+        try:
+            self._selector.mark_ready(fd, events)
+        except KeyError:
+            # Unregistered: the selector reports the events again if the
+            # file descriptor is registered again.
+            pass
+
     def _close_self_pipe(self):
         self.remove_reader(self._ssock.fileno())
         self._ssock.close()
@@ -136,6 +215,9 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
                 continue
             except BlockingIOError:
                 break
+        # Only allow a new wakeup once the pipe has been drained: the
+        # callbacks added before that are already in the ready queue.
+        self._self_pipe_pending = False
 
     def _write_to_self(self):
         # This may be called from a different thread, possibly after
@@ -143,54 +225,67 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
         # running.  Guard for self._csock being None or closed.  When
         # a socket is closed, send() raises OSError (with errno set to
         # EBADF, but let's not rely on the exact error code).
+        #
+        # A single byte is needed to wake up the event loop: don't write
+        # again until _read_from_self() read it.
         csock = self._csock
-        if csock is not None:
+        if csock is not None and not self._self_pipe_pending:
+            self._self_pipe_pending = True
             try:
                 csock.send(b'\0')
             except OSError:
+                self._self_pipe_pending = False
                 if self._debug:
                     logger.debug("Fail to write a null byte into the "
                                  "self-pipe socket",
                                  exc_info=True)
 
     def _start_serving(self, protocol_factory, sock,
-                       sslcontext=None, server=None):
+                       sslcontext=None, server=None, backlog=100):
         self.add_reader(sock.fileno(), self._accept_connection,
-                        protocol_factory, sock, sslcontext, server)
+                        protocol_factory, sock, sslcontext, server, backlog)
 
     def _accept_connection(self, protocol_factory, sock,
-                           sslcontext=None, server=None):
-        try:
-            conn, addr = sock.accept()
-            if self._debug:
-                logger.debug("%r got a new connection from %r: %r",
-                             server, addr, conn)
-            conn.setblocking(False)
-        except (BlockingIOError, InterruptedError, ConnectionAbortedError):
-            pass  # False alarm.
-        except OSError as exc:
-            # There's nowhere to send the error, so just log it.
-            if exc.errno in (errno.EMFILE, errno.ENFILE,
-                             errno.ENOBUFS, errno.ENOMEM):
-                # Some platforms (e.g. Linux keep reporting the FD as
-                # ready, so we remove the read handler temporarily.
-                # We'll try again in a while.
-                self.call_exception_handler({
-                    'message': 'socket.accept() out of system resource',
-                    'exception': exc,
-                    'socket': sock,
-                })
-                self.remove_reader(sock.fileno())
-                self.call_later(constants.ACCEPT_RETRY_DELAY,
-                                self._start_serving,
-                                protocol_factory, sock, sslcontext, server)
+                           sslcontext=None, server=None, backlog=100):
+        # The listening socket is reported readable once per loop
+        # iteration, but many connections may be waiting: accept up to
+        # backlog of them.  Their transports are all created by the next
+        # iteration.
+        for _ in range(backlog):
+            try:
+                conn, addr = sock.accept()
+                if self._debug:
+                    logger.debug("%r got a new connection from %r: %r",
+                                 server, addr, conn)
+                conn.setblocking(False)
+            except (BlockingIOError, InterruptedError, ConnectionAbortedError):
+                # No more pending connection (or a false alarm).
+                return
+            except OSError as exc:
+                # There's nowhere to send the error, so just log it.
+                if exc.errno in (errno.EMFILE, errno.ENFILE,
+                                 errno.ENOBUFS, errno.ENOMEM):
+                    # Some platforms (e.g. Linux keep reporting the FD as
+                    # ready, so we remove the read handler temporarily.
+                    # We'll try again in a while.
+                    self.call_exception_handler({
+                        'message': 'socket.accept() out of system resource',
+                        'exception': exc,
+                        'socket': sock,
+                    })
+                    self.remove_reader(sock.fileno())
+                    self.call_later(constants.ACCEPT_RETRY_DELAY,
+                                    self._start_serving,
+                                    protocol_factory, sock, sslcontext, server,
+                                    backlog)
+                    return
+                else:
+                    raise  # The event loop will catch, log and ignore it.
             else:
-                raise  # The event loop will catch, log and ignore it.
-        else:
-            extra = {'peername': addr}
-            accept = self._accept_connection2(protocol_factory, conn, extra,
-                                              sslcontext, server)
-            self.create_task(accept)
+                extra = {'peername': addr}
+                accept = self._accept_connection2(protocol_factory, conn,
+                                                  extra, sslcontext, server)
+                self.create_task(accept)
 
     @coroutine
     def _accept_connection2(self, protocol_factory, conn, extra,
@@ -385,6 +480,96 @@ class BaseSelectorEventLoop(base_events.BaseEventLoop):
                 data = data[n:]
             self.add_writer(fd, self._sock_sendall, fut, True, sock, data)
 
+    @coroutine
+    def _sendfile_native(self, transp, file, offset, count):
+        if not (_HAS_SENDFILE and
+                isinstance(transp, _SelectorSocketTransport)):
+            raise events.SendfileNotAvailableError(
+                "sendfile syscall is not supported for this transport")
+        try:
+            fileno = file.fileno()
+        except (AttributeError, io.UnsupportedOperation) as err:
+            raise events.SendfileNotAvailableError("not a regular file")
+        try:
+            fsize = os.fstat(fileno).st_size
+        except OSError:
+            raise events.SendfileNotAvailableError("not a regular file")
+        if transp._closing:
+            raise RuntimeError("Transport is closing")
+        blocksize = count if count else fsize
+        if not blocksize or offset >= fsize:
+            return 0  # empty file
+
+        # Flush the write buffer of the transport first: the file is sent
+        # directly on the socket, and write() is refused until it is done.
+        yield from transp._make_empty_waiter()
+        try:
+            fut = futures.Future(loop=self)
+            self._sock_sendfile_native(fut, False, transp._sock, fileno,
+                                       offset, count, blocksize, 0)
+            return (yield from fut)
+        finally:
+            transp._reset_empty_waiter()
+
+    def _sock_sendfile_native(self, fut, registered, sock, fileno,
+                              offset, count, blocksize, total_sent):
+        fd = sock.fileno()
+
+        if registered:
+            self.remove_writer(fd)
+        if fut.cancelled():
+            self._sock_sendfile_update_filepos(fileno, offset, total_sent)
+            return
+        # Send until the socket is full: in edge-triggered mode, the
+        # selector only reports the socket writable again after a send
+        # failed with EAGAIN.
+        while True:
+            if count:
+                blocksize = count - total_sent
+                if blocksize <= 0:
+                    self._sock_sendfile_update_filepos(fileno, offset,
+                                                       total_sent)
+                    fut.set_result(total_sent)
+                    return
+
+            try:
+                sent = os.sendfile(fd, fileno, offset, blocksize)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                self._sock_sendfile_update_filepos(fileno, offset,
+                                                   total_sent)
+                if total_sent == 0 and exc.errno in _SENDFILE_UNSUPPORTED:
+                    # The file or the socket type is not supported: the
+                    # caller falls back to read() and write().
+                    err = events.SendfileNotAvailableError(
+                        "os.sendfile call failed")
+                    err.__cause__ = exc
+                    fut.set_exception(err)
+                else:
+                    fut.set_exception(exc)
+                return
+            except Exception as exc:
+                self._sock_sendfile_update_filepos(fileno, offset,
+                                                   total_sent)
+                fut.set_exception(exc)
+                return
+
+            if sent == 0:
+                # EOF
+                self._sock_sendfile_update_filepos(fileno, offset,
+                                                   total_sent)
+                fut.set_result(total_sent)
+                return
+            offset += sent
+            total_sent += sent
+        self.add_writer(fd, self._sock_sendfile_native, fut, True, sock,
+                        fileno, offset, count, blocksize, total_sent)
+
+    def _sock_sendfile_update_filepos(self, fileno, offset, total_sent):
+        if total_sent > 0:
+            os.lseek(fileno, offset, os.SEEK_SET)
+
     def sock_connect(self, sock, address):
         """Connect to a remote socket at address.
 
@@ -564,6 +749,12 @@ class _SelectorTransport(transports._FlowControlMixin,
             info.append('write=<%s, bufsize=%s>' % (state, bufsize))
         return '<%s>' % ' '.join(info)
 
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
     def abort(self):
         self._force_close(None)
 
@@ -638,20 +829,49 @@ class _SelectorTransport(transports._FlowControlMixin,
 #########################################
 class _SelectorSocketTransport(_SelectorTransport):
 
+    # The write buffer is a deque of chunks, sent with a single sendmsg()
+    # call where available: data is neither copied into a contiguous
+    # buffer nor moved when a send is partial.
+    _buffer_factory = collections.deque
+
     def __init__(self, loop, sock, protocol, waiter=None,
                  extra=None, server=None):
         super().__init__(loop, sock, protocol, extra, server)
         self._eof = False
         self._paused = False
+        self._edge_triggered = loop._edge_triggered
+        # Size in bytes of the chunks of the write buffer.
+        self._buffer_size = 0
+        # Set while loop.sendfile() owns the socket.
+        self._empty_waiter = None
+        # Write coalescing: the handle of the pending flush, and the
+        # TCP_NODELAY value to restore when coalescing is disabled.
+        self._coalescing = False
+        self._flush_handle = None
+        self._saved_nodelay = None
+        self._set_read_ready_cb(protocol)
 
         self._loop.call_soon(self._protocol.connection_made, self)
         # only start reading when connection_made() has been called
         self._loop.call_soon(self._loop.add_reader,
                              self._sock_fd, self._read_ready)
+        if self._edge_triggered:
+            self._loop.call_soon(self._loop._set_edge_triggered,
+                                 self._sock_fd)
         if waiter is not None:
             # only wake up the waiter when connection_made() has been called
             self._loop.call_soon(waiter._set_result_unless_cancelled, None)
 
+    def _set_read_ready_cb(self, protocol):
+        if isinstance(protocol, protocols.BufferedProtocol):
+            self._read_ready_cb = self._read_ready__get_buffer
+        else:
+            self._read_ready_cb = self._read_ready__data_received
+
+    def set_protocol(self, protocol):
+        self._set_read_ready_cb(protocol)
+        super().set_protocol(protocol)
+
     def pause_reading(self):
         if self._closing:
             raise RuntimeError('Cannot pause_reading() when closing')
@@ -669,30 +889,86 @@ class _SelectorSocketTransport(_SelectorTransport):
         if self._closing:
             return
         self._loop.add_reader(self._sock_fd, self._read_ready)
+        if self._edge_triggered:
+            # The socket is registered again if reading was the only
+            # registered event.
+            self._loop._set_edge_triggered(self._sock_fd)
         if self._loop.get_debug():
             logger.debug("%r resumes reading", self)
 
     def _read_ready(self):
+        self._read_ready_cb()
+
+    def _read_ready__get_buffer(self):
+        # BufferedProtocol: receive directly into the protocol's buffer.
+        try:
+            buf = self._protocol.get_buffer(self.max_size)
+            if not len(buf):
+                raise RuntimeError('get_buffer() returned an empty buffer')
+        except Exception as exc:
+            self._fatal_error(
+                exc, 'Fatal error: protocol.get_buffer() call failed.')
+            return
+
+        try:
+            nbytes = self._sock.recv_into(buf)
+        except BlockingIOError:
+            return
+        except InterruptedError:
+            if self._edge_triggered:
+                self._loop._mark_ready(self._sock_fd, selectors.EVENT_READ)
+            return
+        except Exception as exc:
+            self._fatal_error(exc, 'Fatal read error on socket transport')
+            return
+
+        if not nbytes:
+            self._read_ready__on_eof()
+            return
+
+        try:
+            self._protocol.buffer_updated(nbytes)
+        except Exception as exc:
+            self._fatal_error(
+                exc, 'Fatal error: protocol.buffer_updated() call failed.')
+            return
+        if self._edge_triggered and nbytes == len(buf):
+            # More data may be waiting and the selector does not
+            # report the socket again before it is drained.
+            self._loop._mark_ready(self._sock_fd, selectors.EVENT_READ)
+
+    def _read_ready__data_received(self):
         try:
             data = self._sock.recv(self.max_size)
-        except (BlockingIOError, InterruptedError):
+        except BlockingIOError:
             pass
+        except InterruptedError:
+            if self._edge_triggered:
+                self._loop._mark_ready(self._sock_fd, selectors.EVENT_READ)
         except Exception as exc:
             self._fatal_error(exc, 'Fatal read error on socket transport')
         else:
             if data:
                 self._protocol.data_received(data)
+                if self._edge_triggered and len(data) == self.max_size:
+                    # More data may be waiting and the selector does not
+                    # report the socket again before it is drained.
+                    self._loop._mark_ready(self._sock_fd,
+                                           selectors.EVENT_READ)
             else:
-                if self._loop.get_debug():
-                    logger.debug("%r received EOF", self)
-                keep_open = self._protocol.eof_received()
-                if keep_open:
-                    # We're keeping the connection open so the
-                    # protocol can write more, but we still can't
-                    # receive more, so remove the reader callback.
-                    self._loop.remove_reader(self._sock_fd)
-                else:
-                    self.close()
+                self._read_ready__on_eof()
+
+    def _read_ready__on_eof(self):
+        if self._loop.get_debug():
+            logger.debug("%r received EOF", self)
+        keep_open = self._protocol.eof_received()
+        if keep_open:
+            # We're keeping the connection open so the
+            # protocol can write more, but we still can't
+            # receive more, so remove the reader callback.
+            self._loop.remove_reader(self._sock_fd)
+        else:
+            self.close()
 
     def write(self, data):
         if not isinstance(data, (bytes, bytearray, memoryview)):
@@ -700,6 +976,8 @@ class _SelectorSocketTransport(_SelectorTransport):
                             type(data))
         if self._eof:
             raise RuntimeError('Cannot call write() after write_eof()')
+        if self._empty_waiter is not None:
+            raise RuntimeError('unable to write; sendfile is in progress')
         if not data:
             return
 
@@ -709,47 +987,193 @@ class _SelectorSocketTransport(_SelectorTransport):
             self._conn_lost += 1
             return
 
-        if not self._buffer:
+        if not self._buffer and not self._coalescing:
             # Optimization: try to send now.
             try:
                 n = self._sock.send(data)
             except (BlockingIOError, InterruptedError):
-                pass
+                n = 0
             except Exception as exc:
                 self._fatal_error(exc, 'Fatal write error on socket transport')
                 return
+            if n == len(data):
+                return
+            if isinstance(data, bytes):
+                if n:
+                    # Reference the rest of the data, don't copy it.
+                    data = memoryview(data)[n:]
             else:
-                data = data[n:]
-                if not data:
-                    return
+                data = bytes(memoryview(data)[n:])
             # Not all was written; register write handler.
-            self._loop.add_writer(self._sock_fd, self._write_ready)
+            self._add_writer()
+        else:
+            if not self._buffer:
+                self._schedule_flush()
+            if not isinstance(data, bytes):
+                # The caller may modify a mutable buffer after write().
+                data = bytes(data)
 
         # Add it to the buffer.
-        self._buffer.extend(data)
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        self._maybe_pause_protocol()
+
+    def writelines(self, list_of_data):
+        if self._eof:
+            raise RuntimeError('Cannot call writelines() after write_eof()')
+        if self._empty_waiter is not None:
+            raise RuntimeError('unable to write; sendfile is in progress')
+        if self._conn_lost:
+            if self._conn_lost >= constants.LOG_THRESHOLD_FOR_CONNLOST_WRITES:
+                logger.warning('socket.send() raised exception.')
+            self._conn_lost += 1
+            return
+
+        # Check all the chunks before buffering any of them
+        chunks = []
+        for data in list_of_data:
+            if not isinstance(data, (bytes, bytearray, memoryview)):
+                raise TypeError('data argument must be byte-ish (%r)',
+                                type(data))
+            if data:
+                if not isinstance(data, bytes):
+                    data = bytes(data)
+                chunks.append(data)
+        if not chunks:
+            return
+
+        was_empty = not self._buffer
+        self._buffer.extend(chunks)
+        self._buffer_size += sum(map(len, chunks))
+        if was_empty:
+            if self._coalescing:
+                self._schedule_flush()
+            else:
+                # Send all the chunks with a single system call now.
+                self._write_ready()
+                if self._buffer:
+                    self._add_writer()
         self._maybe_pause_protocol()
 
+    def set_write_coalescing(self, enabled):
+        enabled = bool(enabled)
+        if enabled == self._coalescing:
+            return
+        self._coalescing = enabled
+        if enabled:
+            # Small writes are gathered by the transport: Nagle's
+            # algorithm would only delay them further.
+            self._saved_nodelay = _set_nodelay(self._sock, True)
+        else:
+            self.flush()
+            if self._saved_nodelay is not None:
+                _set_nodelay(self._sock, self._saved_nodelay)
+                self._saved_nodelay = None
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_writes()
+
+    def _schedule_flush(self):
+        # Called when coalesced data is added to an empty buffer.
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_soon(self._flush_writes)
+
+    def _flush_writes(self):
+        self._flush_handle = None
+        if self._buffer and not self._conn_lost:
+            # Send all the chunks with a single system call now.
+            self._write_ready()
+            if self._buffer:
+                self._add_writer()
+
+    def _add_writer(self):
+        self._loop.add_writer(self._sock_fd, self._write_ready)
+        if self._edge_triggered:
+            self._loop._set_edge_triggered(self._sock_fd)
+
+    def _send_buffer(self):
+        # Return the number of bytes sent and the number of bytes offered
+        buffer = self._buffer
+        if _HAS_SENDMSG and len(buffer) > 1:
+            if len(buffer) <= _SC_IOV_MAX:
+                return self._sock.sendmsg(buffer), self._buffer_size
+            chunks = list(itertools.islice(buffer, _SC_IOV_MAX))
+            return self._sock.sendmsg(chunks), sum(map(len, chunks))
+        return self._sock.send(buffer[0]), len(buffer[0])
+
+    def _consume_buffer(self, n):
+        # Drop the n first bytes of the buffer.
+        self._buffer_size -= n
+        buffer = self._buffer
+        while n:
+            chunk = buffer[0]
+            size = len(chunk)
+            if n < size:
+                buffer[0] = memoryview(chunk)[n:]
+                break
+            buffer.popleft()
+            n -= size
+
     def _write_ready(self):
         assert self._buffer, 'Data should not be empty'
 
         try:
-            n = self._sock.send(self._buffer)
+            # A single sendmsg() call takes at most _SC_IOV_MAX chunks:
+            # send again while the socket accepts everything.  In
+            # edge-triggered mode, the socket is only reported writable
+            # again once a send would block.
+            while True:
+                n, offered = self._send_buffer()
+                if n:
+                    self._consume_buffer(n)
+                if n < offered or not self._buffer:
+                    break
         except (BlockingIOError, InterruptedError):
             pass
         except Exception as exc:
             self._loop.remove_writer(self._sock_fd)
             self._buffer.clear()
+            self._buffer_size = 0
             self._fatal_error(exc, 'Fatal write error on socket transport')
-        else:
-            if n:
-                del self._buffer[:n]
-            self._maybe_resume_protocol()  # May append to buffer.
-            if not self._buffer:
-                self._loop.remove_writer(self._sock_fd)
-                if self._closing:
-                    self._call_connection_lost(None)
-                elif self._eof:
-                    self._sock.shutdown(socket.SHUT_WR)
+            if self._empty_waiter is not None:
+                self._empty_waiter.set_exception(exc)
+            return
+        self._maybe_resume_protocol()  # May append to buffer.
+        if not self._buffer:
+            self._loop.remove_writer(self._sock_fd)
+            if self._empty_waiter is not None:
+                self._empty_waiter.set_result(None)
+            if self._closing:
+                self._call_connection_lost(None)
+            elif self._eof:
+                self._sock.shutdown(socket.SHUT_WR)
+
+    def get_write_buffer_size(self):
+        return self._buffer_size
+
+    def _force_close(self, exc):
+        if not self._conn_lost:
+            self._buffer_size = 0
+        super()._force_close(exc)
+
+    def _call_connection_lost(self, exc):
+        super()._call_connection_lost(exc)
+        if self._empty_waiter is not None and not self._empty_waiter.done():
+            self._empty_waiter.set_exception(
+                ConnectionError("Connection is closed by peer"))
+
+    def _make_empty_waiter(self):
+        if self._empty_waiter is not None:
+            raise RuntimeError('Empty waiter is already set')
+        self._empty_waiter = futures.Future(loop=self._loop)
+        if not self._buffer:
+            self._empty_waiter.set_result(None)
+        return self._empty_waiter
+
+    def _reset_empty_waiter(self):
+        self._empty_waiter = None
 
     def write_eof(self):
         if self._eof:
@@ -926,7 +1350,11 @@ class _SelectorSslTransport(_SelectorTransport):
             self._fatal_error(exc, 'Fatal read error on SSL transport')
         else:
             if data:
-                self._protocol.data_received(data)
+                if isinstance(self._protocol, protocols.BufferedProtocol):
+                    protocols._feed_data_to_buffered_proto(self._protocol,
+                                                           data)
+                else:
+                    self._protocol.data_received(data)
             else:
                 try:
                     if self._loop.get_debug():
@@ -1006,9 +1434,16 @@ class _SelectorDatagramTransport(_SelectorTransport):
     _buffer_factory = collections.deque
 
     def __init__(self, loop, sock, protocol, address=None,
-                 waiter=None, extra=None):
+                 waiter=None, extra=None, batch_size=None):
         super().__init__(loop, sock, protocol, extra)
         self._address = address
+        # Maximum number of datagrams read per wakeup, None to pass the
+        # datagrams one by one to datagram_received().
+        self._batch_size = batch_size
+        # Size in bytes of the datagrams of the write buffer, kept up to
+        # date on each change of the buffer: flow control checks it on
+        # every sendto() which buffers.
+        self._buffer_size = 0
         self._loop.call_soon(self._protocol.connection_made, self)
         # only start reading when connection_made() has been called
         self._loop.call_soon(self._loop.add_reader,
@@ -1018,9 +1453,12 @@ class _SelectorDatagramTransport(_SelectorTransport):
             self._loop.call_soon(waiter._set_result_unless_cancelled, None)
 
     def get_write_buffer_size(self):
-        return sum(len(data) for data, _ in self._buffer)
+        return self._buffer_size
 
     def _read_ready(self):
+        if self._batch_size is not None:
+            self._read_batch()
+            return
         try:
             data, addr = self._sock.recvfrom(self.max_size)
         except (BlockingIOError, InterruptedError):
@@ -1032,6 +1470,31 @@ class _SelectorDatagramTransport(_SelectorTransport):
         else:
             self._protocol.datagram_received(data, addr)
 
+    def _read_batch(self):
+        # Drain up to _batch_size datagrams, then pass them to the
+        # protocol in a single call.
+        datagrams = []
+        recvfrom = self._sock.recvfrom
+        max_size = self.max_size
+        error = fatal = None
+        for i in range(self._batch_size):
+            try:
+                datagrams.append(recvfrom(max_size))
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                error = exc
+                break
+            except Exception as exc:
+                fatal = exc
+                break
+        if datagrams:
+            self._protocol.datagrams_received(datagrams)
+        if error is not None:
+            self._protocol.error_received(error)
+        elif fatal is not None:
+            self._fatal_error(fatal, 'Fatal read error on datagram transport')
+
     def sendto(self, data, addr=None):
         if not isinstance(data, (bytes, bytearray, memoryview)):
             raise TypeError('data argument must be byte-ish (%r)',
@@ -1068,12 +1531,51 @@ class _SelectorDatagramTransport(_SelectorTransport):
                 return
 
         # Ensure that what we buffer is immutable.
-        self._buffer.append((bytes(data), addr))
+        data = bytes(data)
+        self._buffer.append((data, addr))
+        self._buffer_size += len(data)
+        self._maybe_pause_protocol()
+
+    def sendto_batch(self, datagrams):
+        if self._conn_lost:
+            if self._conn_lost >= constants.LOG_THRESHOLD_FOR_CONNLOST_WRITES:
+                logger.warning('socket.send() raised exception.')
+            self._conn_lost += 1
+            return
+
+        batch = []
+        size = 0
+        for data, addr in datagrams:
+            if not isinstance(data, (bytes, bytearray, memoryview)):
+                raise TypeError('data argument must be byte-ish (%r)',
+                                type(data))
+            if not data:
+                continue
+            if self._address and addr not in (None, self._address):
+                raise ValueError('Invalid address: must be None or %s' %
+                                 (self._address,))
+            # Ensure that what we buffer is immutable.
+            data = bytes(data)
+            batch.append((data, addr))
+            size += len(data)
+        if not batch:
+            return
+
+        was_empty = not self._buffer
+        self._buffer.extend(batch)
+        self._buffer_size += size
+        if was_empty:
+            # Send the whole batch now, and wait for the socket to be
+            # writable if it is full.
+            self._sendto_ready()
+            if self._buffer:
+                self._loop.add_writer(self._sock_fd, self._sendto_ready)
         self._maybe_pause_protocol()
 
     def _sendto_ready(self):
         while self._buffer:
             data, addr = self._buffer.popleft()
+            self._buffer_size -= len(data)
             try:
                 if self._address:
                     self._sock.send(data)
@@ -1081,6 +1583,7 @@ class _SelectorDatagramTransport(_SelectorTransport):
                     self._sock.sendto(data, addr)
             except (BlockingIOError, InterruptedError):
                 self._buffer.appendleft((data, addr))  # Try again later.
+                self._buffer_size += len(data)
                 break
             except OSError as exc:
                 self._protocol.error_received(exc)
@@ -1095,3 +1598,8 @@ class _SelectorDatagramTransport(_SelectorTransport):
             self._loop.remove_writer(self._sock_fd)
             if self._closing:
                 self._call_connection_lost(None)
+
+    def _force_close(self, exc):
+        if not self._conn_lost:
+            self._buffer_size = 0
+        super()._force_close(exc)
@@ -50,6 +50,90 @@ SelectorKey = namedtuple('SelectorKey', ['fileobj', 'fd', 'events', 'data'])
 selected event mask and attached data."""
 
 
+# File descriptors below this limit are stored in the list of _FdKeyTable,
+# the others in a dict (SOCKET handles on Windows are not small integers).
+_FD_TABLE_LIMIT = 1 << 16
+
+
+class _FdKeyTable:
+    """Table of selector keys indexed by file descriptor.
+
+    Keys of small file descriptors are stored in a list at the index of
+    their file descriptor: lookups don't hash.  The table supports the
+    subset of the dict API used by the selectors.
+    """
+
+    __slots__ = ('_keys', '_large', '_len')
+
+    def __init__(self):
+        self._keys = []
+        self._large = {}
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, fd):
+        return self.get(fd) is not None
+
+    def get(self, fd, default=None):
+        keys = self._keys
+        if 0 <= fd < len(keys):
+            key = keys[fd]
+            if key is not None:
+                return key
+            return default
+        return self._large.get(fd, default)
+
+    def __getitem__(self, fd):
+        key = self.get(fd)
+        if key is None:
+            raise KeyError(fd)
+        return key
+
+    def __setitem__(self, fd, key):
+        if fd >= _FD_TABLE_LIMIT:
+            if fd not in self._large:
+                self._len += 1
+            self._large[fd] = key
+            return
+        keys = self._keys
+        if fd >= len(keys):
+            # Grow geometrically to keep registration amortized O(1).
+            size = min(max(fd + 1, 2 * len(keys)), _FD_TABLE_LIMIT)
+            keys.extend([None] * (size - len(keys)))
+        if keys[fd] is None:
+            self._len += 1
+        keys[fd] = key
+
+    def pop(self, fd):
+        keys = self._keys
+        if 0 <= fd < len(keys):
+            key = keys[fd]
+            if key is None:
+                raise KeyError(fd)
+            keys[fd] = None
+        else:
+            key = self._large.pop(fd)
+        self._len -= 1
+        return key
+
+    def values(self):
+        for key in self._keys:
+            if key is not None:
+                yield key
+        yield from self._large.values()
+
+    def __iter__(self):
+        for key in self.values():
+            yield key.fd
+
+    def clear(self):
+        self._keys = []
+        self._large.clear()
+        self._len = 0
+
+
 class _SelectorMapping(Mapping):
     """Mapping of file objects to selector keys."""
 
@@ -201,7 +285,7 @@ class _BaseSelectorImpl(BaseSelector):
 
     def __init__(self):
         # this maps file descriptors to keys
-        self._fd_to_key = {}
+        self._fd_to_key = _FdKeyTable()
         # read-only mapping returned by get_map()
         self._map = _SelectorMapping(self)
 
@@ -245,20 +329,23 @@ class _BaseSelectorImpl(BaseSelector):
         return key
 
     def modify(self, fileobj, events, data=None):
-        # TODO: Subclasses can probably optimize this even further.
         try:
             key = self._fd_to_key[self._fileobj_lookup(fileobj)]
         except KeyError:
             raise KeyError("{!r} is not registered".format(fileobj)) from None
         if events != key.events:
-            self.unregister(fileobj)
-            key = self.register(fileobj, events, data)
+            key = self._modify_events(fileobj, key, events, data)
         elif data != key.data:
             # Use a shortcut to update the data.
-            key = key._replace(data=data)
+            key = SelectorKey(key.fileobj, key.fd, events, data)
             self._fd_to_key[key.fd] = key
         return key
 
+    def _modify_events(self, fileobj, key, events, data):
+        # Subclasses can change the events in place.
+        self.unregister(fileobj)
+        return self.register(fileobj, events, data)
+
     def close(self):
         self._fd_to_key.clear()
         self._map = None
@@ -275,10 +362,7 @@ class _BaseSelectorImpl(BaseSelector):
         Returns:
         corresponding key, or None if not found
         """
-        try:
-            return self._fd_to_key[fd]
-        except KeyError:
-            return None
+        return self._fd_to_key.get(fd)
 
 
 class SelectSelector(_BaseSelectorImpl):
@@ -356,6 +440,19 @@ if hasattr(select, 'poll'):
             self._poll.unregister(key.fd)
             return key
 
+        def _modify_events(self, fileobj, key, events, data):
+            if (not events) or (events & ~(EVENT_READ | EVENT_WRITE)):
+                raise ValueError("Invalid events: {!r}".format(events))
+            poll_events = 0
+            if events & EVENT_READ:
+                poll_events |= select.POLLIN
+            if events & EVENT_WRITE:
+                poll_events |= select.POLLOUT
+            self._poll.modify(key.fd, poll_events)
+            key = SelectorKey(fileobj, key.fd, events, data)
+            self._fd_to_key[key.fd] = key
+            return key
+
         def select(self, timeout=None):
             if timeout is None:
                 timeout = None
@@ -386,11 +483,20 @@ if hasattr(select, 'poll'):
 if hasattr(select, 'epoll'):
 
     class EpollSelector(_BaseSelectorImpl):
-        """Epoll-based selector."""
+        """Epoll-based selector.
+
+        File descriptors are level-triggered, unless set_edge_triggered()
+        is called on them.
+        """
 
         def __init__(self):
             super().__init__()
             self._epoll = select.epoll()
+            # fd -> events seen ready but not reported yet, for the
+            # edge-triggered file descriptors
+            self._edge_pending = {}
+            # edge-triggered fds which may have events to report
+            self._edge_ready = set()
 
         def fileno(self):
             return self._epoll.fileno()
@@ -407,6 +513,8 @@ if hasattr(select, 'epoll'):
 
         def unregister(self, fileobj):
             key = super().unregister(fileobj)
+            self._edge_pending.pop(key.fd, None)
+            self._edge_ready.discard(key.fd)
             try:
                 self._epoll.unregister(key.fd)
             except OSError:
@@ -415,7 +523,62 @@ if hasattr(select, 'epoll'):
                 pass
             return key
 
+        def _modify_events(self, fileobj, key, events, data):
+            if (not events) or (events & ~(EVENT_READ | EVENT_WRITE)):
+                raise ValueError("Invalid events: {!r}".format(events))
+            fd = key.fd
+            if fd in self._edge_pending:
+                # The kernel watches both directions: only the key changes.
+                if self._edge_pending[fd] & events:
+                    self._edge_ready.add(fd)
+            else:
+                epoll_events = 0
+                if events & EVENT_READ:
+                    epoll_events |= select.EPOLLIN
+                if events & EVENT_WRITE:
+                    epoll_events |= select.EPOLLOUT
+                try:
+                    self._epoll.modify(fd, epoll_events)
+                except OSError:
+                    # The FD was closed since it was registered: let
+                    # register() report the error.
+                    return super()._modify_events(fileobj, key, events,
+                                                  data)
+            key = SelectorKey(fileobj, fd, events, data)
+            self._fd_to_key[fd] = key
+            return key
+
+        def set_edge_triggered(self, fileobj):
+            """Switch a registered file object to edge-triggered mode.
+
+            The kernel then watches the file object for both reading and
+            writing until it is unregistered, and modify() no longer
+            makes a system call.  Readiness is tracked in user space: an
+            event is reported once, when the key asks for it.  Once it
+            has been reported, the caller must read or write until the
+            call would block, or call mark_ready().
+            """
+            key = self.get_key(fileobj)
+            if key.fd in self._edge_pending:
+                return
+            self._epoll.modify(key.fd, select.EPOLLIN | select.EPOLLOUT |
+                                       select.EPOLLET)
+            self._edge_pending[key.fd] = 0
+
+        def mark_ready(self, fileobj, events):
+            """Report events of an edge-triggered file object again.
+
+            Used when the caller stopped before the call would block:
+            the kernel would not report the file object again.
+            """
+            fd = self.get_key(fileobj).fd
+            self._edge_pending[fd] |= events
+            self._edge_ready.add(fd)
+
         def select(self, timeout=None):
+            if self._edge_ready:
+                # Some events are known to be ready: don't block.
+                timeout = 0
             if timeout is None:
                 timeout = -1
             elif timeout <= 0:
@@ -435,6 +598,8 @@ if hasattr(select, 'epoll'):
                 fd_event_list = self._epoll.poll(timeout, max_ev)
             except InterruptedError:
                 return ready
+            edge_pending = self._edge_pending
+            get_key = self._fd_to_key.get
             for fd, event in fd_event_list:
                 events = 0
                 if event & ~select.EPOLLIN:
@@ -442,9 +607,25 @@ if hasattr(select, 'epoll'):
                 if event & ~select.EPOLLOUT:
                     events |= EVENT_READ
 
-                key = self._key_from_fd(fd)
+                if fd in edge_pending:
+                    edge_pending[fd] |= events
+                    self._edge_ready.add(fd)
+                    continue
+                key = get_key(fd)
                 if key:
                     ready.append((key, events & key.events))
+
+            if self._edge_ready:
+                edge_ready = self._edge_ready
+                self._edge_ready = set()
+                for fd in edge_ready:
+                    key = self._fd_to_key[fd]
+                    events = edge_pending[fd] & key.events
+                    if events:
+                        # Events not asked for stay pending until
+                        # modify() asks for them.
+                        edge_pending[fd] &= ~events
+                        ready.append((key, events))
             return ready
 
         def close(self):
@@ -37,6 +37,11 @@ def _is_sslproto_available():
     return hasattr(ssl, "MemoryBIO")
 
 
+# Application buffers smaller than a TLS record (16 KiB of plaintext)
+# queued together are joined before being encrypted.
+_WRITE_COALESCE_SIZE = 16 * 1024
+
+
 # States of an _SSLPipe.
 _UNWRAPPED = "UNWRAPPED"
 _DO_HANDSHAKE = "DO_HANDSHAKE"
@@ -63,8 +68,11 @@ class _SSLPipe(object):
     """
 
     max_size = 256 * 1024   # Buffer size passed to read()
+    # Initial size of the buffer receiving the plaintext, a TLS record
+    read_buffer_size = 16 * 1024
 
-    def __init__(self, context, server_side, server_hostname=None):
+    def __init__(self, context, server_side, server_hostname=None,
+                 session=None):
         """
         The *context* argument specifies the ssl.SSLContext to use.
 
@@ -74,13 +82,18 @@ class _SSLPipe(object):
         The optional *server_hostname* argument can be used to specify the
         hostname you are connecting to. You may only specify this parameter if
         the _ssl module supports Server Name Indication (SNI).
+
+        The optional *session* argument is an ssl.SSLSession of a previous
+        connection to resume during the handshake (Python 3.6 and newer).
         """
         self._context = context
         self._server_side = server_side
         self._server_hostname = server_hostname
+        self._session = session
         self._state = _UNWRAPPED
         self._incoming = ssl.MemoryBIO()
         self._outgoing = ssl.MemoryBIO()
+        self._read_buffer = bytearray(self.read_buffer_size)
         self._sslobj = None
         self._need_ssldata = False
         self._handshake_cb = None
@@ -125,10 +138,14 @@ class _SSLPipe(object):
         """
         if self._state != _UNWRAPPED:
             raise RuntimeError('handshake in progress or completed')
+        kwargs = {}
+        if self._session is not None:
+            kwargs['session'] = self._session
         self._sslobj = self._context.wrap_bio(
             self._incoming, self._outgoing,
             server_side=self._server_side,
-            server_hostname=self._server_hostname)
+            server_hostname=self._server_hostname,
+            **kwargs)
         self._state = _DO_HANDSHAKE
         self._handshake_cb = callback
         ssldata, appdata = self.feed_ssldata(b'', only_handshake=True)
@@ -207,11 +224,7 @@ class _SSLPipe(object):
 
             if self._state == _WRAPPED:
                 # Main state: read data from SSL until close_notify
-                while True:
-                    chunk = self._sslobj.read(self.max_size)
-                    appdata.append(chunk)
-                    if not chunk:  # close_notify
-                        break
+                self._read_appdata(appdata)
 
             elif self._state == _SHUTDOWN:
                 # Call shutdown() until it doesn't raise anymore.
@@ -239,6 +252,33 @@ class _SSLPipe(object):
             ssldata.append(self._outgoing.read())
         return (ssldata, appdata)
 
+    def _read_appdata(self, appdata):
+        # Decrypt all the available plaintext into the read buffer, which
+        # is reused from one call to the next, and add it to appdata as a
+        # single chunk (one per max_size bytes).  An empty chunk is added
+        # for close_notify.
+        buf = self._read_buffer
+        pos = 0
+        try:
+            while True:
+                if pos == len(buf):
+                    if pos < self.max_size:
+                        # Grow the buffer up to max_size
+                        buf.extend(bytes(min(pos, self.max_size - pos)))
+                    else:
+                        appdata.append(bytes(buf))
+                        pos = 0
+                with memoryview(buf) as view:
+                    n = self._sslobj.read(len(buf) - pos, view[pos:])
+                if not n:  # close_notify
+                    break
+                pos += n
+        finally:
+            if pos:
+                with memoryview(buf) as view:
+                    appdata.append(bytes(view[:pos]))
+        appdata.append(b'')
+
     def feed_appdata(self, data, offset=0):
         """Feed plaintext data into the pipe.
 
@@ -303,6 +343,19 @@ class _SSLProtocolTransport(transports._FlowControlMixin,
         """Get optional transport information."""
         return self._ssl_protocol._get_extra_info(name, default)
 
+    def set_protocol(self, protocol):
+        self._app_protocol = protocol
+        self._ssl_protocol._app_protocol = protocol
+
+    def get_protocol(self):
+        return self._app_protocol
+
+    @property
+    def _protocol_paused(self):
+        # SSLProtocol forwards the flow control of the transport below it
+        # to the app protocol.
+        return self._ssl_protocol._transport._protocol_paused
+
     def close(self):
         """Close the transport.
 
@@ -377,6 +430,35 @@ class _SSLProtocolTransport(transports._FlowControlMixin,
             return
         self._ssl_protocol._write_appdata(data)
 
+    def set_write_coalescing(self, enabled):
+        """Enable or disable the coalescing of writes.
+
+        When enabled, the writes issued during an iteration of the event
+        loop are encrypted together by a callback scheduled with
+        call_soon(), or when flush() is called.
+        """
+        self._ssl_protocol._set_write_coalescing(enabled)
+
+    def flush(self):
+        """Encrypt and send the data buffered by write coalescing now."""
+        self._ssl_protocol._flush_writes()
+
+    def writelines(self, list_of_data):
+        """Write a list (or any iterable) of data bytes to the transport.
+
+        The buffers are queued without being joined first, and are
+        encrypted together: the small ones end up in the same records.
+        """
+        list_of_data = list(list_of_data)
+        for data in list_of_data:
+            if not isinstance(data, (bytes, bytearray, memoryview)):
+                raise TypeError("data: expecting a bytes-like instance, "
+                                "got {!r}".format(type(data).__name__))
+        # An empty buffer means shutdown in the backlog.
+        list_of_data = [data for data in list_of_data if data]
+        if list_of_data:
+            self._ssl_protocol._write_appdata(*list_of_data)
+
     def can_write_eof(self):
         """Return True if this transport supports write_eof(), False if not."""
         return False
@@ -391,6 +473,69 @@ class _SSLProtocolTransport(transports._FlowControlMixin,
         self._ssl_protocol._abort()
 
 
+#########################################
+#        TLS 会话缓存(客户端)
+#
+# 说明:
+#   - 按 (SSL 上下文, 服务器名或对端地址) 保存 SSLSession
+#   - 重连时恢复会话, 避免完整握手
+#
+#########################################
+class SSLSessionCache:
+    """Cache of the TLS sessions of client connections.
+
+    Install a cache on an event loop with
+    BaseEventLoop.set_ssl_session_cache(): the client connections of the
+    loop then offer the session of the previous connection to the same
+    server, if any, to skip the full handshake.  A session is stored per
+    SSL context and server: the server_hostname of the connection, or
+    the address of the peer.  At most *maxsize* sessions are kept, the
+    least recently used ones are dropped first.
+
+    The hits attribute counts the handshakes which resumed a session,
+    misses the full handshakes.  Resuming sessions requires Python 3.6.
+    """
+
+    def __init__(self, maxsize=256):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1, got %r'
+                             % (maxsize,))
+        self._maxsize = maxsize
+        self._sessions = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return ('<%s sessions=%s hits=%s misses=%s>'
+                % (self.__class__.__name__, len(self),
+                   self.hits, self.misses))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key):
+        """Return the session stored for key, or None."""
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+        return session
+
+    def put(self, key, session):
+        """Store the session of key."""
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        if len(self._sessions) > self._maxsize:
+            self._sessions.popitem(last=False)
+
+    def discard(self, key):
+        """Forget the session of key, if any."""
+        self._sessions.pop(key, None)
+
+    def clear(self):
+        """Forget all the sessions."""
+        self._sessions.clear()
+
+
 class SSLProtocol(protocols.Protocol):
     """SSL protocol.
 
@@ -399,7 +544,8 @@ class SSLProtocol(protocols.Protocol):
     """
 
     def __init__(self, loop, app_protocol, sslcontext, waiter,
-                 server_side=False, server_hostname=None):
+                 server_side=False, server_hostname=None,
+                 session_cache=None):
         if ssl is None:
             raise RuntimeError('stdlib ssl module not available')
 
@@ -412,6 +558,11 @@ class SSLProtocol(protocols.Protocol):
         else:
             self._server_hostname = None
         self._sslcontext = sslcontext
+        # Sessions are only resumed by clients
+        if server_side or not hasattr(ssl, 'SSLSession'):
+            session_cache = None
+        self._session_cache = session_cache
+        self._session_key = None
         # SSL-specific extra info. More info are set when the handshake
         # completes.
         self._extra = dict(sslcontext=sslcontext)
@@ -419,6 +570,12 @@ class SSLProtocol(protocols.Protocol):
         # App data write buffering
         self._write_backlog = collections.deque()
         self._write_buffer_size = 0
+        # True after a short write: the head of the backlog must be
+        # retried as is.
+        self._write_retry = False
+        # Write coalescing: the backlog is processed by a callback
+        self._coalescing = False
+        self._flush_handle = None
 
         self._waiter = waiter
         self._loop = loop
@@ -447,9 +604,16 @@ class SSLProtocol(protocols.Protocol):
         Start the SSL handshake.
         """
         self._transport = transport
+        session = None
+        if self._session_cache is not None:
+            server = (self._server_hostname or
+                      transport.get_extra_info('peername'))
+            self._session_key = (self._sslcontext, server)
+            session = self._session_cache.get(self._session_key)
         self._sslpipe = _SSLPipe(self._sslcontext,
                                  self._server_side,
-                                 self._server_hostname)
+                                 self._server_hostname,
+                                 session=session)
         self._start_handshake()
 
     def connection_lost(self, exc):
@@ -461,6 +625,7 @@ class SSLProtocol(protocols.Protocol):
         """
         if self._session_established:
             self._session_established = False
+            self._store_session()
             self._loop.call_soon(self._app_protocol.connection_lost, exc)
         self._transport = None
         self._app_transport = None
@@ -491,12 +656,16 @@ class SSLProtocol(protocols.Protocol):
             self._abort()
             return
 
-        for chunk in ssldata:
-            self._transport.write(chunk)
+        if ssldata:
+            self._transport.writelines(ssldata)
 
         for chunk in appdata:
             if chunk:
-                self._app_protocol.data_received(chunk)
+                if isinstance(self._app_protocol, protocols.BufferedProtocol):
+                    protocols._feed_data_to_buffered_proto(
+                        self._app_protocol, chunk)
+                else:
+                    self._app_protocol.data_received(chunk)
             else:
                 self._start_shutdown()
                 break
@@ -529,15 +698,46 @@ class SSLProtocol(protocols.Protocol):
         else:
             return self._transport.get_extra_info(name, default)
 
+    def _store_session(self):
+        # Save the session of the connection for the next one to the same
+        # server.  It is saved again before the connection is closed:
+        # with TLS 1.3, the session ticket comes after the handshake.
+        if self._session_cache is None or self._sslpipe is None:
+            return
+        sslobj = self._sslpipe.ssl_object
+        if sslobj is not None and sslobj.session is not None:
+            self._session_cache.put(self._session_key, sslobj.session)
+
     def _start_shutdown(self):
         if self._in_shutdown:
             return
         self._in_shutdown = True
+        if self._session_established:
+            self._store_session()
         self._write_appdata(b'')
 
-    def _write_appdata(self, data):
-        self._write_backlog.append((data, 0))
-        self._write_buffer_size += len(data)
+    def _write_appdata(self, *list_of_data):
+        for data in list_of_data:
+            self._write_backlog.append((data, 0))
+            self._write_buffer_size += len(data)
+        if self._coalescing and list_of_data[-1]:
+            # Wait for the other writes of the iteration; the shutdown
+            # (an empty buffer) is processed at once.
+            if self._flush_handle is None:
+                self._flush_handle = self._loop.call_soon(self._flush_writes)
+            return
+        self._process_write_backlog()
+
+    def _set_write_coalescing(self, enabled):
+        self._coalescing = bool(enabled)
+        if not self._coalescing:
+            self._flush_writes()
+
+    def _flush_writes(self):
+        if self._flush_handle is None:
+            return
+        self._flush_handle.cancel()
+        self._flush_handle = None
         self._process_write_backlog()
 
     def _start_handshake(self):
@@ -568,6 +768,9 @@ class SSLProtocol(protocols.Protocol):
                 and self._sslcontext.verify_mode != ssl.CERT_NONE):
                     ssl.match_hostname(peercert, self._server_hostname)
         except BaseException as exc:
+            if self._session_cache is not None:
+                # Don't offer the session again if it caused the failure
+                self._session_cache.discard(self._session_key)
             if self._loop.get_debug():
                 if isinstance(exc, ssl.CertificateError):
                     logger.warning("%r: SSL handshake failed "
@@ -592,6 +795,12 @@ class SSLProtocol(protocols.Protocol):
                            cipher=sslobj.cipher(),
                            compression=sslobj.compression(),
                            )
+        if self._session_cache is not None:
+            if sslobj.session_reused:
+                self._session_cache.hits += 1
+            else:
+                self._session_cache.misses += 1
+            self._store_session()
         self._app_protocol.connection_made(self._app_transport)
         self._wakeup_waiter()
         self._session_established = True
@@ -602,28 +811,54 @@ class SSLProtocol(protocols.Protocol):
         # reentrant.
         self._loop.call_soon(self._process_write_backlog)
 
+    def _coalesce_write_backlog(self):
+        # Join the small application buffers at the head of the backlog,
+        # so that they are encrypted with a single SSL write into full
+        # records instead of one record each.  The joined buffer replaces
+        # them in the backlog: a short write must be retried with it.
+        backlog = self._write_backlog
+        size = 0
+        count = 0
+        for data, offset in backlog:
+            if (not data or offset or
+                    size + len(data) > _WRITE_COALESCE_SIZE):
+                break
+            size += len(data)
+            count += 1
+        if count < 2:
+            return
+        data = b''.join([backlog.popleft()[0] for i in range(count)])
+        backlog.appendleft((data, 0))
+
     def _process_write_backlog(self):
         # Try to make progress on the write backlog.
         if self._transport is None:
             return
 
+        backlog = self._write_backlog
+        # The records produced for the whole backlog are passed to the
+        # transport in a single writelines() call.
+        ssldata = []
         try:
-            for i in range(len(self._write_backlog)):
-                data, offset = self._write_backlog[0]
+            while backlog:
+                data, offset = backlog[0]
                 if data:
-                    ssldata, offset = self._sslpipe.feed_appdata(data, offset)
+                    if not self._write_retry:
+                        self._coalesce_write_backlog()
+                        data, offset = backlog[0]
+                    chunks, offset = self._sslpipe.feed_appdata(data, offset)
                 elif offset:
-                    ssldata = self._sslpipe.do_handshake(self._on_handshake_complete)
+                    chunks = self._sslpipe.do_handshake(
+                        self._on_handshake_complete)
                     offset = 1
                 else:
-                    ssldata = self._sslpipe.shutdown(self._finalize)
+                    chunks = self._sslpipe.shutdown(self._finalize)
                     offset = 1
-
-                for chunk in ssldata:
-                    self._transport.write(chunk)
+                ssldata.extend(chunks)
 
                 if offset < len(data):
-                    self._write_backlog[0] = (data, offset)
+                    backlog[0] = (data, offset)
+                    self._write_retry = True
                     # A short write means that a write is blocked on a read
                     # We need to enable reading if it is paused!
                     assert self._sslpipe.need_ssldata
@@ -633,13 +868,17 @@ class SSLProtocol(protocols.Protocol):
 
                 # An entire chunk from the backlog was processed. We can
                 # delete it and reduce the outstanding buffer size.
-                del self._write_backlog[0]
+                backlog.popleft()
+                self._write_retry = False
                 self._write_buffer_size -= len(data)
         except BaseException as exc:
             if self._in_handshake:
                 self._on_handshake_complete(exc)
             else:
                 self._fatal_error(exc, 'Fatal error on SSL transport')
+        else:
+            if ssldata:
+                self._transport.writelines(ssldata)
 
     def _fatal_error(self, exc, message='Fatal error on transport'):
         # Should be called from exception handler only.
@@ -2,10 +2,13 @@
 
 __all__ = ['StreamReader', 'StreamWriter', 'StreamReaderProtocol',
            'open_connection', 'start_server',
-           'IncompleteReadError',
+           'IncompleteReadError', 'LimitOverrunError',
            ]
 
 import socket
+import struct
+import sys
+import types
 
 if hasattr(socket, 'AF_UNIX'):
     __all__.extend(['open_unix_connection', 'start_unix_server'])
@@ -14,12 +17,16 @@ from . import coroutines
 from . import events
 from . import futures
 from . import protocols                 # 协议接口
+from . import tasks
 from .coroutines import coroutine
 from .log import logger
 
 
 _DEFAULT_LIMIT = 2**16
 
+# Asynchronous iterators, with __aiter__() returning the iterator itself
+_PY352 = sys.version_info >= (3, 5, 2)
+
 
 class IncompleteReadError(EOFError):
     """
@@ -35,6 +42,18 @@ class IncompleteReadError(EOFError):
         self.expected = expected
 
 
+class LimitOverrunError(Exception):
+    """Reached the buffer limit while looking for a separator.
+
+    Attributes:
+
+    - consumed: total number of to be consumed bytes
+    """
+    def __init__(self, message, consumed):
+        super().__init__(message)
+        self.consumed = consumed
+
+
 @coroutine
 def open_connection(host=None, port=None, *,
                     loop=None, limit=_DEFAULT_LIMIT, **kwds):
@@ -197,23 +216,30 @@ class FlowControlMixin(protocols.Protocol):
             raise ConnectionResetError('Connection lost')
         if not self._paused:
             return
+        # All the tasks draining the same connection wait for the same
+        # future.  It is shielded so that cancelling one of them does not
+        # cancel the others.
         waiter = self._drain_waiter
-        assert waiter is None or waiter.cancelled()
-        waiter = futures.Future(loop=self._loop)
-        self._drain_waiter = waiter
-        yield from waiter
+        if waiter is None or waiter.cancelled():
+            waiter = futures.Future(loop=self._loop)
+            self._drain_waiter = waiter
+        yield from tasks.shield(waiter, loop=self._loop)
 
 
 #
 # 数据流协议:
 #
-class StreamReaderProtocol(FlowControlMixin, protocols.Protocol):
+class StreamReaderProtocol(FlowControlMixin, protocols.BufferedProtocol):
     """Helper class to adapt between Protocol and StreamReader.
 
     (This is a helper class instead of making StreamReader itself a
     Protocol subclass, because the StreamReader has other potential
     uses, and to prevent the user of the StreamReader to accidentally
     call inappropriate methods of the protocol.)
+
+    The transport receives data directly into the buffer of the
+    StreamReader with get_buffer() and buffer_updated().
+    data_received() is kept for the transports which call it.
     """
 
     def __init__(self, stream_reader, client_connected_cb=None, loop=None):
@@ -240,6 +266,12 @@ class StreamReaderProtocol(FlowControlMixin, protocols.Protocol):
             self._stream_reader.set_exception(exc)
         super().connection_lost(exc)
 
+    def get_buffer(self, sizehint):
+        return self._stream_reader._get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self._stream_reader._buffer_updated(nbytes)
+
     def data_received(self, data):
         self._stream_reader.feed_data(data)
 
@@ -264,6 +296,7 @@ class StreamWriter:
         assert reader is None or isinstance(reader, StreamReader)
         self._reader = reader
         self._loop = loop
+        self._coalescing = False
 
     def __repr__(self):
         info = [self.__class__.__name__, 'transport=%r' % self._transport]
@@ -281,6 +314,16 @@ class StreamWriter:
     def writelines(self, data):
         self._transport.writelines(data)
 
+    def set_write_coalescing(self, enabled):
+        """Enable or disable the coalescing of writes.
+
+        When enabled, the data of the writes issued during an iteration
+        of the event loop is sent together on the next iteration, or
+        when drain() is called.  See WriteTransport.set_write_coalescing().
+        """
+        self._transport.set_write_coalescing(enabled)
+        self._coalescing = bool(enabled)
+
     def write_eof(self):
         return self._transport.write_eof()
 
@@ -306,7 +349,174 @@ class StreamWriter:
             exc = self._reader.exception()
             if exc is not None:
                 raise exc
-        yield from self._protocol._drain_helper()
+        if self._coalescing:
+            self._transport.flush()
+        protocol = self._protocol
+        # Fast path: nothing to wait for while writing is not paused.
+        if protocol._paused or protocol._connection_lost:
+            yield from protocol._drain_helper()
+
+
+#
+# 读缓冲区:
+#   - 从头部消费只移动 _start, 不做 memmove
+#   - 已消费部分不小于剩余数据时才整体压缩(均摊 O(1))
+#
+class _StreamBuffer:
+    """Receive buffer of a StreamReader.
+
+    The buffered data is self._buf[self._start:self._end]; the bytes
+    after self._end are spare room which reserve() lends to the
+    transport to receive data directly into the buffer.  Consuming data
+    only moves self._start forward; the consumed bytes are deleted once
+    they are at least as large as the remaining data, so that each byte
+    is moved at most once on average instead of once per read.
+    """
+
+    __slots__ = ('_buf', '_start', '_end', '_view', '_keep')
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._start = 0
+        self._end = 0
+        # Memoryview returned by the last reserve() call
+        self._view = None
+        # Size of the storage kept when the buffer is emptied
+        self._keep = 0
+
+    def __repr__(self):
+        return '<%s size=%s>' % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __eq__(self, other):
+        if isinstance(other, _StreamBuffer):
+            other = other._buf[other._start:other._end]
+        return self._buf[self._start:self._end] == other
+
+    __hash__ = None
+
+    def _release_view(self):
+        # The storage cannot be resized while the memoryview lent by
+        # reserve() is alive.  The transport is done with it once it
+        # called commit().
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+
+    def extend(self, data):
+        end = self._end + len(data)
+        if end <= len(self._buf):
+            self._buf[self._end:end] = data
+        else:
+            self._release_view()
+            del self._buf[self._end:]
+            self._buf.extend(data)
+        self._end = end
+
+    def reserve(self, n):
+        """Return a writable memoryview of n bytes after the data.
+
+        Call commit() with the number of bytes written into it to add
+        them to the data.
+        """
+        self._release_view()
+        if self._end + n > len(self._buf):
+            if self._start:
+                del self._buf[:self._start]
+                self._end -= self._start
+                self._start = 0
+            missing = self._end + n - len(self._buf)
+            if missing > 0:
+                self._buf.extend(bytes(missing))
+        self._keep = max(self._keep, n)
+        with memoryview(self._buf) as view:
+            self._view = view[self._end:self._end + n]
+        return self._view
+
+    def commit(self, n):
+        """Add the first n bytes written into the reserve() buffer."""
+        self._end += n
+
+    def clear(self):
+        self._release_view()
+        if len(self._buf) > self._keep:
+            # Keep room for the next reserve(), not the storage of a
+            # burst of data
+            del self._buf[self._keep:]
+        self._start = 0
+        self._end = 0
+
+    def find(self, sub, start=0):
+        """Return the offset of sub in the data, or -1.
+
+        The search starts at offset start of the data.
+        """
+        index = self._buf.find(sub, self._start + start, self._end)
+        if index >= 0:
+            index -= self._start
+        return index
+
+    def take(self, n):
+        """Remove the first n bytes of the data and return them."""
+        start = self._start
+        end = min(start + n, self._end)
+        with memoryview(self._buf) as view:
+            data = bytes(view[start:end])
+        if end == self._end:
+            self.clear()
+        else:
+            self._consume(end)
+        return data
+
+    def take_into(self, view):
+        """Move the first bytes of the data into the memoryview view.
+
+        Return the number of bytes moved.
+        """
+        start = self._start
+        n = min(len(view), self._end - start)
+        with memoryview(self._buf) as data:
+            view[:n] = data[start:start + n]
+        if start + n == self._end:
+            self.clear()
+        else:
+            self._consume(start + n)
+        return n
+
+    def peek(self, n):
+        """Return the first n bytes of the data without removing them."""
+        with memoryview(self._buf) as view:
+            return bytes(view[self._start:min(self._start + n, self._end)])
+
+    def take_view(self, n):
+        """Remove the first n bytes of the data, return them as a memoryview.
+
+        If they are all the data, the memoryview wraps the storage of the
+        buffer, which then starts a new one: nothing is copied.
+        """
+        start = self._start
+        end = start + n
+        if end < self._end:
+            return memoryview(self.take(n))
+        self._release_view()
+        buf = self._buf
+        end = self._end
+        self._buf = bytearray()
+        self._start = 0
+        self._end = 0
+        with memoryview(buf) as view:
+            return view[start:end]
+
+    def _consume(self, end):
+        if end >= self._end - end:
+            self._release_view()
+            del self._buf[:end]
+            self._end -= end
+            self._start = 0
+        else:
+            self._start = end
 
 
 class StreamReader:
@@ -319,12 +529,14 @@ class StreamReader:
             self._loop = events.get_event_loop()
         else:
             self._loop = loop
-        self._buffer = bytearray()
+        self._buffer = _StreamBuffer()
         self._eof = False    # Whether we're done.
         self._waiter = None  # A future used by _wait_for_data()
         self._exception = None
         self._transport = None
         self._paused = False
+        # Size of the buffer awaited by _wait_for_size(), 0 if none
+        self._wanted = 0
 
     def exception(self):
         return self._exception
@@ -370,11 +582,31 @@ class StreamReader:
             return
 
         self._buffer.extend(data)
-        self._wakeup_waiter()
+        self._data_added()
+
+    def _get_buffer(self, sizehint):
+        # Called by StreamReaderProtocol.get_buffer(): lend the spare
+        # room of the buffer, at most the limit of the stream.
+        if not 0 < sizehint <= self._limit:
+            sizehint = self._limit
+        return self._buffer.reserve(sizehint)
+
+    def _buffer_updated(self, nbytes):
+        # Called by StreamReaderProtocol.buffer_updated()
+        assert not self._eof, 'buffer_updated after feed_eof'
+
+        self._buffer.commit(nbytes)
+        self._data_added()
+
+    def _data_added(self):
+        size = len(self._buffer)
+        if size >= self._wanted:
+            self._wakeup_waiter()
 
         if (self._transport is not None and
             not self._paused and
-            len(self._buffer) > 2*self._limit):
+            size > 2*self._limit and
+            size >= self._wanted):
             try:
                 self._transport.pause_reading()
             except NotImplementedError:
@@ -401,38 +633,210 @@ class StreamReader:
         finally:
             self._waiter = None
 
+    @coroutine
+    def _wait_for_size(self, n, func_name):
+        """Wait until the buffer holds n bytes or EOF is reached.
+
+        The waiter is only woken up once the n bytes are there, and the
+        transport is not paused before, even if n is larger than the
+        pause limit of the buffer.
+        """
+        if len(self._buffer) >= n or self._eof:
+            return
+        if self._paused:
+            self._paused = False
+            self._transport.resume_reading()
+        self._wanted = n
+        try:
+            while len(self._buffer) < n and not self._eof:
+                yield from self._wait_for_data(func_name)
+        finally:
+            self._wanted = 0
+
     @coroutine
     def readline(self):
         if self._exception is not None:
             raise self._exception
 
-        line = bytearray()
-        not_enough = True
-
-        while not_enough:
-            while self._buffer and not_enough:
-                ichar = self._buffer.find(b'\n')
-                if ichar < 0:
-                    line.extend(self._buffer)
-                    self._buffer.clear()
-                else:
-                    ichar += 1
-                    line.extend(self._buffer[:ichar])
-                    del self._buffer[:ichar]
-                    not_enough = False
-
-                if len(line) > self._limit:
-                    self._maybe_resume_transport()
-                    raise ValueError('Line is too long')
+        # The buffer is only searched once: the search for the separator
+        # resumes where the previous one stopped when more data arrives.
+        buf = self._buffer
+        offset = 0
+        while True:
+            ichar = buf.find(b'\n', offset)
+            if ichar >= 0:
+                ichar += 1
+                break
+
+            offset = len(buf)
+            if offset > self._limit:
+                buf.clear()
+                self._maybe_resume_transport()
+                raise ValueError('Line is too long')
 
             if self._eof:
+                ichar = offset
                 break
 
-            if not_enough:
-                yield from self._wait_for_data('readline')
+            yield from self._wait_for_data('readline')
+
+        if ichar > self._limit:
+            # Drop the line, keep the data after the separator
+            buf.take(ichar)
+            self._maybe_resume_transport()
+            raise ValueError('Line is too long')
 
+        line = buf.take(ichar)
         self._maybe_resume_transport()
-        return bytes(line)
+        return line
+
+    @coroutine
+    def readlines_available(self):
+        """Return all the complete lines of the buffer in a list.
+
+        Wait until the buffer holds at least one line, as readline()
+        does, then remove every complete line of the buffer in one step.
+        At EOF, the last line may not end with b'\\n', and an empty list
+        is returned once the buffer is empty.  A line longer than the
+        limit ends the batch; the next call raises ValueError for it.
+        """
+        line = yield from self.readline()
+        if not line:
+            return []
+
+        lines = [line]
+        buf = self._buffer
+        while buf:
+            ichar = buf.find(b'\n')
+            if ichar >= 0:
+                ichar += 1
+            elif self._eof:
+                ichar = len(buf)
+            else:
+                break
+            if ichar > self._limit:
+                break
+            lines.append(buf.take(ichar))
+
+        self._maybe_resume_transport()
+        return lines
+
+    @coroutine
+    def readuntil(self, separator=b'\n'):
+        """Read data from the stream until separator is found.
+
+        separator may also be a tuple of separators: the data is read up
+        to the separator which ends first.  On success, the data and the
+        separator are removed from the buffer and returned.
+
+        If EOF is reached before a separator is found, the buffered data
+        is removed and IncompleteReadError is raised, with the data in
+        its partial attribute.
+
+        If the data up to the separator is longer than the limit of the
+        stream, LimitOverrunError is raised and the data is left in the
+        buffer: its consumed attribute is the number of bytes which can
+        be consumed to skip it.
+        """
+        if isinstance(separator, tuple):
+            separators = separator
+        else:
+            separators = (separator,)
+        if not separators or not all(separators):
+            raise ValueError('Separator should be at least one-byte string')
+        min_seplen = min(len(sep) for sep in separators)
+        max_seplen = max(len(sep) for sep in separators)
+
+        if self._exception is not None:
+            raise self._exception
+
+        # The search resumes where the previous one stopped when more
+        # data arrives: only the last max_seplen-1 bytes are searched
+        # again, in case a separator was cut in two.
+        buf = self._buffer
+        offset = 0
+        while True:
+            buflen = len(buf)
+            if buflen - offset >= min_seplen:
+                isep = end = -1
+                for sep in separators:
+                    index = buf.find(sep, offset)
+                    if index >= 0 and (end < 0 or index + len(sep) < end):
+                        isep = index
+                        end = index + len(sep)
+                if end >= 0:
+                    break
+
+                offset = max(0, buflen + 1 - max_seplen)
+                if offset > self._limit:
+                    raise LimitOverrunError(
+                        'Separator is not found, and chunk exceed the limit',
+                        offset)
+
+            if self._eof:
+                partial = buf.take(buflen)
+                raise IncompleteReadError(partial, None)
+
+            yield from self._wait_for_data('readuntil')
+
+        if isep > self._limit:
+            raise LimitOverrunError(
+                'Separator is found, but chunk is longer than limit', isep)
+
+        data = buf.take(end)
+        self._maybe_resume_transport()
+        return data
+
+    @coroutine
+    def readframe(self, header_struct, *, max_size=None):
+        """Read a frame made of a length header and a body.
+
+        header_struct is a struct.Struct (or a struct format) made of a
+        single unsigned integer, the size of the body: for example
+        struct.Struct('!I').  The header and the body are removed from
+        the buffer and the body is returned as a memoryview.
+
+        The coroutine waits for the whole frame at once, whatever its
+        size.  If EOF is reached first, the buffered data is removed and
+        IncompleteReadError is raised.  If the size of the body is larger
+        than max_size, LimitOverrunError is raised and the frame is left
+        in the buffer: its consumed attribute is the size of the frame.
+
+        The transport is not paused until the frame is complete, and the
+        size comes from the peer: max_size bounds the memory it can make
+        the reader buffer.  It defaults to the limit of the stream; pass
+        a larger value for protocols with larger frames.
+        """
+        if max_size is None:
+            max_size = self._limit
+        if not isinstance(header_struct, struct.Struct):
+            header_struct = struct.Struct(header_struct)
+
+        if self._exception is not None:
+            raise self._exception
+
+        buf = self._buffer
+        header_size = header_struct.size
+        yield from self._wait_for_size(header_size, 'readframe')
+        if len(buf) < header_size:
+            partial = buf.take(header_size)
+            raise IncompleteReadError(partial, header_size)
+
+        size, = header_struct.unpack(buf.peek(header_size))
+        frame_size = header_size + size
+        if size > max_size:
+            raise LimitOverrunError('Frame is longer than max_size',
+                                    frame_size)
+
+        yield from self._wait_for_size(frame_size, 'readframe')
+        if len(buf) < frame_size:
+            partial = buf.take(frame_size)
+            raise IncompleteReadError(partial, frame_size)
+
+        buf.take(header_size)
+        body = buf.take_view(size)
+        self._maybe_resume_transport()
+        return body
 
     @coroutine
     def read(self, n=-1):
@@ -458,14 +862,7 @@ class StreamReader:
             if not self._buffer and not self._eof:
                 yield from self._wait_for_data('read')
 
-        if n < 0 or len(self._buffer) <= n:
-            data = bytes(self._buffer)
-            self._buffer.clear()
-        else:
-            # n > 0 and len(self._buffer) > n
-            data = bytes(self._buffer[:n])
-            del self._buffer[:n]
-
+        data = self._buffer.take(n)
         self._maybe_resume_transport()
         return data
 
@@ -474,20 +871,54 @@ class StreamReader:
         if self._exception is not None:
             raise self._exception
 
-        # There used to be "optimized" code here.  It created its own
-        # Future and waited until self._buffer had at least the n
-        # bytes, then called read(n).  Unfortunately, this could pause
-        # the transport if the argument was larger than the pause
-        # limit (which is twice self._limit).  So now we just read()
-        # into a local buffer.
-
-        blocks = []
-        while n > 0:
-            block = yield from self.read(n)
-            if not block:
-                partial = b''.join(blocks)
-                raise IncompleteReadError(partial, len(partial) + n)
-            blocks.append(block)
-            n -= len(block)
-
-        return b''.join(blocks)
+        if n <= 0:
+            return b''
+
+        # Wait until the buffer holds the n bytes and copy them out once.
+        # _wait_for_size() does not pause the transport before, so that
+        # n may be larger than the pause limit (twice self._limit).
+        yield from self._wait_for_size(n, 'readexactly')
+        if len(self._buffer) < n:
+            partial = self._buffer.take(n)
+            raise IncompleteReadError(partial, n)
+
+        data = self._buffer.take(n)
+        self._maybe_resume_transport()
+        return data
+
+    @coroutine
+    def readinto(self, buffer):
+        """Read data into buffer until it is full, return its size.
+
+        buffer is any writable object supporting the buffer protocol.
+        The data is copied into it as it arrives, so the stream never
+        buffers more than usual.  If EOF is reached before buffer is
+        full, IncompleteReadError is raised: the data read so far is in
+        buffer and in the partial attribute.
+        """
+        if self._exception is not None:
+            raise self._exception
+
+        view = memoryview(buffer).cast('B')
+        n = len(view)
+        pos = 0
+        while pos < n:
+            if not self._buffer:
+                if self._eof:
+                    raise IncompleteReadError(bytes(view[:pos]), n)
+                yield from self._wait_for_data('readinto')
+                continue
+            pos += self._buffer.take_into(view[pos:])
+            self._maybe_resume_transport()
+        return n
+
+    if _PY352:
+        def __aiter__(self):
+            return self
+
+        @types.coroutine
+        def __anext__(self):
+            val = yield from self.readline()
+            if val == b'':
+                raise StopAsyncIteration
+            return val
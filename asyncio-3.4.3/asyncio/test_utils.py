@@ -297,6 +297,7 @@ class TestLoop(base_events.BaseEventLoop):
         self.readers = {}
         self.writers = {}
         self.reset_counters()
+        self._edge_triggered = False
 
     def time(self):
         return self._time
@@ -354,6 +355,12 @@ class TestLoop(base_events.BaseEventLoop):
         assert handle._args == args, '{!r} != {!r}'.format(
             handle._args, args)
 
+    def _set_edge_triggered(self, fd):
+        pass
+
+    def _mark_ready(self, fd, events):
+        pass
+
     def reset_counters(self):
         self.remove_reader_count = collections.defaultdict(int)
         self.remove_writer_count = collections.defaultdict(int)
@@ -365,9 +372,9 @@ class TestLoop(base_events.BaseEventLoop):
             self.advance_time(advance)
         self._timers = []
 
-    def call_at(self, when, callback, *args):
+    def call_at(self, when, callback, *args, slack=None):
         self._timers.append(when)
-        return super().call_at(when, callback, *args)
+        return super().call_at(when, callback, *args, slack=slack)
 
     def _process_events(self, event_list):
         return
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Timer stores used by the event loop.
+
+A timer store keeps the TimerHandle objects created by call_at() and
+call_later() until they are due.  The event loop only talks to its
+store through a handful of methods:
+
+- push(handle): arm a timer;
+- timer_cancelled(handle): a scheduled timer has been cancelled;
+- next_when(): the time of the next wakeup the store needs, or None;
+- pop_due(end_time, ready): move every timer due before end_time to the
+  ready queue, return the number of timers moved and the earliest
+  deadline among them (None if none was due);
+- live_count(): the number of armed timers which are not cancelled;
+- clear(), len() and iteration.
+
+TimerHeap is the default store: a binary heap, O(log n) per arm and
+lazy removal of cancelled timers.  TimerWheel is a hierarchical timing
+wheel: O(1) arm and cancel and bulk expiry per tick, at the price of
+firing timers up to one tick late.  Use BaseEventLoop.set_timer_store()
+to select the store of a loop.
+"""
+
+__all__ = ['TimerHeap', 'TimerWheel']
+
+import heapq
+import operator
+
+
+# Minimum number of _scheduled timer handles before cleanup of
+# cancelled handles is performed.
+_MIN_SCHEDULED_TIMER_HANDLES = 100
+
+# Minimum fraction of _scheduled timer handles that are cancelled
+# before cleanup of cancelled handles is performed.
+_MIN_CANCELLED_TIMER_HANDLES_FRACTION = 0.5
+
+_WHEN = operator.attrgetter('_when')
+
+
+#########################################
+#         定时器存储: 堆(默认)
+#
+# 说明:
+#   - 基于 heapq 的最小堆
+#   - 取消的定时器延迟删除
+#
+#########################################
+class TimerHeap(list):
+    """Timer store based on a binary heap.
+
+    The store is the heap-ordered list itself.  Cancelled timers stay in
+    the heap until they reach its head, or until they make up more than
+    _MIN_CANCELLED_TIMER_HANDLES_FRACTION of it, in which case the heap
+    is rebuilt without them.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._cancelled_count = 0
+
+    def push(self, handle):
+        heapq.heappush(self, handle)
+        handle._scheduled = True
+
+    def timer_cancelled(self, handle):
+        self._cancelled_count += 1
+
+    def live_count(self):
+        return len(self) - self._cancelled_count
+
+    def next_when(self):
+        sched_count = len(self)
+        if (sched_count > _MIN_SCHEDULED_TIMER_HANDLES and
+            self._cancelled_count / sched_count >
+                _MIN_CANCELLED_TIMER_HANDLES_FRACTION):
+            # Remove delayed calls that were cancelled if their number
+            # is too high
+            new_scheduled = []
+            for handle in self:
+                if handle._cancelled:
+                    handle._scheduled = False
+                else:
+                    new_scheduled.append(handle)
+
+            heapq.heapify(new_scheduled)    # 堆, 类型转换:列表转换成堆
+            self[:] = new_scheduled
+            self._cancelled_count = 0
+        else:
+            # Remove delayed calls that were cancelled from head of queue.
+            while self and self[0]._cancelled:
+                self._cancelled_count -= 1
+                handle = heapq.heappop(self)    # 堆, 最小出堆.
+                handle._scheduled = False
+
+        if not self:
+            return None
+        return self[0]._when
+
+    def pop_due(self, end_time, ready):
+        count = 0
+        first_when = None
+        while self:
+            handle = self[0]
+            if handle._when >= end_time:
+                break
+            handle = heapq.heappop(self)    # 堆, 最小值出堆
+            handle._scheduled = False
+            ready.append(handle)
+            if not count:
+                first_when = handle._when
+            count += 1
+        return count, first_when
+
+    def clear(self):
+        super().clear()
+        self._cancelled_count = 0
+
+
+#########################################
+#         定时器存储: 分层时间轮
+#
+# 说明:
+#   - 每层 slots 个槽, 共 levels 层
+#   - 插入/取消 O(1), 每个 tick 批量到期
+#   - 高层的槽轮转到时, 逐级下沉(cascade)到低层
+#
+#########################################
+class TimerWheel:
+    """Timer store based on a hierarchical timing wheel.
+
+    Time is cut in ticks of *resolution* seconds.  Level 0 has one slot
+    per tick; each slot of level k spans slots**k ticks.  A timer is
+    stored in the lowest level whose range covers its deadline and moves
+    down when the wheel below has turned around.  Timers too far in the
+    future for the top level wait in an overflow slot.
+
+    Arming and cancelling a timer are O(1).  All the timers of a tick
+    expire together, once the tick is over: a timer may fire up to
+    *resolution* seconds late, but never early.
+    """
+
+    def __init__(self, resolution=0.001, slots=256, levels=4):
+        if resolution <= 0:
+            raise ValueError('resolution must be positive, got %r'
+                             % (resolution,))
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError('slots must be a power of 2, got %r' % (slots,))
+        if levels < 1:
+            raise ValueError('levels must be at least 1, got %r' % (levels,))
+        self._resolution = resolution
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._nlevels = levels
+        self._reset()
+
+    def _reset(self):
+        # A slot maps id(handle) to the handle: timers which compare equal
+        # must still be cancelled one by one.
+        self._wheels = [[{} for i in range(self._mask + 1)]
+                        for level in range(self._nlevels)]
+        self._overflow = {}
+        # Number of timers per level, the overflow slot being the last one.
+        self._counts = [0] * (self._nlevels + 1)
+        # id(handle) -> (level, slot) of every armed timer.
+        self._armed = {}
+        # Index of the first tick which has not expired yet, None until
+        # the first timer is armed.
+        self._tick = None
+        # Cached result of next_when(), None if it must be computed.
+        self._next_when = None
+
+    def __repr__(self):
+        return ('<%s resolution=%s timers=%s>'
+                % (self.__class__.__name__, self._resolution, len(self)))
+
+    def __len__(self):
+        return len(self._armed)
+
+    def __iter__(self):
+        return iter([slot[key]
+                     for key, (level, slot) in self._armed.items()])
+
+    def __contains__(self, handle):
+        return id(handle) in self._armed
+
+    def _place(self, key, handle, tick):
+        now = self._tick
+        if tick < now:
+            tick = now
+        bits = self._bits
+        for level in range(self._nlevels):
+            shift = bits * (level + 1)
+            if tick >> shift == now >> shift:
+                slot = self._wheels[level][(tick >> (shift - bits)) &
+                                           self._mask]
+                break
+        else:
+            level = self._nlevels
+            slot = self._overflow
+        slot[key] = handle
+        self._counts[level] += 1
+        self._armed[key] = (level, slot)
+        return level, tick
+
+    def _wakeup_time(self, level, tick):
+        # Time at which pop_due() must run for a timer stored at this
+        # level to expire (level 0) or to move down (other levels).
+        if level:
+            # The timer moves down when the wheel of its level reaches
+            # its slot: the first tick of the slot.
+            step = 1 << (self._bits * level)
+            if level == self._nlevels:
+                # The overflow slot is checked each time the top wheel
+                # has turned around.
+                tick = self._tick + step - 1
+            tick = max(tick - tick % step, self._tick)
+        return (tick + 1) * self._resolution
+
+    def push(self, handle):
+        if not self._armed:
+            # The wheel is empty: move it to the current time, pop_due()
+            # may not have run since the last timer went away (idle or
+            # stopped loop).  It never moves back: those ticks expired.
+            tick = int(handle._loop.time() / self._resolution)
+            if self._tick is None or tick > self._tick:
+                self._tick = tick
+            self._next_when = None
+        level, tick = self._place(id(handle), handle,
+                                  int(handle._when / self._resolution))
+        handle._scheduled = True
+        if self._next_when is not None:
+            self._next_when = min(self._next_when,
+                                  self._wakeup_time(level, tick))
+
+    def timer_cancelled(self, handle):
+        key = id(handle)
+        level, slot = self._armed.pop(key)
+        del slot[key]
+        self._counts[level] -= 1
+        handle._scheduled = False
+
+    def live_count(self):
+        # Cancelled timers are removed at once.
+        return len(self._armed)
+
+    def next_when(self):
+        if not self._armed:
+            return None
+        if self._next_when is None:
+            self._next_when = self._compute_next_when()
+        return self._next_when
+
+    def _compute_next_when(self):
+        # The earliest wakeup is usually on the lowest busy level, but
+        # not always: when pop_due() stopped on a slot boundary, the
+        # current slot of an upper level has not moved down yet and its
+        # timers may be due before those of the lower levels.
+        now = self._tick
+        bits = self._bits
+        when = None
+        for level in range(self._nlevels):
+            if not self._counts[level]:
+                continue
+            # Look for the first busy slot after the current one; the
+            # current slot of an upper level is still pending if the
+            # wheel has just turned to it.
+            shift = bits * level
+            first = (now >> shift) & self._mask
+            if level and now & ((1 << shift) - 1):
+                first += 1
+            wheel = self._wheels[level]
+            for index in range(first, self._mask + 1):
+                if wheel[index]:
+                    base = now >> (shift + bits) << (shift + bits)
+                    wakeup = self._wakeup_time(level, base | index << shift)
+                    if when is None or wakeup < when:
+                        when = wakeup
+                    break
+        if self._counts[self._nlevels]:
+            wakeup = self._wakeup_time(self._nlevels, None)
+            if when is None or wakeup < when:
+                when = wakeup
+        return when
+
+    def _cascade(self, tick):
+        # Move down the timers of the slots reached by the upper wheels,
+        # highest level first.
+        bits = self._bits
+        for level in range(self._nlevels, 0, -1):
+            if tick & ((1 << (bits * level)) - 1) or not self._counts[level]:
+                continue
+            if level == self._nlevels:
+                slot = self._overflow
+                self._overflow = {}
+            else:
+                wheel = self._wheels[level]
+                index = (tick >> (bits * level)) & self._mask
+                slot = wheel[index]
+                if not slot:
+                    continue
+                wheel[index] = {}
+            self._counts[level] -= len(slot)
+            for key, handle in slot.items():
+                self._place(key, handle, int(handle._when / self._resolution))
+
+    def pop_due(self, end_time, ready):
+        count = 0
+        first_when = None
+        if self._tick is None:
+            return count, first_when
+        # A tick is over when end_time reached its end.
+        target = int(end_time / self._resolution)
+        if (target + 1) * self._resolution <= end_time:
+            # Rounding error on a multiple of the resolution
+            target += 1
+        if target <= self._tick:
+            return count, first_when
+        self._next_when = None
+        bits = self._bits
+        mask = self._mask
+        counts = self._counts
+        wheel = self._wheels[0]
+        armed = self._armed
+        tick = self._tick
+        while tick < target:
+            self._tick = tick
+            if not tick & mask:
+                self._cascade(tick)
+            slot = wheel[tick & mask]
+            if slot:
+                wheel[tick & mask] = {}
+                counts[0] -= len(slot)
+                for key in slot:
+                    del armed[key]
+                due = sorted(slot.values(), key=_WHEN)
+                if not count:
+                    first_when = due[0]._when
+                count += len(due)
+                for handle in due:
+                    handle._scheduled = False
+                    ready.append(handle)
+            tick += 1
+            if not counts[0]:
+                # Nothing on the first wheel: jump to the next tick where
+                # an upper wheel has timers to move down.
+                for level in range(1, self._nlevels + 1):
+                    if counts[level]:
+                        step = 1 << (bits * level)
+                        tick = min(target, -(-tick // step) * step)
+                        break
+                else:
+                    tick = target
+        self._tick = tick
+        return count, first_when
+
+    def clear(self):
+        self._reset()
@@ -40,6 +40,14 @@ class BaseTransport:
         """
         raise NotImplementedError
 
+    def set_protocol(self, protocol):
+        """Set a new protocol."""
+        raise NotImplementedError
+
+    def get_protocol(self):
+        """Return the current protocol."""
+        raise NotImplementedError
+
 
 #########################################
 #             接口: 只读传输
@@ -101,6 +109,25 @@ class WriteTransport(BaseTransport):
         """Return the current size of the write buffer."""
         raise NotImplementedError
 
+    def set_write_coalescing(self, enabled):
+        """Enable or disable the coalescing of writes.
+
+        When enabled, write() and writelines() only buffer their data:
+        the data of all the writes issued during an iteration of the
+        event loop is sent together by a callback scheduled with
+        call_soon(), which runs on the next iteration, or when flush()
+        is called.  Disabling coalescing flushes the buffered data.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Send the data buffered by write coalescing now.
+
+        Like write(), this does not block: the data which cannot be
+        sent at once stays buffered.
+        """
+        raise NotImplementedError
+
     def write(self, data):
         """Write some data bytes to the transport.
 
@@ -193,6 +220,14 @@ class DatagramTransport(BaseTransport):
         """
         raise NotImplementedError
 
+    def sendto_batch(self, datagrams):
+        """Send a list (or any iterable) of (data, addr) pairs.
+
+        The default implementation calls sendto() for each datagram.
+        """
+        for data, addr in datagrams:
+            self.sendto(data, addr)
+
     def abort(self):
         """Close the transport immediately.
 
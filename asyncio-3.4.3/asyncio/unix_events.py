@@ -1,15 +1,23 @@
 """Selector event loop for Unix with signal handling."""
 
 import errno
+import json
 import os
+import select
 import signal
 import socket
 import stat
 import subprocess
 import sys
 import threading
+import time
 import warnings
 
+try:
+    import ctypes
+except ImportError:  # pragma: no cover
+    ctypes = None
+
 
 from . import base_events
 from . import base_subprocess
@@ -17,6 +25,7 @@ from . import constants
 from . import coroutines
 from . import events
 from . import futures
+from . import protocols
 from . import selector_events
 from . import selectors
 from . import transports
@@ -24,7 +33,7 @@ from .coroutines import coroutine
 from .log import logger
 
 
-__all__ = ['SelectorEventLoop',
+__all__ = ['SelectorEventLoop', 'ServerSupervisor',
            'AbstractChildWatcher', 'SafeChildWatcher',
            'FastChildWatcher', 'DefaultEventLoopPolicy',
            ]
@@ -33,6 +42,34 @@ if sys.platform == 'win32':  # pragma: no cover
     raise ImportError('Signals are not really supported on Windows')
 
 
+# Value written into the eventfd to wake up the event loop.
+_EVENTFD_ONE = (1).to_bytes(8, sys.byteorder)
+
+
+def _make_eventfd():
+    """Create a non-blocking eventfd, return its file descriptor.
+
+    Return None if the platform has no eventfd.  Python 3.10 exposes
+    os.eventfd(); on older versions, call eventfd(2) of the C library
+    with ctypes.
+    """
+    if hasattr(os, 'eventfd'):
+        return os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+    if ctypes is None or not sys.platform.startswith('linux'):
+        return None
+    try:
+        eventfd = ctypes.CDLL(None, use_errno=True).eventfd
+    except (OSError, AttributeError):
+        # no eventfd() in the C library (glibc older than 2.8)
+        return None
+    # On Linux, EFD_NONBLOCK and EFD_CLOEXEC are O_NONBLOCK and O_CLOEXEC
+    fd = eventfd(0, os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return fd
+
+
 def _sighandler_noop(signum, frame):
     """Dummy signal handler."""
     pass
@@ -44,6 +81,8 @@ class _UnixSelectorEventLoop(selector_events.BaseSelectorEventLoop):
     Adds signal handling and UNIX Domain Socket support to SelectorEventLoop.
     """
 
+    _eventfd = None
+
     def __init__(self, selector=None):
         super().__init__(selector)
         self._signal_handlers = {}
@@ -51,6 +90,53 @@ class _UnixSelectorEventLoop(selector_events.BaseSelectorEventLoop):
     def _socketpair(self):
         return socket.socketpair()
 
+    def _make_self_pipe(self):
+        super()._make_self_pipe()
+        # The socket pair is kept for signal.set_wakeup_fd() which writes
+        # signal numbers into it.  Plain wakeups use an eventfd when the
+        # platform has one: a counter which never fills up.
+        fd = _make_eventfd()
+        if fd is not None:
+            # A file object: writing to it after close() raises instead
+            # of writing into a reused file descriptor.
+            self._eventfd = open(fd, 'r+b', buffering=0)
+            self._internal_fds += 1
+            self.add_reader(fd, self._read_from_eventfd)
+
+    def _close_self_pipe(self):
+        if self._eventfd is not None:
+            self.remove_reader(self._eventfd.fileno())
+            self._eventfd.close()
+            self._eventfd = None
+            self._internal_fds -= 1
+        super()._close_self_pipe()
+
+    def _read_from_eventfd(self):
+        try:
+            # Reading resets the counter.
+            self._eventfd.read(8)
+        except InterruptedError:
+            pass
+        self._self_pipe_pending = False
+
+    def _write_to_self(self):
+        # See BaseSelectorEventLoop._write_to_self().
+        efd = self._eventfd
+        if efd is None:
+            super()._write_to_self()
+            return
+        if self._self_pipe_pending:
+            return
+        self._self_pipe_pending = True
+        try:
+            efd.write(_EVENTFD_ONE)
+        except (OSError, ValueError):
+            # ValueError: the eventfd has been closed
+            self._self_pipe_pending = False
+            if self._debug:
+                logger.debug("Fail to write into the eventfd",
+                             exc_info=True)
+
     def close(self):
         super().close()
         for sig in list(self._signal_handlers):
@@ -278,7 +364,7 @@ class _UnixSelectorEventLoop(selector_events.BaseSelectorEventLoop):
         server = base_events.Server(self, [sock])
         sock.listen(backlog)
         sock.setblocking(False)
-        self._start_serving(protocol_factory, sock, ssl, server)
+        self._start_serving(protocol_factory, sock, ssl, server, backlog)
         return server
 
 
@@ -339,6 +425,12 @@ class _UnixReadPipeTransport(transports.ReadTransport):
             info.append('closed')
         return '<%s>' % ' '.join(info)
 
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
     def _read_ready(self):
         try:
             data = os.read(self._fileno, self.max_size)
@@ -348,7 +440,11 @@ class _UnixReadPipeTransport(transports.ReadTransport):
             self._fatal_error(exc, 'Fatal read error on pipe transport')
         else:
             if data:
-                self._protocol.data_received(data)
+                if isinstance(self._protocol, protocols.BufferedProtocol):
+                    protocols._feed_data_to_buffered_proto(self._protocol,
+                                                           data)
+                else:
+                    self._protocol.data_received(data)
             else:
                 if self._loop.get_debug():
                     logger.info("%r was closed by peer", self)
@@ -462,6 +558,12 @@ class _UnixWritePipeTransport(transports._FlowControlMixin,
             info.append('closed')
         return '<%s>' % ' '.join(info)
 
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
     def get_write_buffer_size(self):
         return sum(len(data) for data in self._buffer)
 
@@ -637,6 +739,256 @@ class _UnixSubprocessTransport(base_subprocess.BaseSubprocessTransport):
             self._proc.stdin = open(stdin_w.detach(), 'wb', buffering=bufsize)
 
 
+#########################################
+#     多进程服务: 每个进程一个事件循环
+#
+# 说明:
+#   - fork N 个 worker 进程, 各自 create_server(reuse_port=True)
+#   - 内核在 worker 之间分配连接
+#   - 管道: worker -> supervisor, 每行一个 JSON 消息
+#
+#########################################
+class _WorkerPipe:
+    """Read end of the pipe of a worker: one JSON message per line.
+
+    Lines are buffered here rather than in a file object, so that
+    select() on the pipe tells whether a message may be read without
+    blocking.
+    """
+
+    def __init__(self, fd):
+        self._fd = fd
+        self._buffer = b''
+
+    def fileno(self):
+        return self._fd
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def read_message(self, timeout=None):
+        """Read the next message.
+
+        Return None if no message was received after timeout seconds.
+        """
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while b'\n' not in self._buffer:
+            if timeout is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+                if not select.select([self._fd], [], [], remaining)[0]:
+                    return None
+            data = os.read(self._fd, 65536)
+            if not data:
+                # The worker exited without a message.
+                return {'error': 'worker exited'}
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line.decode('utf-8'))
+
+
+class ServerSupervisor:
+    """Serve a protocol from several forked worker processes.
+
+    Each worker runs its own event loop and calls
+    loop.create_server(protocol_factory, host, port, reuse_port=True,
+    **kwds): the kernel balances the incoming connections between the
+    workers.  The supervisor itself doesn't need an event loop: start()
+    returns once all the workers are serving; stop() makes each worker
+    close its server, wait for its connections with wait_closed() and
+    exit.
+
+    port must be given: with port 0, each worker would listen on its
+    own port.  workers defaults to the number of CPUs.
+    """
+
+    def __init__(self, protocol_factory, host=None, port=None, *,
+                 workers=None, **kwds):
+        if not port:
+            raise ValueError('port must be specified')
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError('workers must be at least 1, got %r'
+                             % (workers,))
+        self._protocol_factory = protocol_factory
+        self._host = host
+        self._port = port
+        self._nworkers = workers
+        self._kwds = kwds
+        # pid -> _WorkerPipe reading the messages of the worker
+        self._workers = {}
+        # pid -> number of statistics requests the worker did not answer
+        # yet: their late answers must not be taken for the next ones
+        self._stats_pending = {}
+        # statistics sent by the workers when they exited
+        self._final_stats = []
+
+    def __repr__(self):
+        return ('<%s port=%s workers=%s>'
+                % (self.__class__.__name__, self._port, len(self._workers)))
+
+    def get_pids(self):
+        """Return the list of the process identifiers of the workers."""
+        return list(self._workers)
+
+    def start(self):
+        """Fork the workers and wait until they are all serving.
+
+        Raise RuntimeError if a worker failed to create its server.
+        """
+        if self._workers:
+            raise RuntimeError('workers are already running')
+        self._final_stats = []
+        try:
+            for i in range(self._nworkers):
+                self._start_worker()
+        except:
+            self.stop()
+            raise
+
+    def _start_worker(self):
+        rfd, wfd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Worker: never return to the code of the parent process.
+            os.close(rfd)
+            # The pipes of the workers forked before belong to the parent.
+            for pipe in self._workers.values():
+                pipe.close()
+            status = 1
+            try:
+                self._run_worker(wfd)
+                status = 0
+            except BaseException:
+                logger.exception('%r: worker %s failed', self, os.getpid())
+            finally:
+                os._exit(status)
+        os.close(wfd)
+        pipe = _WorkerPipe(rfd)
+        self._workers[pid] = pipe
+        self._stats_pending[pid] = 0
+        message = pipe.read_message()
+        if 'error' in message:
+            raise RuntimeError('worker %s failed to start: %s'
+                               % (pid, message['error']))
+
+    def _run_worker(self, wfd):
+        with open(wfd, 'w', buffering=1) as pipe:
+            def send(message):
+                pipe.write(json.dumps(message) + '\n')
+
+            # The loop of the parent process is left alone: it belongs
+            # to the parent.
+            loop = SelectorEventLoop()
+            events.set_event_loop(loop)
+            try:
+                try:
+                    server = loop.run_until_complete(loop.create_server(
+                        self._protocol_factory, self._host, self._port,
+                        reuse_port=True, **self._kwds))
+                except Exception as exc:
+                    send({'error': str(exc)})
+                    return
+                for sig in (signal.SIGTERM, signal.SIGINT):
+                    loop.add_signal_handler(sig, loop.stop)
+                loop.add_signal_handler(
+                    signal.SIGUSR1, lambda: send({'stats': loop.get_stats()}))
+                send({'ready': True})
+                loop.run_forever()
+
+                server.close()
+                loop.run_until_complete(server.wait_closed())
+                send({'stats': loop.get_stats(), 'exit': True})
+            finally:
+                loop.close()
+
+    def stop(self, timeout=None):
+        """Stop the workers and wait until they exit.
+
+        Each worker closes its server and waits for its connections to
+        be closed.  Workers still running after timeout seconds are
+        killed.
+        """
+        for pid in self._workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        workers, self._workers = self._workers, {}
+        self._stats_pending = {}
+        for pid, pipe in workers.items():
+            try:
+                while True:
+                    remaining = None
+                    if timeout is not None:
+                        remaining = deadline - time.monotonic()
+                    message = pipe.read_message(remaining)
+                    if message is None:
+                        try:
+                            os.kill(pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                        break
+                    if 'exit' in message:
+                        self._final_stats.append(message['stats'])
+                    if 'exit' in message or 'error' in message:
+                        break
+            finally:
+                pipe.close()
+            os.waitpid(pid, 0)
+
+    def get_stats(self, timeout=1.0):
+        """Return the event loop statistics of the workers, aggregated.
+
+        While the workers run, they are asked for their current
+        statistics; workers which did not answer after timeout seconds
+        are left out.  Once stopped, the statistics of their last
+        iteration are used.  Counters and durations are summed,
+        'timer_lag_max' and 'timer_lag' are the maximum of the workers
+        and 'workers' is the number of workers which reported.  See
+        BaseEventLoop.get_stats().
+        """
+        if self._workers:
+            reports = []
+            for pid in self._workers:
+                try:
+                    os.kill(pid, signal.SIGUSR1)
+                except ProcessLookupError:
+                    continue
+                self._stats_pending[pid] += 1
+            deadline = time.monotonic() + timeout
+            for pid, pipe in self._workers.items():
+                # Skip the late answers to the previous requests.
+                while self._stats_pending[pid]:
+                    message = pipe.read_message(deadline - time.monotonic())
+                    if message is None or 'error' in message:
+                        break
+                    if 'stats' in message:
+                        self._stats_pending[pid] -= 1
+                        if not self._stats_pending[pid]:
+                            reports.append(message['stats'])
+        else:
+            reports = self._final_stats
+
+        total = {'workers': len(reports)}
+        for stats in reports:
+            for name, value in stats.items():
+                if name not in total:
+                    total[name] = value
+                elif name in ('timer_lag', 'timer_lag_max'):
+                    total[name] = max(total[name], value)
+                elif name == 'ready_histogram':
+                    total[name] = [a + b for a, b in zip(total[name], value)]
+                else:
+                    total[name] += value
+        return total
+
+
 #
 # 抽象接口类: 孩子监视器
 #
@@ -0,0 +1,87 @@
+"""Benchmark: connections accepted per second by a server.
+
+Client processes open and close connections as fast as they can while
+the event loop accepts them.  --batch sets how many connections the
+server accepts per readiness event of its listening socket: compare
+--batch 1 (one accept() per loop iteration, the old behaviour) with the
+default.
+
+The clients run in child processes started with multiprocessing; they
+connect to the server in this process on 127.0.0.1.
+"""
+
+import argparse
+import multiprocessing
+import socket
+import time
+
+import asyncio
+
+ARGS = argparse.ArgumentParser(description="Accept benchmark.")
+ARGS.add_argument(
+    '--batch', action='store', dest='batch',
+    default=100, type=int, help='Connections accepted per wakeup')
+ARGS.add_argument(
+    '--connections', action='store', dest='connections',
+    default=20000, type=int, help='Total number of connections')
+ARGS.add_argument(
+    '--clients', action='store', dest='clients',
+    default=4, type=int, help='Number of client processes')
+
+
+class Service(asyncio.Protocol):
+
+    accepted = 0
+
+    def connection_made(self, tr):
+        Service.accepted += 1
+        # close once the transport has started reading
+        asyncio.get_event_loop().call_soon(tr.close)
+
+
+def client(port, count):
+    for i in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.close()
+
+
+def main():
+    args = ARGS.parse_args()
+    loop = asyncio.get_event_loop()
+
+    server = loop.run_until_complete(
+        loop.create_server(Service, '127.0.0.1', 0, backlog=args.batch))
+    sock = server.sockets[0]
+    # create_server() uses backlog for the listen queue too: keep a long
+    # queue so that both runs see the same pending connections.
+    sock.listen(1024)
+    port = sock.getsockname()[1]
+
+    count = args.connections // args.clients
+    total = count * args.clients
+    clients = [multiprocessing.Process(target=client, args=(port, count))
+               for i in range(args.clients)]
+
+    @asyncio.coroutine
+    def wait_accepted():
+        while Service.accepted < total:
+            yield from asyncio.sleep(0.01)
+
+    t0 = time.perf_counter()
+    for proc in clients:
+        proc.start()
+    loop.run_until_complete(wait_accepted())
+    dt = time.perf_counter() - t0
+    for proc in clients:
+        proc.join()
+
+    print('batch=%s: %s connections in %.2f sec, %.0f accepts/sec'
+          % (args.batch, total, dt, total / dt))
+
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,10 +17,12 @@
 import argparse
 import asyncio
 import asyncio.locks
+from asyncio.sslproto import SSLSessionCache
 import cgi
 from http.client import BadStatusLine
 import logging
 import re
+import ssl
 import sys
 import time
 import urllib.parse
@@ -126,6 +128,9 @@ class ConnectionPool:
         self.loop = asyncio.get_event_loop()
         self.connections = {}  # {(host, port, ssl): [Connection, ...], ...}
         self.queue = []  # [Connection, ...]
+        # One SSL context for all connections: TLS sessions can only be
+        # resumed with the context which created them.
+        self.sslcontext = ssl.create_default_context()
 
     def close(self):
         """Close all connections available for reuse."""
@@ -258,8 +263,9 @@ class Connection:
 
     @asyncio.coroutine
     def connect(self):
+        sslcontext = self.pool.sslcontext if self.ssl else None
         self.reader, self.writer = yield from asyncio.open_connection(
-            self.host, self.port, ssl=self.ssl)
+            self.host, self.port, ssl=sslcontext)
         peername = self.writer.get_extra_info('peername')
         if peername:
             self.host, self.port = peername[:2]
@@ -836,6 +842,8 @@ def main():
         asyncio.set_event_loop(loop)
     else:
         loop = asyncio.get_event_loop()
+    # Resume TLS sessions when reconnecting to a host.
+    loop.set_ssl_session_cache(SSLSessionCache())
 
     roots = {fix_url(root) for root in args.roots}
 
@@ -854,6 +862,9 @@ def main():
         print('\nInterrupted\n')
     finally:
         crawler.report()
+        cache = loop.get_ssl_session_cache()
+        print('TLS sessions: %d resumed, %d full handshakes'
+              % (cache.hits, cache.misses))
         crawler.close()
         loop.close()
 
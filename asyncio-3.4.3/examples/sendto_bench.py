@@ -0,0 +1,86 @@
+"""Benchmark: cost of sendto() on a datagram transport with a backlog.
+
+The datagrams are sent to a UNIX datagram socket which nobody reads,
+after the transport has been made to buffer --backlog datagrams: every
+sendto() buffers its datagram and runs the flow control check, which
+asks the transport for the size of its write buffer.  The time per
+sendto() should not depend on --backlog.
+
+Compare for example --backlog 1000 and --backlog 100000.
+"""
+
+import argparse
+import os
+import socket
+import tempfile
+import time
+
+import asyncio
+
+ARGS = argparse.ArgumentParser(description="Datagram sendto() benchmark.")
+ARGS.add_argument(
+    '--backlog', action='store', dest='backlog',
+    default=10000, type=int, help='Datagrams buffered before measuring')
+ARGS.add_argument(
+    '--count', action='store', dest='count',
+    default=100000, type=int, help='Number of measured sendto() calls')
+ARGS.add_argument(
+    '--size', action='store', dest='size',
+    default=64, type=int, help='Size of the datagrams')
+
+
+class Sink(asyncio.DatagramProtocol):
+
+    paused = False
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+
+
+def main():
+    args = ARGS.parse_args()
+    loop = asyncio.get_event_loop()
+
+    # A socket which never reads its datagrams: once its receive queue
+    # is full, sendto() buffers.  UNIX datagram sockets block the sender
+    # instead of dropping datagrams, unlike UDP.
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'sink')
+    sink = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sink.bind(path)
+
+    transport, protocol = loop.run_until_complete(
+        loop.create_datagram_endpoint(Sink, family=socket.AF_UNIX))
+    # Never pause the protocol: measure the flow control check only.
+    transport.set_write_buffer_limits(high=2 ** 62)
+
+    data = b'x' * args.size
+    # Fill the socket buffers, then the transport buffer.
+    while not transport.get_write_buffer_size():
+        transport.sendto(data, path)
+    for i in range(args.backlog):
+        transport.sendto(data, path)
+
+    t0 = time.perf_counter()
+    for i in range(args.count):
+        transport.sendto(data, path)
+    dt = time.perf_counter() - t0
+
+    print('backlog=%s: %s sendto() in %.3f sec, %.2f usec/call, '
+          'write buffer %s bytes'
+          % (args.backlog, args.count, dt, dt / args.count * 1e6,
+             transport.get_write_buffer_size()))
+
+    transport.abort()
+    loop.run_until_complete(asyncio.sleep(0))
+    sink.close()
+    os.unlink(path)
+    os.rmdir(tmpdir)
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 """Tests for base_events.py"""
 
+import concurrent.futures
 import errno
 import logging
 import math
@@ -14,6 +15,7 @@ import asyncio
 from asyncio import base_events
 from asyncio import constants
 from asyncio import test_utils
+from asyncio import timers
 try:
     from test import support
     from test.script_helper import assert_python_ok
@@ -26,6 +28,10 @@ MOCK_ANY = mock.ANY
 PY34 = sys.version_info >= (3, 4)
 
 
+def raise_value_error():
+    raise ValueError
+
+
 class BaseEventLoopTests(test_utils.TestCase):
 
     def setUp(self):
@@ -92,6 +98,30 @@ class BaseEventLoopTests(test_utils.TestCase):
         self.loop.set_default_executor(executor)
         self.assertIs(executor, self.loop._default_executor)
 
+    def test_set_timer_store(self):
+        h1 = self.loop.call_later(10.0, lambda: None)
+        h2 = self.loop.call_later(20.0, lambda: None)
+        h2.cancel()
+
+        store = timers.TimerWheel()
+        self.loop.set_timer_store(store)
+        self.assertIs(store, self.loop._scheduled)
+        self.assertEqual([h1], list(store))
+        self.assertTrue(h1._scheduled)
+        self.assertFalse(h2._scheduled)
+
+        store = timers.TimerHeap()
+        store.push(asyncio.TimerHandle(1.0, lambda: None, (), self.loop))
+        self.assertRaises(ValueError, self.loop.set_timer_store, store)
+
+    def test_set_ssl_session_cache(self):
+        self.assertIsNone(self.loop.get_ssl_session_cache())
+        cache = mock.Mock()
+        self.loop.set_ssl_session_cache(cache)
+        self.assertIs(cache, self.loop.get_ssl_session_cache())
+        self.loop.set_ssl_session_cache(None)
+        self.assertIsNone(self.loop.get_ssl_session_cache())
+
     def test_getnameinfo(self):
         sockaddr = mock.Mock()
         self.loop.run_in_executor = mock.Mock()
@@ -118,6 +148,44 @@ class BaseEventLoopTests(test_utils.TestCase):
         self.assertIn(h, self.loop._scheduled)
         self.assertNotIn(h, self.loop._ready)
 
+    def test_call_later_slack(self):
+        def cb():
+            pass
+
+        h = self.loop.call_at(10.01, cb, slack=0.25)
+        self.assertEqual(10.25, h._when)
+
+        h = self.loop.call_at(10.5, cb, slack=0.25)
+        self.assertEqual(10.5, h._when)
+
+        with mock.patch.object(self.loop, 'time', return_value=7.0):
+            h = self.loop.call_later(1.2, cb, slack=1.0)
+        self.assertEqual(9.0, h._when)
+
+        self.assertRaises(ValueError, self.loop.call_later, 1.0, cb,
+                          slack=-1)
+
+    def test_set_timer_slack(self):
+        def cb():
+            pass
+
+        self.assertEqual(0, self.loop.get_timer_slack())
+        h = self.loop.call_at(10.01, cb)
+        self.assertEqual(10.01, h._when)
+
+        self.loop.set_timer_slack(0.5)
+        self.assertEqual(0.5, self.loop.get_timer_slack())
+        h1 = self.loop.call_at(10.01, cb)
+        h2 = self.loop.call_at(10.3, cb)
+        self.assertEqual(10.5, h1._when)
+        self.assertEqual(10.5, h2._when)
+
+        # an explicit slack overrides the loop's one
+        h = self.loop.call_at(10.01, cb, slack=0)
+        self.assertEqual(10.01, h._when)
+
+        self.assertRaises(ValueError, self.loop.set_timer_slack, -0.1)
+
     def test_call_later_negative_delays(self):
         calls = []
 
@@ -258,6 +326,53 @@ class BaseEventLoopTests(test_utils.TestCase):
 
         f.cancel()  # Don't complain about abandoned Future.
 
+    def test_call_soon_threadsafe_batch(self):
+        calls = []
+        self.loop._process_events = mock.Mock()
+        self.loop._write_to_self = mock.Mock()
+        self.loop.call_soon_threadsafe_batch(
+            [(calls.append, (i,)) for i in range(3)])
+        self.loop._write_to_self.assert_called_once_with()
+        self.assertEqual(0, len(self.loop._ready))
+
+        self.loop._run_once()
+        self.assertEqual(0, self.loop._selector.select.call_args[0][0])
+        self.assertEqual([0, 1, 2], calls)
+        self.assertEqual(0, len(self.loop._inbound))
+        self.assertEqual(1, self.loop.get_stats()['callbacks'])
+
+    def test_call_soon_threadsafe_batch_exception(self):
+        calls = []
+        self.loop._process_events = mock.Mock()
+        self.loop._write_to_self = mock.Mock()
+        self.loop.call_exception_handler = mock.Mock()
+        self.loop.call_soon_threadsafe_batch(
+            [(raise_value_error, ()), (calls.append, (1,))])
+        self.loop._run_once()
+        self.assertEqual([1], calls)
+        context = self.loop.call_exception_handler.call_args[0][0]
+        self.assertIsInstance(context['exception'], ValueError)
+
+    def test_call_soon_threadsafe_batch_closed(self):
+        self.loop.close()
+        self.assertRaises(RuntimeError,
+                          self.loop.call_soon_threadsafe_batch, [])
+
+    def test_run_in_executor_inbound(self):
+        self.loop._process_events = mock.Mock()
+        self.loop._write_to_self = mock.Mock()
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        futs = [self.loop.run_in_executor(executor, pow, 2, i)
+                for i in range(3)]
+        executor.shutdown()
+        # the results were queued without a Handle each
+        self.assertEqual(0, len(self.loop._ready))
+        self.assertEqual(3, len(self.loop._inbound))
+
+        self.loop._run_once()
+        self.assertEqual([1, 2, 4], [f.result() for f in futs])
+
     def test__run_once(self):
         h1 = asyncio.TimerHandle(time.monotonic() + 5.0, lambda: True, (),
                                  self.loop)
@@ -276,6 +391,199 @@ class BaseEventLoopTests(test_utils.TestCase):
         self.assertEqual([h2], self.loop._scheduled)
         self.assertTrue(self.loop._process_events.called)
 
+    def test_get_stats(self):
+        stats = self.loop.get_stats()
+        self.assertEqual(0, stats['iterations'])
+        self.assertEqual(0, stats['callbacks'])
+        self.assertEqual(0, stats['timers'])
+        self.assertEqual(0, sum(stats['ready_histogram']))
+
+        self.loop._process_events = mock.Mock()
+        self.loop.call_soon(lambda: None)
+        self.loop.call_soon(lambda: None).cancel()
+        self.loop.call_soon(lambda: None)
+        self.loop.call_later(60.0, lambda: None)
+        self.loop._run_once()
+
+        stats = self.loop.get_stats()
+        self.assertEqual(1, stats['iterations'])
+        self.assertEqual(2, stats['callbacks'])
+        self.assertEqual(1, stats['timers'])
+        # 3 ready handles fall in the bucket [2, 4)
+        self.assertEqual(1, stats['ready_histogram'][2])
+        self.assertGreaterEqual(stats['select_time'], 0)
+        self.assertGreaterEqual(stats['callback_time'], 0)
+        self.assertEqual(0, stats['timer_lag_count'])
+
+        self.loop._run_once()
+        stats = self.loop.get_stats()
+        self.assertEqual(2, stats['iterations'])
+        self.assertEqual(1, stats['ready_histogram'][0])
+
+    def test_get_stats_cancelled_timers(self):
+        handles = [self.loop.call_later(60.0 + i, lambda: None)
+                   for i in range(3)]
+        # the last timer is not at the head of the heap: it stays there
+        handles[2].cancel()
+        self.assertEqual(3, len(self.loop._scheduled))
+        self.assertEqual(2, self.loop.get_stats()['timers'])
+
+        self.loop.set_timer_store(timers.TimerWheel())
+        handles[1].cancel()
+        self.assertEqual(1, self.loop.get_stats()['timers'])
+
+    def test_get_stats_timer_lag(self):
+        self.loop._process_events = mock.Mock()
+        self.loop.call_at(self.loop.time() - 2.0, lambda: None)
+        self.loop.call_at(self.loop.time() - 1.0, lambda: None)
+        self.loop._run_once()
+
+        stats = self.loop.get_stats()
+        self.assertEqual(2, stats['callbacks'])
+        self.assertEqual(1, stats['timer_lag_count'])
+        self.assertTrue(2.0 <= stats['timer_lag'] < 3.0, stats['timer_lag'])
+        self.assertEqual(stats['timer_lag'], stats['timer_lag_max'])
+        self.assertEqual(stats['timer_lag'], stats['timer_lag_total'])
+
+    def test_get_stats_timer_lag_threadsafe(self):
+        # a callback appended to _ready by another thread while the timers
+        # are moved is not a timer
+        self.loop._process_events = mock.Mock()
+        self.loop.call_later(60.0, lambda: None)
+        store = self.loop._scheduled
+        pop_due = store.pop_due
+
+        def racing_pop_due(end_time, ready):
+            result = pop_due(end_time, ready)
+            ready.append(asyncio.Handle(lambda: None, (), self.loop))
+            return result
+
+        with mock.patch.object(store, 'pop_due', racing_pop_due):
+            self.loop._run_once()
+        self.assertEqual(1, self.loop.get_stats()['callbacks'])
+        self.assertEqual(0, self.loop.get_stats()['timer_lag_count'])
+
+    def test_get_stats_timer_lag_wheel(self):
+        # the lag is measured from the deadline of the timer, not from
+        # the end of the tick of the timer wheel
+        self.loop._process_events = mock.Mock()
+        self.loop.time = mock.Mock(return_value=100.0)
+        self.loop.set_timer_store(timers.TimerWheel(resolution=1.0))
+        self.loop.call_at(97.5, lambda: None)
+        self.loop.time.return_value = 101.0
+        self.loop._run_once()
+
+        stats = self.loop.get_stats()
+        self.assertEqual(1, stats['timer_lag_count'])
+        self.assertEqual(3.5, stats['timer_lag'])
+
+    def test_get_stats_stop(self):
+        self.loop._process_events = mock.Mock()
+        self.loop.call_soon(lambda: None)
+        self.loop.stop()
+        self.assertRaises(base_events._StopError, self.loop._run_once)
+        self.assertEqual(2, self.loop.get_stats()['callbacks'])
+
+    def test_callback_budget_count(self):
+        calls = []
+        self.loop._process_events = mock.Mock()
+        self.loop.set_callback_budget(count=2)
+        self.assertEqual((2, None), self.loop.get_callback_budget())
+        for i in range(5):
+            self.loop.call_soon(calls.append, i)
+
+        self.loop._run_once()
+        self.assertEqual([0, 1], calls)
+        self.assertEqual(1, self.loop.get_stats()['budget_exhausted'])
+
+        # the next poll does not block
+        self.loop._run_once()
+        self.assertEqual(0, self.loop._selector.select.call_args[0][0])
+        self.assertEqual([0, 1, 2, 3], calls)
+
+        self.loop._run_once()
+        self.assertEqual([0, 1, 2, 3, 4], calls)
+        self.assertEqual(2, self.loop.get_stats()['budget_exhausted'])
+
+    def test_callback_budget_io_first(self):
+        calls = []
+
+        def process_events(event_list):
+            self.loop._add_callback(
+                asyncio.Handle(calls.append, ('io',), self.loop))
+
+        self.loop.set_callback_budget(count=1)
+        self.loop.call_soon(calls.append, 0)
+        self.loop.call_soon(calls.append, 1)
+        self.loop._process_events = mock.Mock()
+        self.loop._run_once()
+        self.assertEqual([0], calls)
+
+        # the I/O callback runs before the callback left over
+        self.loop._process_events = process_events
+        self.loop._run_once()
+        self.assertEqual([0, 'io'], calls)
+        self.loop._process_events = mock.Mock()
+        self.loop._run_once()
+        self.assertEqual([0, 'io', 1], calls)
+
+    def test_callback_budget_inbound(self):
+        # the calls queued by other threads count against the budget
+        calls = []
+        self.loop._process_events = mock.Mock()
+        self.loop._write_to_self = mock.Mock()
+        self.loop.set_callback_budget(count=2)
+        self.loop.call_soon(calls.append, 'ready')
+        self.loop.call_soon_threadsafe_batch(
+            [(calls.append, (i,)) for i in range(4)])
+
+        self.loop._run_once()
+        self.assertEqual(['ready', 0], calls)
+        self.assertEqual(3, len(self.loop._inbound))
+        self.assertEqual(1, self.loop.get_stats()['budget_exhausted'])
+
+        # the next poll does not block
+        self.loop._run_once()
+        self.assertEqual(0, self.loop._selector.select.call_args[0][0])
+        self.assertEqual(['ready', 0, 1, 2], calls)
+
+        self.loop._run_once()
+        self.assertEqual(['ready', 0, 1, 2, 3], calls)
+        self.assertEqual(0, len(self.loop._inbound))
+        self.assertEqual(2, self.loop.get_stats()['budget_exhausted'])
+
+    def test_callback_budget_inbound_duration(self):
+        calls = []
+        self.loop._process_events = mock.Mock()
+        self.loop._write_to_self = mock.Mock()
+        self.loop.set_callback_budget(duration=10.0)
+        self.loop.call_soon_threadsafe_batch(
+            [(calls.append, (i,)) for i in range(3)])
+
+        with mock.patch.object(self.loop, 'time',
+                               side_effect=[0.0, 0.0, 0.0, 5.0, 11.0, 11.0]):
+            self.loop._run_once()
+        self.assertEqual([0, 1], calls)
+        self.assertEqual(1, len(self.loop._inbound))
+
+    def test_callback_budget_duration(self):
+        calls = []
+        self.loop._process_events = mock.Mock()
+        self.loop.set_callback_budget(duration=10.0)
+        for i in range(3):
+            self.loop.call_soon(calls.append, i)
+
+        with mock.patch.object(self.loop, 'time',
+                               side_effect=[0.0, 0.0, 5.0, 11.0, 11.0]):
+            self.loop._run_once()
+        self.assertEqual([0, 1], calls)
+        self.assertEqual(1, self.loop.get_stats()['budget_exhausted'])
+
+    def test_set_callback_budget_errors(self):
+        self.assertRaises(ValueError, self.loop.set_callback_budget, count=0)
+        self.assertRaises(ValueError, self.loop.set_callback_budget,
+                          duration=-1.0)
+
     def test_set_debug(self):
         self.loop.set_debug(True)
         self.assertTrue(self.loop.get_debug())
@@ -330,7 +638,7 @@ class BaseEventLoopTests(test_utils.TestCase):
         self.loop._process_events = mock.Mock()
 
         self.assertTrue(
-            0 < base_events._MIN_CANCELLED_TIMER_HANDLES_FRACTION < 1.0)
+            0 < timers._MIN_CANCELLED_TIMER_HANDLES_FRACTION < 1.0)
 
         def cb():
             pass
@@ -341,7 +649,7 @@ class BaseEventLoopTests(test_utils.TestCase):
         not_cancelled_count = 1
         self.loop.call_later(3000, cb)
 
-        # Add less than threshold (base_events._MIN_SCHEDULED_TIMER_HANDLES)
+        # Add less than threshold (timers._MIN_SCHEDULED_TIMER_HANDLES)
         # cancelled handles, ensure they aren't removed
 
         cancelled_count = 2
@@ -357,15 +665,15 @@ class BaseEventLoopTests(test_utils.TestCase):
 
         # This test is invalid if _MIN_SCHEDULED_TIMER_HANDLES is too low
         self.assertLessEqual(cancelled_count + not_cancelled_count,
-            base_events._MIN_SCHEDULED_TIMER_HANDLES)
+            timers._MIN_SCHEDULED_TIMER_HANDLES)
 
-        self.assertEqual(self.loop._timer_cancelled_count, cancelled_count)
+        self.assertEqual(self.loop._scheduled._cancelled_count, cancelled_count)
 
         self.loop._run_once()
 
         cancelled_count -= 2
 
-        self.assertEqual(self.loop._timer_cancelled_count, cancelled_count)
+        self.assertEqual(self.loop._scheduled._cancelled_count, cancelled_count)
 
         self.assertEqual(len(self.loop._scheduled),
             cancelled_count + not_cancelled_count)
@@ -373,10 +681,10 @@ class BaseEventLoopTests(test_utils.TestCase):
         # Need enough events to pass _MIN_CANCELLED_TIMER_HANDLES_FRACTION
         # so that deletion of cancelled events will occur on next _run_once
         add_cancel_count = int(math.ceil(
-            base_events._MIN_SCHEDULED_TIMER_HANDLES *
-            base_events._MIN_CANCELLED_TIMER_HANDLES_FRACTION)) + 1
+            timers._MIN_SCHEDULED_TIMER_HANDLES *
+            timers._MIN_CANCELLED_TIMER_HANDLES_FRACTION)) + 1
 
-        add_not_cancel_count = max(base_events._MIN_SCHEDULED_TIMER_HANDLES -
+        add_not_cancel_count = max(timers._MIN_SCHEDULED_TIMER_HANDLES -
             add_cancel_count, 0)
 
         # Add some events that will not be cancelled
@@ -715,6 +1023,74 @@ class BaseEventLoopTests(test_utils.TestCase):
         self.assertTrue(func.called)
 
 
+class SendfileFallbackProtocolTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.loop = self.new_test_loop()
+        self.proto = test_utils.make_test_protocol(asyncio.Protocol)
+        self.transport = mock.Mock()
+        self.transport._loop = self.loop
+        self.transport._protocol_paused = False
+        self.transport.get_protocol.return_value = self.proto
+
+    def test_drain(self):
+        proto = base_events._SendfileFallbackProtocol(self.transport)
+        self.transport.set_protocol.assert_called_with(proto)
+        self.loop.run_until_complete(proto.drain())
+
+        proto.pause_writing()
+        task = asyncio.Task(proto.drain(), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(task.done())
+        proto.resume_writing()
+        self.loop.run_until_complete(task)
+        self.assertFalse(self.proto.pause_writing.called)
+
+    def test_forward(self):
+        proto = base_events._SendfileFallbackProtocol(self.transport)
+        proto.data_received(b'data')
+        self.proto.data_received.assert_called_with(b'data')
+        proto.eof_received()
+        self.proto.eof_received.assert_called_with()
+
+    def test_connection_lost(self):
+        proto = base_events._SendfileFallbackProtocol(self.transport)
+        proto.pause_writing()
+        task = asyncio.Task(proto.drain(), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        proto.connection_lost(None)
+        self.assertRaises(ConnectionError,
+                          self.loop.run_until_complete, task)
+        self.proto.connection_lost.assert_called_with(None)
+        self.assertRaises(ConnectionError,
+                          self.loop.run_until_complete, proto.drain())
+
+    def test_restore_paused(self):
+        # paused during the transfer: the protocol must be paused too
+        proto = base_events._SendfileFallbackProtocol(self.transport)
+        proto.pause_writing()
+        proto.restore()
+        self.transport.set_protocol.assert_called_with(self.proto)
+        self.proto.pause_writing.assert_called_with()
+        self.assertFalse(self.proto.resume_writing.called)
+
+    def test_restore_resumed(self):
+        # the protocol was paused and the transfer drained the buffer
+        self.transport._protocol_paused = True
+        proto = base_events._SendfileFallbackProtocol(self.transport)
+        proto.resume_writing()
+        proto.restore()
+        self.assertFalse(self.proto.pause_writing.called)
+        self.proto.resume_writing.assert_called_with()
+
+    def test_restore_still_paused(self):
+        self.transport._protocol_paused = True
+        proto = base_events._SendfileFallbackProtocol(self.transport)
+        proto.restore()
+        self.assertFalse(self.proto.pause_writing.called)
+        self.assertFalse(self.proto.resume_writing.called)
+
+
 class MyProto(asyncio.Protocol):
     done = None
 
@@ -1164,6 +1540,32 @@ class BaseEventLoopWithSelectorTests(test_utils.TestCase):
         self.loop._accept_connection(MyProto, sock)
         self.assertFalse(sock.close.called)
 
+    def test_accept_connection_batch(self):
+        sock = mock.Mock()
+        conns = [mock.Mock() for i in range(3)]
+        sock.accept.side_effect = ([(conn, ('127.0.0.1', i))
+                                    for i, conn in enumerate(conns)]
+                                   + [BlockingIOError()])
+        self.loop._accept_connection2 = mock.Mock()
+        self.loop.create_task = mock.Mock()
+
+        self.loop._accept_connection(MyProto, sock, backlog=10)
+        self.assertEqual(4, sock.accept.call_count)
+        self.assertEqual(3, self.loop.create_task.call_count)
+        for conn in conns:
+            conn.setblocking.assert_called_with(False)
+
+    def test_accept_connection_batch_backlog(self):
+        sock = mock.Mock()
+        sock.accept.return_value = (mock.Mock(), ('127.0.0.1', 1))
+        self.loop._accept_connection2 = mock.Mock()
+        self.loop.create_task = mock.Mock()
+
+        # at most backlog connections are accepted per call
+        self.loop._accept_connection(MyProto, sock, backlog=5)
+        self.assertEqual(5, sock.accept.call_count)
+        self.assertEqual(5, self.loop.create_task.call_count)
+
     @mock.patch('asyncio.base_events.logger')
     def test_accept_connection_exception(self, m_log):
         sock = mock.Mock()
@@ -1179,7 +1581,8 @@ class BaseEventLoopWithSelectorTests(test_utils.TestCase):
         self.loop.call_later.assert_called_with(constants.ACCEPT_RETRY_DELAY,
                                                 # self.loop._start_serving
                                                 mock.ANY,
-                                                MyProto, sock, None, None)
+                                                MyProto, sock, None, None,
+                                                100)
 
     def test_call_coroutine(self):
         @asyncio.coroutine
@@ -14,6 +14,7 @@ except ImportError:
     ssl = None
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 import errno
@@ -732,6 +733,41 @@ class EventLoopTestsMixin:
         # close server
         server.close()
 
+    def test_create_server_buffered_protocol(self):
+        loop = self.loop
+
+        class BufferedProto(asyncio.BufferedProtocol):
+
+            def __init__(self):
+                self.buf = bytearray(16)
+                self.data = bytearray()
+                self.done = asyncio.Future(loop=loop)
+
+            def get_buffer(self, sizehint):
+                return self.buf
+
+            def buffer_updated(self, nbytes):
+                self.data += self.buf[:nbytes]
+
+            def eof_received(self):
+                self.done.set_result(bytes(self.data))
+
+        proto = BufferedProto()
+        server = self.loop.run_until_complete(
+            self.loop.create_server(lambda: proto, '127.0.0.1', 0))
+        port = server.sockets[0].getsockname()[1]
+
+        # more data than the protocol's buffer can hold
+        payload = b'0123456789' * 100
+        client = socket.socket()
+        client.connect(('127.0.0.1', port))
+        client.sendall(payload)
+        client.shutdown(socket.SHUT_WR)
+
+        self.assertEqual(payload, self.loop.run_until_complete(proto.done))
+        client.close()
+        server.close()
+
     def _make_unix_server(self, factory, **kwargs):
         path = test_utils.gen_unix_socket_path()
         self.addCleanup(lambda: os.path.exists(path) and os.unlink(path))
@@ -1033,6 +1069,151 @@ class EventLoopTestsMixin:
         with test_utils.force_legacy_ssl_support():
             self.test_create_server_ssl_verified()
 
+    @unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'),
+                         'SO_REUSEPORT is not supported')
+    def test_create_server_reuse_port(self):
+        proto = MyProto(self.loop)
+        f = self.loop.create_server(lambda: proto, '0.0.0.0', 0)
+        server = self.loop.run_until_complete(f)
+        sock = server.sockets[0]
+        self.assertFalse(
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT))
+        server.close()
+
+        f = self.loop.create_server(lambda: proto, '0.0.0.0', 0,
+                                    reuse_port=True)
+        server = self.loop.run_until_complete(f)
+        sock = server.sockets[0]
+        self.assertTrue(
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT))
+
+        # a second server can listen on the same port
+        port = sock.getsockname()[1]
+        f = self.loop.create_server(lambda: proto, '0.0.0.0', port,
+                                    reuse_port=True)
+        server2 = self.loop.run_until_complete(f)
+        server2.close()
+        server.close()
+
+    def _sendfile_connection(self):
+        # Return the client transport and a future set to the data
+        # received by the server when the connection is closed.
+        loop = self.loop
+        received = asyncio.Future(loop=loop)
+
+        class Receiver(asyncio.Protocol):
+
+            def connection_made(self, transport):
+                self.data = bytearray()
+
+            def data_received(self, data):
+                self.data += data
+
+            def connection_lost(self, exc):
+                received.set_result(bytes(self.data))
+
+        server = loop.run_until_complete(
+            loop.create_server(Receiver, '127.0.0.1', 0))
+        self.addCleanup(server.close)
+        port = server.sockets[0].getsockname()[1]
+        tr, proto = loop.run_until_complete(
+            loop.create_connection(lambda: MyBaseProto(loop),
+                                   '127.0.0.1', port))
+        # a small send buffer makes the transfer block on the socket
+        tr.get_extra_info('socket').setsockopt(
+            socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        return tr, received
+
+    def _sendfile_file(self, data):
+        f = tempfile.TemporaryFile()
+        self.addCleanup(f.close)
+        f.write(data)
+        f.seek(0)
+        return f
+
+    def test_sendfile(self):
+        data = bytes(range(256)) * 4096
+        f = self._sendfile_file(data)
+        tr, received = self._sendfile_connection()
+
+        tr.write(b'head:')
+        sent = self.loop.run_until_complete(
+            self.loop.sendfile(tr, f, 1000, 500000))
+        self.assertEqual(500000, sent)
+        self.assertEqual(501000, f.tell())
+        tr.write(b':tail')
+        tr.close()
+
+        self.assertEqual(b'head:' + data[1000:501000] + b':tail',
+                         self.loop.run_until_complete(received))
+
+    def test_sendfile_edge_triggered(self):
+        if not hasattr(self.loop._selector, 'set_edge_triggered'):
+            self.skipTest('selector does not support edge-triggered mode')
+        self.loop.set_edge_triggered(True)
+        data = bytes(range(256)) * 4096
+        f = self._sendfile_file(data)
+        tr, received = self._sendfile_connection()
+
+        # the socket is not reported writable again until a send failed
+        # with EAGAIN: the first call uses the event of the connection
+        for offset in (0, 10):
+            sent = self.loop.run_until_complete(asyncio.wait_for(
+                self.loop.sendfile(tr, f, offset, 10), 10, loop=self.loop))
+            self.assertEqual(10, sent)
+        sent = self.loop.run_until_complete(asyncio.wait_for(
+            self.loop.sendfile(tr, f, 20), 10, loop=self.loop))
+        self.assertEqual(len(data) - 20, sent)
+        tr.close()
+
+        self.assertEqual(data, self.loop.run_until_complete(received))
+
+    def test_sendfile_fallback(self):
+        data = bytes(range(256)) * 4096
+        f = self._sendfile_file(data)
+        tr, received = self._sendfile_connection()
+        tr.set_write_buffer_limits(high=16384)
+        proto = tr.get_protocol()
+
+        with mock.patch.object(self.loop, '_sendfile_native',
+                               side_effect=asyncio.SendfileNotAvailableError):
+            sent = self.loop.run_until_complete(
+                self.loop.sendfile(tr, f, 10))
+        self.assertEqual(len(data) - 10, sent)
+        self.assertEqual(len(data), f.tell())
+        self.assertIs(proto, tr.get_protocol())
+        tr.close()
+
+        self.assertEqual(data[10:], self.loop.run_until_complete(received))
+
+    def test_sendfile_no_fallback(self):
+        f = self._sendfile_file(b'data')
+        tr, received = self._sendfile_connection()
+
+        with mock.patch.object(self.loop, '_sendfile_native',
+                               side_effect=asyncio.SendfileNotAvailableError):
+            with self.assertRaises(asyncio.SendfileNotAvailableError):
+                self.loop.run_until_complete(
+                    self.loop.sendfile(tr, f, fallback=False))
+        self.assertEqual(0, f.tell())
+        tr.close()
+        self.assertEqual(b'', self.loop.run_until_complete(received))
+
+    def test_sendfile_invalid_args(self):
+        f = self._sendfile_file(b'data')
+        tr, received = self._sendfile_connection()
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(self.loop.sendfile(tr, f, -1))
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(self.loop.sendfile(tr, f, 0, 0))
+        with self.assertRaises(TypeError):
+            self.loop.run_until_complete(self.loop.sendfile(tr, f, 0, 1.0))
+        with open(__file__, 'r') as text_file:
+            with self.assertRaises(ValueError):
+                self.loop.run_until_complete(
+                    self.loop.sendfile(tr, text_file))
+        tr.close()
+
     def test_create_server_sock(self):
         proto = asyncio.Future(loop=self.loop)
 
@@ -1180,13 +1361,54 @@ class EventLoopTestsMixin:
         self.assertEqual('CLOSED', client.state)
         server.transport.close()
 
+    def test_create_datagram_endpoint_batch(self):
+        loop = self.loop
+        batches = []
+
+        class BatchProto(MyDatagramProto):
+
+            def datagrams_received(self, datagrams):
+                batches.append(datagrams)
+                super().datagrams_received(datagrams)
+
+        coro = loop.create_datagram_endpoint(
+            lambda: BatchProto(loop=loop), local_addr=('127.0.0.1', 0),
+            batch_size=8)
+        s_transport, server = loop.run_until_complete(coro)
+        host, port = s_transport.get_extra_info('sockname')
+
+        coro = loop.create_datagram_endpoint(
+            lambda: MyDatagramProto(loop=loop),
+            remote_addr=('127.0.0.1', port))
+        transport, client = loop.run_until_complete(coro)
+
+        transport.sendto_batch([(b'xxx', None)] * 10)
+        test_utils.run_until(loop, lambda: server.nbytes >= 30)
+        self.assertEqual(30, server.nbytes)
+        # at most batch_size datagrams per call
+        self.assertEqual(10, sum(map(len, batches)))
+        self.assertLessEqual(max(map(len, batches)), 8)
+
+        transport.close()
+        loop.run_until_complete(client.done)
+        s_transport.close()
+        loop.run_until_complete(server.done)
+
+        self.assertRaises(
+            ValueError, loop.run_until_complete,
+            loop.create_datagram_endpoint(MyDatagramProto,
+                                          local_addr=('127.0.0.1', 0),
+                                          batch_size=0))
+
     def test_internal_fds(self):
         loop = self.create_event_loop()
         if not isinstance(loop, selector_events.BaseSelectorEventLoop):
             loop.close()
             self.skipTest('loop is not a BaseSelectorEventLoop')
 
-        self.assertEqual(1, loop._internal_fds)
+        # the self-pipe, and the eventfd of Unix loops on Linux
+        nfds = 1 if getattr(loop, '_eventfd', None) is None else 2
+        self.assertEqual(nfds, loop._internal_fds)
         loop.close()
         self.assertEqual(0, loop._internal_fds)
         self.assertIsNone(loop._csock)
@@ -1853,6 +2075,10 @@ if sys.platform == 'win32':
             raise unittest.SkipTest(
                 "IocpEventLoop does not have create_datagram_endpoint()")
 
+        def test_create_datagram_endpoint_batch(self):
+            raise unittest.SkipTest(
+                "IocpEventLoop does not have create_datagram_endpoint()")
+
         def test_remove_fds_after_closing(self):
             raise unittest.SkipTest("IocpEventLoop does not have add_reader()")
 else:
@@ -2221,6 +2447,8 @@ class AbstractEventLoopTests(unittest.TestCase):
             NotImplementedError, loop.create_server, f)
         self.assertRaises(
             NotImplementedError, loop.create_datagram_endpoint, f)
+        self.assertRaises(
+            NotImplementedError, loop.sendfile, f, f)
         self.assertRaises(
             NotImplementedError, loop.add_reader, 1, f)
         self.assertRaises(
@@ -2276,6 +2504,13 @@ class ProtocolsAbsTests(unittest.TestCase):
         self.assertIsNone(p.data_received(f))
         self.assertIsNone(p.eof_received())
 
+        bp = asyncio.BufferedProtocol()
+        self.assertIsNone(bp.connection_made(f))
+        self.assertIsNone(bp.connection_lost(f))
+        self.assertRaises(NotImplementedError, bp.get_buffer, 100)
+        self.assertRaises(NotImplementedError, bp.buffer_updated, 10)
+        self.assertIsNone(bp.eof_received())
+
         dp = asyncio.DatagramProtocol()
         self.assertIsNone(dp.connection_made(f))
         self.assertIsNone(dp.connection_lost(f))
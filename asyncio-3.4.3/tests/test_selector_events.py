@@ -10,6 +10,8 @@ except ImportError:
     ssl = None
 
 import asyncio
+from asyncio import protocols
+from asyncio import selector_events
 from asyncio import selectors
 from asyncio import test_utils
 from asyncio.selector_events import BaseSelectorEventLoop
@@ -172,6 +174,42 @@ class BaseSelectorEventLoopTests(test_utils.TestCase):
         self.loop._csock.send.side_effect = RuntimeError()
         self.assertRaises(RuntimeError, self.loop._write_to_self)
 
+    def test_write_to_self_coalesced(self):
+        self.loop._write_to_self()
+        self.loop._write_to_self()
+        self.loop._csock.send.assert_called_once_with(b'\0')
+
+        # the wakeup byte has been read: the next wakeup writes again
+        self.loop._ssock.recv.side_effect = [b'\0', BlockingIOError]
+        self.loop._read_from_self()
+        self.assertFalse(self.loop._self_pipe_pending)
+        self.loop._write_to_self()
+        self.assertEqual(2, self.loop._csock.send.call_count)
+
+    def test_write_to_self_error_not_coalesced(self):
+        self.loop._csock.send.side_effect = BlockingIOError
+        with test_utils.disable_logger():
+            self.loop._write_to_self()
+        self.assertFalse(self.loop._self_pipe_pending)
+
+    def test_set_edge_triggered(self):
+        self.assertFalse(self.loop.get_edge_triggered())
+        self.loop.set_edge_triggered(True)
+        self.assertTrue(self.loop.get_edge_triggered())
+
+        self.loop._set_edge_triggered(7)
+        self.selector.set_edge_triggered.assert_called_with(7)
+        self.selector.mark_ready.side_effect = KeyError
+        self.loop._mark_ready(7, selectors.EVENT_READ)
+
+        self.loop.set_edge_triggered(False)
+        self.assertFalse(self.loop.get_edge_triggered())
+
+    def test_set_edge_triggered_not_supported(self):
+        self.loop._selector = mock.Mock(spec=['register', 'close'])
+        self.assertRaises(RuntimeError, self.loop.set_edge_triggered, True)
+        self.loop.set_edge_triggered(False)
+
     def test_sock_recv(self):
         sock = test_utils.mock_nonblocking_socket()
         self.loop._sock_recv = mock.Mock()
@@ -809,6 +847,34 @@ class SelectorSocketTransportTests(test_utils.TestCase):
 
         self.protocol.data_received.assert_called_with(b'data')
 
+    def test_read_ready_edge_triggered(self):
+        self.loop._edge_triggered = True
+        self.loop._set_edge_triggered = mock.Mock()
+        self.loop._set_edge_triggered._is_coroutine = False
+        self.loop._mark_ready = mock.Mock()
+        transport = self.socket_transport()
+        test_utils.run_briefly(self.loop)
+        self.loop._set_edge_triggered.assert_called_with(7)
+
+        self.sock.recv.return_value = b'data'
+        transport._read_ready()
+        self.assertFalse(self.loop._mark_ready.called)
+
+        # a full read: the socket may have more data
+        self.sock.recv.return_value = b'x' * transport.max_size
+        transport._read_ready()
+        self.loop._mark_ready.assert_called_with(7, selectors.EVENT_READ)
+
+    def test_write_partial_edge_triggered(self):
+        self.loop._edge_triggered = True
+        self.loop._set_edge_triggered = mock.Mock()
+        self.loop._set_edge_triggered._is_coroutine = False
+        self.sock.send.return_value = 2
+        transport = self.socket_transport()
+        transport.write(b'data')
+        self.loop.assert_writer(7, transport._write_ready)
+        self.loop._set_edge_triggered.assert_called_with(7)
+
     def test_read_ready_eof(self):
         transport = self.socket_transport()
         transport.close = mock.Mock()
@@ -899,18 +965,18 @@ class SelectorSocketTransportTests(test_utils.TestCase):
 
     def test_write_no_data(self):
         transport = self.socket_transport()
-        transport._buffer.extend(b'data')
+        transport._buffer.append(b'data')
         transport.write(b'')
         self.assertFalse(self.sock.send.called)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual([b'data'], list(transport._buffer))
 
     def test_write_buffer(self):
         transport = self.socket_transport()
-        transport._buffer.extend(b'data1')
+        transport._buffer.append(b'data1')
         transport.write(b'data2')
         self.assertFalse(self.sock.send.called)
-        self.assertEqual(list_to_buffer([b'data1', b'data2']),
-                         transport._buffer)
+        self.assertEqual([b'data1', b'data2'],
+                         list(transport._buffer))
 
     def test_write_partial(self):
         data = b'data'
@@ -920,7 +986,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual([b'ta'], list(transport._buffer))
 
     def test_write_partial_bytearray(self):
         data = bytearray(b'data')
@@ -930,7 +996,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual([b'ta'], list(transport._buffer))
         self.assertEqual(data, bytearray(b'data'))  # Hasn't been mutated.
 
     def test_write_partial_memoryview(self):
@@ -941,7 +1007,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual([b'ta'], list(transport._buffer))
 
     def test_write_partial_none(self):
         data = b'data'
@@ -952,7 +1018,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual([b'data'], list(transport._buffer))
 
     def test_write_tryagain(self):
         self.sock.send.side_effect = BlockingIOError
@@ -962,7 +1028,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         transport.write(data)
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual([b'data'], list(transport._buffer))
 
     @mock.patch('asyncio.selector_events.logger')
     def test_write_exception(self, m_log):
@@ -1003,7 +1069,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         self.sock.send.return_value = len(data)
 
         transport = self.socket_transport()
-        transport._buffer.extend(data)
+        transport._buffer.append(data)
         self.loop.add_writer(7, transport._write_ready)
         transport._write_ready()
         self.assertTrue(self.sock.send.called)
@@ -1015,7 +1081,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
 
         transport = self.socket_transport()
         transport._closing = True
-        transport._buffer.extend(data)
+        transport._buffer.append(data)
         self.loop.add_writer(7, transport._write_ready)
         transport._write_ready()
         self.assertTrue(self.sock.send.called)
@@ -1033,40 +1099,206 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         self.sock.send.return_value = 2
 
         transport = self.socket_transport()
-        transport._buffer.extend(data)
+        transport._buffer.append(data)
         self.loop.add_writer(7, transport._write_ready)
         transport._write_ready()
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'ta']), transport._buffer)
+        self.assertEqual([b'ta'], list(transport._buffer))
 
     def test_write_ready_partial_none(self):
         data = b'data'
         self.sock.send.return_value = 0
 
         transport = self.socket_transport()
-        transport._buffer.extend(data)
+        transport._buffer.append(data)
         self.loop.add_writer(7, transport._write_ready)
         transport._write_ready()
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data']), transport._buffer)
+        self.assertEqual([b'data'], list(transport._buffer))
+
+    @unittest.skipUnless(selector_events._HAS_SENDMSG, 'need socket.sendmsg')
+    @mock.patch('asyncio.selector_events._SC_IOV_MAX', 2)
+    def test_write_ready_iov_max(self):
+        # more chunks than a sendmsg() call takes: send again while the
+        # socket accepts everything
+        calls = []
+
+        def sendmsg(chunks):
+            chunks = list(chunks)
+            calls.append(chunks)
+            if len(calls) == 3:
+                return 1
+            return sum(map(len, chunks))
+
+        self.sock.sendmsg.side_effect = sendmsg
+        self.sock.send.return_value = 2
+
+        transport = self.socket_transport()
+        transport.writelines([b'a', b'b', b'c', b'd', b'ef', b'g'])
+        self.assertEqual([[b'a', b'b'], [b'c', b'd'], [b'ef', b'g']], calls)
+        self.assertEqual([memoryview(b'f'), b'g'], list(transport._buffer))
+        self.assertEqual(2, transport.get_write_buffer_size())
+        self.loop.assert_writer(7, transport._write_ready)
 
     def test_write_ready_tryagain(self):
         self.sock.send.side_effect = BlockingIOError
+        self.sock.sendmsg.side_effect = BlockingIOError
 
         transport = self.socket_transport()
-        transport._buffer = list_to_buffer([b'data1', b'data2'])
+        transport._buffer.extend([b'data1', b'data2'])
         self.loop.add_writer(7, transport._write_ready)
         transport._write_ready()
 
         self.loop.assert_writer(7, transport._write_ready)
-        self.assertEqual(list_to_buffer([b'data1data2']), transport._buffer)
+        self.assertEqual([b'data1', b'data2'], list(transport._buffer))
+
+    @unittest.skipUnless(selector_events._HAS_SENDMSG, 'need socket.sendmsg')
+    def test_write_ready_sendmsg(self):
+        sent = []
+
+        def sendmsg(buffers):
+            sent.append(list(buffers))
+            return 7
+
+        self.sock.send.side_effect = BlockingIOError
+        self.sock.sendmsg.side_effect = sendmsg
+
+        transport = self.socket_transport()
+        transport.write(b'data1')
+        transport.write(b'data2')
+        transport.write(b'data3')
+        self.assertEqual(1, self.sock.send.call_count)
+        self.assertEqual(15, transport.get_write_buffer_size())
+        transport._write_ready()
+
+        # one system call for all the chunks, the partially sent chunk
+        # is not copied
+        self.assertEqual(1, self.sock.sendmsg.call_count)
+        self.assertEqual([[b'data1', b'data2', b'data3']], sent)
+        self.assertEqual([b'ta2', b'data3'], list(transport._buffer))
+        self.assertIsInstance(transport._buffer[0], memoryview)
+        self.assertEqual(8, transport.get_write_buffer_size())
+        self.loop.assert_writer(7, transport._write_ready)
+
+    @unittest.skipUnless(selector_events._HAS_SENDMSG, 'need socket.sendmsg')
+    def test_writelines(self):
+        self.sock.sendmsg.return_value = 10
+
+        transport = self.socket_transport()
+        transport.writelines([b'data1', bytearray(b'data2'), b''])
+        self.assertEqual(1, self.sock.sendmsg.call_count)
+        self.assertFalse(transport._buffer)
+        self.assertEqual(0, transport.get_write_buffer_size())
+        self.assertFalse(self.loop.writers)
+
+    @unittest.skipUnless(selector_events._HAS_SENDMSG, 'need socket.sendmsg')
+    def test_writelines_partial(self):
+        self.sock.sendmsg.return_value = 3
+        data = bytearray(b'data2')
+
+        transport = self.socket_transport()
+        transport.writelines([b'data1', data])
+        data[:] = b'xxxxx'
+        self.assertEqual([b'a1', b'data2'], list(transport._buffer))
+        self.assertEqual(7, transport.get_write_buffer_size())
+        self.loop.assert_writer(7, transport._write_ready)
+
+    def test_writelines_buffer(self):
+        transport = self.socket_transport()
+        transport._buffer.append(b'data1')
+        transport._buffer_size = 5
+        transport.writelines([b'data2', b'data3'])
+        self.assertFalse(self.sock.send.called)
+        self.assertFalse(self.sock.sendmsg.called)
+        self.assertEqual([b'data1', b'data2', b'data3'],
+                         list(transport._buffer))
+        self.assertEqual(15, transport.get_write_buffer_size())
+
+    def test_writelines_str(self):
+        transport = self.socket_transport()
+        self.assertRaises(TypeError, transport.writelines, [b'data', 'str'])
+        # nothing was buffered: the next write is sent
+        self.assertFalse(transport._buffer)
+        self.assertEqual(0, transport.get_write_buffer_size())
+        self.sock.send.return_value = 4
+        transport.write(b'data')
+        self.sock.send.assert_called_with(b'data')
+        self.assertFalse(transport._buffer)
+
+    @unittest.skipUnless(selector_events._HAS_SENDMSG, 'need socket.sendmsg')
+    def test_write_coalescing(self):
+        self.sock.sendmsg.return_value = 15
+
+        transport = self.socket_transport()
+        transport.set_write_coalescing(True)
+        transport.write(b'data1')
+        transport.write(bytearray(b'data2'))
+        transport.writelines([b'data3'])
+        self.assertFalse(self.sock.send.called)
+        self.assertEqual(15, transport.get_write_buffer_size())
+        self.assertIsNotNone(transport._flush_handle)
+
+        # the writes are sent together once the callbacks have run
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(1, self.sock.sendmsg.call_count)
+        self.assertFalse(self.sock.send.called)
+        self.assertFalse(transport._buffer)
+        self.assertIsNone(transport._flush_handle)
+        self.assertFalse(self.loop.writers)
+
+    def test_write_coalescing_partial(self):
+        self.sock.send.return_value = 2
+
+        transport = self.socket_transport()
+        transport.set_write_coalescing(True)
+        transport.write(b'data')
+        transport.flush()
+        self.assertIsNone(transport._flush_handle)
+        self.sock.send.assert_called_with(b'data')
+        self.assertEqual([b'ta'], list(transport._buffer))
+        self.loop.assert_writer(7, transport._write_ready)
+
+        # data written while the writer is registered is not flushed
+        transport.write(b'more')
+        self.assertIsNone(transport._flush_handle)
+        self.assertEqual(6, transport.get_write_buffer_size())
+
+    def test_write_coalescing_abort(self):
+        transport = self.socket_transport()
+        transport.set_write_coalescing(True)
+        transport.write(b'data')
+        transport.abort()
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(self.sock.send.called)
+
+    def test_set_write_coalescing(self):
+        self.sock.family = socket.AF_INET
+        self.sock.getsockopt.return_value = 0
+        self.sock.send.return_value = 4
+
+        transport = self.socket_transport()
+        transport.set_write_coalescing(True)
+        self.sock.setsockopt.assert_called_with(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+        transport.write(b'data')
+        self.assertFalse(self.sock.send.called)
+
+        # disabling coalescing flushes and restores TCP_NODELAY
+        transport.set_write_coalescing(False)
+        self.sock.send.assert_called_with(b'data')
+        self.assertIsNone(transport._flush_handle)
+        self.sock.setsockopt.assert_called_with(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, False)
+
+        transport.write(b'more')
+        self.sock.send.assert_called_with(b'more')
 
     def test_write_ready_exception(self):
         err = self.sock.send.side_effect = OSError()
 
         transport = self.socket_transport()
         transport._fatal_error = mock.Mock()
-        transport._buffer.extend(b'data')
+        transport._buffer.append(b'data')
         transport._write_ready()
         transport._fatal_error.assert_called_with(
                                    err,
@@ -1079,10 +1311,44 @@ class SelectorSocketTransportTests(test_utils.TestCase):
 
         transport = self.socket_transport()
         transport.close()
-        transport._buffer.extend(b'data')
+        transport._buffer.append(b'data')
         transport._write_ready()
         remove_writer.assert_called_with(self.sock_fd)
 
+    def test_empty_waiter(self):
+        self.sock.send.return_value = 2
+        transport = self.socket_transport()
+        transport.write(b'data')
+
+        waiter = transport._make_empty_waiter()
+        self.assertRaises(RuntimeError, transport._make_empty_waiter)
+        self.assertRaises(RuntimeError, transport.write, b'data')
+        self.assertRaises(RuntimeError, transport.writelines, [b'data'])
+        self.assertFalse(waiter.done())
+
+        transport._write_ready()
+        self.assertIsNone(waiter.result())
+        transport._reset_empty_waiter()
+        transport.write(b'data')
+
+    def test_empty_waiter_error(self):
+        err = self.sock.send.side_effect = OSError()
+        transport = self.socket_transport()
+        transport._buffer.append(b'data')
+        transport._fatal_error = mock.Mock()
+
+        waiter = transport._make_empty_waiter()
+        transport._write_ready()
+        self.assertIs(err, waiter.exception())
+
+    def test_set_protocol(self):
+        transport = self.socket_transport()
+        protocol = test_utils.make_test_protocol(asyncio.BufferedProtocol)
+        transport.set_protocol(protocol)
+        self.assertIs(protocol, transport.get_protocol())
+        self.assertEqual(transport._read_ready__get_buffer,
+                         transport._read_ready_cb)
+
     def test_write_eof(self):
         tr = self.socket_transport()
         self.assertTrue(tr.can_write_eof())
@@ -1097,7 +1363,7 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         self.sock.send.side_effect = BlockingIOError
         tr.write(b'data')
         tr.write_eof()
-        self.assertEqual(tr._buffer, list_to_buffer([b'data']))
+        self.assertEqual(list(tr._buffer), [b'data'])
         self.assertTrue(tr._eof)
         self.assertFalse(self.sock.shutdown.called)
         self.sock.send.side_effect = lambda _: 4
@@ -1107,6 +1373,135 @@ class SelectorSocketTransportTests(test_utils.TestCase):
         tr.close()
 
 
+class SelectorSocketTransportBufferedProtocolTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.loop = self.new_test_loop()
+
+        self.protocol = test_utils.make_test_protocol(asyncio.BufferedProtocol)
+        self.buf = bytearray(50)
+        self.protocol.get_buffer.side_effect = lambda hint: self.buf
+
+        self.sock = mock.Mock(socket.socket)
+        self.sock_fd = self.sock.fileno.return_value = 7
+
+    def socket_transport(self):
+        transport = _SelectorSocketTransport(self.loop, self.sock,
+                                             self.protocol)
+        self.addCleanup(close_transport, transport)
+        return transport
+
+    def test_ctor(self):
+        tr = self.socket_transport()
+        test_utils.run_briefly(self.loop)
+        self.loop.assert_reader(7, tr._read_ready)
+        self.protocol.connection_made.assert_called_with(tr)
+
+    def test_read_ready(self):
+        transport = self.socket_transport()
+
+        def recv_into(buf):
+            buf[:4] = b'data'
+            return 4
+
+        self.sock.recv_into.side_effect = recv_into
+        transport._read_ready()
+
+        self.protocol.get_buffer.assert_called_with(transport.max_size)
+        self.protocol.buffer_updated.assert_called_with(4)
+        self.assertEqual(b'data', self.buf[:4])
+        self.assertFalse(self.sock.recv.called)
+
+    def test_get_buffer_error(self):
+        transport = self.socket_transport()
+        transport._fatal_error = mock.Mock()
+
+        err = self.protocol.get_buffer.side_effect = ValueError()
+        transport._read_ready()
+        transport._fatal_error.assert_called_with(
+            err, 'Fatal error: protocol.get_buffer() call failed.')
+        self.assertFalse(self.sock.recv_into.called)
+
+    def test_get_buffer_zerosized(self):
+        transport = self.socket_transport()
+        transport._fatal_error = mock.Mock()
+
+        self.buf = bytearray()
+        transport._read_ready()
+        self.assertTrue(transport._fatal_error.called)
+        self.assertIsInstance(transport._fatal_error.call_args[0][0],
+                              RuntimeError)
+        self.assertFalse(self.sock.recv_into.called)
+
+    def test_buffer_updated_error(self):
+        transport = self.socket_transport()
+        transport._fatal_error = mock.Mock()
+
+        self.sock.recv_into.return_value = 10
+        err = self.protocol.buffer_updated.side_effect = ValueError()
+        transport._read_ready()
+        transport._fatal_error.assert_called_with(
+            err, 'Fatal error: protocol.buffer_updated() call failed.')
+
+    def test_read_ready_edge_triggered(self):
+        self.loop._edge_triggered = True
+        self.loop._set_edge_triggered = mock.Mock()
+        self.loop._set_edge_triggered._is_coroutine = False
+        self.loop._mark_ready = mock.Mock()
+        transport = self.socket_transport()
+
+        self.sock.recv_into.return_value = 10
+        transport._read_ready()
+        self.assertFalse(self.loop._mark_ready.called)
+
+        # the buffer is full: the socket may have more data
+        self.sock.recv_into.return_value = len(self.buf)
+        transport._read_ready()
+        self.loop._mark_ready.assert_called_with(7, selectors.EVENT_READ)
+
+    def test_read_ready_eof(self):
+        transport = self.socket_transport()
+        transport.close = mock.Mock()
+
+        self.sock.recv_into.return_value = 0
+        transport._read_ready()
+
+        self.protocol.eof_received.assert_called_with()
+        self.assertFalse(self.protocol.buffer_updated.called)
+        transport.close.assert_called_with()
+
+    def test_read_ready_tryagain(self):
+        self.sock.recv_into.side_effect = BlockingIOError
+
+        transport = self.socket_transport()
+        transport._fatal_error = mock.Mock()
+        transport._read_ready()
+
+        self.assertFalse(transport._fatal_error.called)
+        self.assertFalse(self.protocol.buffer_updated.called)
+
+    def test_read_ready_err(self):
+        err = self.sock.recv_into.side_effect = OSError()
+
+        transport = self.socket_transport()
+        transport._fatal_error = mock.Mock()
+        transport._read_ready()
+
+        transport._fatal_error.assert_called_with(
+            err, 'Fatal read error on socket transport')
+
+    def test_feed_data_to_buffered_proto(self):
+        # Transports which don't support recv_into() feed the data
+        # through get_buffer(), in as many chunks as needed.
+        chunks = []
+        self.buf = bytearray(3)
+        self.protocol.buffer_updated.side_effect = (
+            lambda nbytes: chunks.append(bytes(self.buf[:nbytes])))
+
+        protocols._feed_data_to_buffered_proto(self.protocol, b'abcdefgh')
+        self.assertEqual([b'abc', b'def', b'gh'], chunks)
+
+
 @unittest.skipIf(ssl is None, 'No ssl module')
 class SelectorSslTransportTests(test_utils.TestCase):
 
@@ -1477,10 +1872,11 @@ class SelectorDatagramTransportTests(test_utils.TestCase):
         self.sock = mock.Mock(spec_set=socket.socket)
         self.sock.fileno.return_value = 7
 
-    def datagram_transport(self, address=None):
+    def datagram_transport(self, address=None, batch_size=None):
         transport = _SelectorDatagramTransport(self.loop, self.sock,
                                                self.protocol,
-                                               address=address)
+                                               address=address,
+                                               batch_size=batch_size)
         self.addCleanup(close_transport, transport)
         return transport
 
@@ -1523,6 +1919,125 @@ class SelectorDatagramTransportTests(test_utils.TestCase):
         self.assertFalse(transport._fatal_error.called)
         self.protocol.error_received.assert_called_with(err)
 
+    def test_read_ready_batch(self):
+        transport = self.datagram_transport(batch_size=3)
+
+        datagrams = [(b'data%d' % i, ('0.0.0.0', i)) for i in range(5)]
+        self.sock.recvfrom.side_effect = datagrams
+        transport._read_ready()
+        self.protocol.datagrams_received.assert_called_once_with(
+            datagrams[:3])
+        self.assertFalse(self.protocol.datagram_received.called)
+
+        # the socket is drained before the budget is exhausted
+        self.sock.recvfrom.side_effect = datagrams[3:] + [BlockingIOError]
+        transport._read_ready()
+        self.protocol.datagrams_received.assert_called_with(datagrams[3:])
+
+        self.protocol.datagrams_received.reset_mock()
+        self.sock.recvfrom.side_effect = BlockingIOError
+        transport._read_ready()
+        self.assertFalse(self.protocol.datagrams_received.called)
+
+    def test_read_ready_batch_oserr(self):
+        transport = self.datagram_transport(batch_size=3)
+
+        err = OSError()
+        self.sock.recvfrom.side_effect = [(b'data', ('0.0.0.0', 1)), err]
+        transport._fatal_error = mock.Mock()
+        transport._read_ready()
+
+        # the datagrams read before the error are not lost
+        self.protocol.datagrams_received.assert_called_with(
+            [(b'data', ('0.0.0.0', 1))])
+        self.protocol.error_received.assert_called_with(err)
+        self.assertFalse(transport._fatal_error.called)
+
+    def test_read_ready_batch_err(self):
+        transport = self.datagram_transport(batch_size=3)
+
+        err = RuntimeError()
+        self.sock.recvfrom.side_effect = [(b'data', ('0.0.0.0', 1)), err]
+        transport._fatal_error = mock.Mock()
+        transport._read_ready()
+
+        self.protocol.datagrams_received.assert_called_with(
+            [(b'data', ('0.0.0.0', 1))])
+        transport._fatal_error.assert_called_with(
+                                   err,
+                                   'Fatal read error on datagram transport')
+
+    def test_datagrams_received_default(self):
+        protocol = asyncio.DatagramProtocol()
+        protocol.datagram_received = mock.Mock()
+        protocol.datagrams_received([(b'a', 1), (b'b', 2)])
+        self.assertEqual([mock.call(b'a', 1), mock.call(b'b', 2)],
+                         protocol.datagram_received.call_args_list)
+
+    def test_sendto_batch(self):
+        transport = self.datagram_transport()
+        transport.sendto_batch([(b'data1', ('0.0.0.0', 1)),
+                                (b'', ('0.0.0.0', 2)),
+                                (bytearray(b'data3'), ('0.0.0.0', 3))])
+        self.assertEqual([mock.call(b'data1', ('0.0.0.0', 1)),
+                          mock.call(b'data3', ('0.0.0.0', 3))],
+                         self.sock.sendto.call_args_list)
+        self.assertFalse(transport._buffer)
+        self.assertFalse(self.loop.writers)
+
+    def test_sendto_batch_tryagain(self):
+        transport = self.datagram_transport()
+        self.sock.sendto.side_effect = [None, BlockingIOError]
+        transport.sendto_batch([(b'data1', ('0.0.0.0', 1)),
+                                (b'data2', ('0.0.0.0', 2)),
+                                (b'data3', ('0.0.0.0', 3))])
+        self.assertEqual(2, self.sock.sendto.call_count)
+        self.assertEqual([(b'data2', ('0.0.0.0', 2)),
+                          (b'data3', ('0.0.0.0', 3))],
+                         list(transport._buffer))
+        self.loop.assert_writer(7, transport._sendto_ready)
+
+    def test_write_buffer_size(self):
+        transport = self.datagram_transport()
+        self.sock.sendto.side_effect = BlockingIOError
+        transport.sendto(b'data1', ('0.0.0.0', 1))
+        transport.sendto(bytearray(b'data22'), ('0.0.0.0', 2))
+        transport.sendto_batch([(b'data333', ('0.0.0.0', 3))])
+        self.assertEqual(18, transport.get_write_buffer_size())
+
+        # the first datagram is sent, the second one is tried again
+        self.sock.sendto.side_effect = [None, BlockingIOError]
+        transport._sendto_ready()
+        self.assertEqual(13, transport.get_write_buffer_size())
+
+        self.sock.sendto.side_effect = None
+        transport._sendto_ready()
+        self.assertEqual(0, transport.get_write_buffer_size())
+
+    def test_write_buffer_size_force_close(self):
+        transport = self.datagram_transport()
+        self.sock.sendto.side_effect = BlockingIOError
+        transport.sendto(b'data', ('0.0.0.0', 1))
+        transport._force_close(None)
+        self.assertEqual(0, transport.get_write_buffer_size())
+
+    def test_sendto_batch_buffer(self):
+        transport = self.datagram_transport()
+        transport._buffer.append((b'data1', ('0.0.0.0', 1)))
+        transport.sendto_batch([(b'data2', ('0.0.0.0', 2))])
+        self.assertFalse(self.sock.sendto.called)
+        self.assertEqual(2, len(transport._buffer))
+
+    def test_sendto_batch_errors(self):
+        transport = self.datagram_transport(address=('0.0.0.0', 1))
+        self.assertRaises(TypeError, transport.sendto_batch,
+                          [(b'data', None), ('str', None)])
+        self.assertRaises(ValueError, transport.sendto_batch,
+                          [(b'data', ('0.0.0.0', 2))])
+        # nothing is buffered when a datagram is rejected
+        self.assertFalse(transport._buffer)
+        self.assertFalse(self.sock.send.called)
+
     def test_sendto(self):
         data = b'data'
         transport = self.datagram_transport()
@@ -357,6 +357,26 @@ class BaseSelectorTestCase(unittest.TestCase):
         self.assertLess(time() - t, 2.5)
 
 
+class ModifyInPlaceMixIn:
+
+    def test_modify_in_place(self):
+        s = self.SELECTOR()
+        self.addCleanup(s.close)
+        rd, wr = self.make_socketpair()
+
+        s.register(wr, selectors.EVENT_READ)
+        s.register = unittest.mock.Mock()
+        s.unregister = unittest.mock.Mock()
+
+        key = s.modify(wr, selectors.EVENT_WRITE, 'data')
+        self.assertFalse(s.register.called)
+        self.assertFalse(s.unregister.called)
+        self.assertEqual(key, s.get_key(wr))
+        self.assertEqual([(key, selectors.EVENT_WRITE)], s.select(0))
+
+        self.assertRaises(ValueError, s.modify, wr, 0)
+
+
 class ScalableSelectorMixIn:
 
     # see issue #18963 for why it's skipped on older OS X versions
@@ -415,17 +435,54 @@ class SelectSelectorTestCase(BaseSelectorTestCase):
 
 @unittest.skipUnless(hasattr(selectors, 'PollSelector'),
                      "Test needs selectors.PollSelector")
-class PollSelectorTestCase(BaseSelectorTestCase, ScalableSelectorMixIn):
+class PollSelectorTestCase(BaseSelectorTestCase, ScalableSelectorMixIn,
+                           ModifyInPlaceMixIn):
 
     SELECTOR = getattr(selectors, 'PollSelector', None)
 
 
 @unittest.skipUnless(hasattr(selectors, 'EpollSelector'),
                      "Test needs selectors.EpollSelector")
-class EpollSelectorTestCase(BaseSelectorTestCase, ScalableSelectorMixIn):
+class EpollSelectorTestCase(BaseSelectorTestCase, ScalableSelectorMixIn,
+                            ModifyInPlaceMixIn):
 
     SELECTOR = getattr(selectors, 'EpollSelector', None)
 
+    def test_edge_triggered(self):
+        s = self.SELECTOR()
+        self.addCleanup(s.close)
+        rd, wr = self.make_socketpair()
+
+        key = s.register(rd, selectors.EVENT_READ, 'data')
+        s.set_edge_triggered(rd)
+        self.assertEqual([], s.select(0))
+
+        wr.send(b'x')
+        self.assertEqual([(key, selectors.EVENT_READ)], s.select(0))
+        # the event is reported once, even if the data was not read
+        self.assertEqual([], s.select(0))
+        s.mark_ready(rd, selectors.EVENT_READ)
+        self.assertEqual([(key, selectors.EVENT_READ)], s.select(0))
+
+        # modify() doesn't make a system call; the socket was writable
+        # before the key asked for it
+        s._epoll = unittest.mock.Mock(wraps=s._epoll)
+        key = s.modify(rd, selectors.EVENT_READ | selectors.EVENT_WRITE,
+                       'data2')
+        self.assertFalse(s._epoll.modify.called)
+        self.assertEqual('data2', key.data)
+        self.assertEqual([(key, selectors.EVENT_WRITE)], s.select())
+
+        s.unregister(rd)
+        self.assertEqual({}, s._edge_pending)
+        self.assertEqual([], s.select(0))
+
+    def test_edge_triggered_not_registered(self):
+        s = self.SELECTOR()
+        self.addCleanup(s.close)
+        rd, wr = self.make_socketpair()
+        self.assertRaises(KeyError, s.set_edge_triggered, rd)
+
 
 @unittest.skipUnless(hasattr(selectors, 'KqueueSelector'),
                      "Test needs selectors.KqueueSelector)")
@@ -441,11 +498,48 @@ class DevpollSelectorTestCase(BaseSelectorTestCase, ScalableSelectorMixIn):
     SELECTOR = getattr(selectors, 'DevpollSelector', None)
 
 
+class FdKeyTableTests(unittest.TestCase):
+
+    def test_table(self):
+        table = selectors._FdKeyTable()
+        large_fd = selectors._FD_TABLE_LIMIT + 5
+        key1 = selectors.SelectorKey(None, 3, selectors.EVENT_READ, None)
+        key2 = selectors.SelectorKey(None, large_fd, selectors.EVENT_READ,
+                                     None)
+        table[3] = key1
+        table[large_fd] = key2
+        self.assertEqual(2, len(table))
+        self.assertIs(key1, table[3])
+        self.assertIs(key2, table[large_fd])
+        self.assertIn(3, table)
+        self.assertNotIn(2, table)
+        self.assertNotIn(100, table)
+        self.assertIsNone(table.get(2))
+        self.assertRaises(KeyError, table.__getitem__, 4)
+        self.assertEqual([3, large_fd], list(table))
+        self.assertLessEqual(len(table._keys), selectors._FD_TABLE_LIMIT)
+
+        # replacing a key doesn't change the length
+        table[3] = key1
+        self.assertEqual(2, len(table))
+
+        self.assertIs(key1, table.pop(3))
+        self.assertRaises(KeyError, table.pop, 3)
+        self.assertIs(key2, table.pop(large_fd))
+        self.assertEqual(0, len(table))
+        self.assertEqual([], list(table.values()))
+
+        table[1] = key1
+        table.clear()
+        self.assertEqual(0, len(table))
+        self.assertNotIn(1, table)
+
 
 def test_main():
     tests = [DefaultSelectorTestCase, SelectSelectorTestCase,
              PollSelectorTestCase, EpollSelectorTestCase,
-             KqueueSelectorTestCase, DevpollSelectorTestCase]
+             KqueueSelectorTestCase, DevpollSelectorTestCase,
+             FdKeyTableTests]
     support.run_unittest(*tests)
     support.reap_children()
 
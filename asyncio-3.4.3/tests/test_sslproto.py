@@ -1,5 +1,6 @@
 """Tests for asyncio/sslproto.py."""
 
+import os
 import unittest
 from unittest import mock
 try:
@@ -19,10 +20,11 @@ class SslProtoHandshakeTests(test_utils.TestCase):
         self.loop = asyncio.new_event_loop()
         self.set_event_loop(self.loop)
 
-    def ssl_protocol(self, waiter=None):
+    def ssl_protocol(self, waiter=None, **kwargs):
         sslcontext = test_utils.dummy_ssl_context()
         app_proto = asyncio.Protocol()
-        proto = sslproto.SSLProtocol(self.loop, app_proto, sslcontext, waiter)
+        proto = sslproto.SSLProtocol(self.loop, app_proto, sslcontext, waiter,
+                                     **kwargs)
         self.addCleanup(proto._app_transport.close)
         return proto
 
@@ -36,8 +38,10 @@ class SslProtoHandshakeTests(test_utils.TestCase):
             def mock_handshake(callback):
                 return []
             sslpipe.do_handshake.side_effect = mock_handshake
-        with mock.patch('asyncio.sslproto._SSLPipe', return_value=sslpipe):
+        with mock.patch('asyncio.sslproto._SSLPipe',
+                        return_value=sslpipe) as pipe_class:
             ssl_proto.connection_made(transport)
+        return pipe_class
 
     def test_cancel_handshake(self):
         # Python issue #23197: cancelling an handshake must not raise an
@@ -66,6 +70,264 @@ class SslProtoHandshakeTests(test_utils.TestCase):
         test_utils.run_briefly(self.loop)
         self.assertIsInstance(waiter.exception(), ConnectionResetError)
 
+    @unittest.skipUnless(hasattr(ssl, 'SSLSession'), 'No ssl.SSLSession')
+    def test_session_cache(self):
+        cache = sslproto.SSLSessionCache()
+        ssl_proto = self.ssl_protocol(server_hostname='example.com',
+                                      session_cache=cache)
+        key = (ssl_proto._sslcontext, 'example.com')
+        session = mock.Mock()
+        cache.put(key, session)
+
+        def do_handshake(callback):
+            sslobj.session_reused = True
+            callback(None)
+            return []
+
+        sslobj = mock.Mock()
+        sslobj.session = new_session = mock.Mock()
+        pipe_class = self.connection_made(ssl_proto, do_handshake)
+        pipe_class.return_value.ssl_object = sslobj
+        # the cached session is resumed
+        self.assertIs(session, pipe_class.call_args[1]['session'])
+        test_utils.run_briefly(self.loop)
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertIs(new_session, cache.get(key))
+
+    @unittest.skipUnless(hasattr(ssl, 'SSLSession'), 'No ssl.SSLSession')
+    def test_session_cache_handshake_failed(self):
+        cache = sslproto.SSLSessionCache()
+        waiter = asyncio.Future(loop=self.loop)
+        ssl_proto = self.ssl_protocol(waiter, server_hostname='example.com',
+                                      session_cache=cache)
+        key = (ssl_proto._sslcontext, 'example.com')
+        cache.put(key, mock.Mock())
+
+        def do_handshake(callback):
+            callback(ssl.SSLError())
+            return []
+
+        self.connection_made(ssl_proto, do_handshake)
+        test_utils.run_briefly(self.loop)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual((0, 0), (cache.hits, cache.misses))
+        self.assertIsInstance(waiter.exception(), ssl.SSLError)
+
+    def test_session_cache_server_side(self):
+        cache = sslproto.SSLSessionCache()
+        ssl_proto = self.ssl_protocol(server_side=True, session_cache=cache)
+        pipe_class = self.connection_made(ssl_proto)
+        self.assertIsNone(pipe_class.call_args[1]['session'])
+
+
+class SSLSessionCacheTests(unittest.TestCase):
+
+    def test_lru(self):
+        cache = sslproto.SSLSessionCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        # 'b' is the least recently used session
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(2, len(cache))
+
+        cache.put('a', 4)
+        self.assertEqual(4, cache.get('a'))
+        cache.discard('a')
+        cache.discard('a')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+    def test_maxsize(self):
+        self.assertRaises(ValueError, sslproto.SSLSessionCache, 0)
+
+
+@unittest.skipIf(ssl is None, 'No ssl module')
+class SslProtoWriteTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.set_event_loop(self.loop)
+
+        sslcontext = test_utils.dummy_ssl_context()
+        self.ssl_proto = sslproto.SSLProtocol(
+            self.loop, asyncio.Protocol(), sslcontext, None)
+        self.addCleanup(self.ssl_proto._app_transport.close)
+        self.transport = mock.Mock()
+        self.transport._paused = False
+        self.sslpipe = mock.Mock()
+        self.sslpipe.do_handshake.return_value = []
+        self.sslpipe.shutdown.return_value = []
+        self.blocked = False
+        self.written = []
+        self.sslpipe.feed_appdata.side_effect = self.feed_appdata
+        with mock.patch('asyncio.sslproto._SSLPipe',
+                        return_value=self.sslpipe):
+            self.ssl_proto.connection_made(self.transport)
+        test_utils.run_briefly(self.loop)
+
+    def feed_appdata(self, data, offset=0):
+        if self.blocked:
+            return ([], 0)
+        self.written.append(bytes(data))
+        return ([('record%d' % len(self.written)).encode()], len(data))
+
+    def test_write(self):
+        app_transport = self.ssl_proto._app_transport
+        app_transport.write(b'data')
+        self.assertEqual([b'data'], self.written)
+        self.transport.writelines.assert_called_with([b'record1'])
+        self.assertEqual(0, self.ssl_proto._write_buffer_size)
+
+    def test_write_backlog_batch(self):
+        app_transport = self.ssl_proto._app_transport
+        self.blocked = True
+        app_transport.write(b'a')
+        app_transport.write(b'b')
+        app_transport.writelines([b'c', b'', bytearray(b'd')])
+        self.assertEqual(4, self.ssl_proto._write_buffer_size)
+        self.assertEqual(4, len(self.ssl_proto._write_backlog))
+        self.assertFalse(self.transport.writelines.called)
+
+        self.blocked = False
+        self.ssl_proto._process_write_backlog()
+        # the short write is retried alone, the rest is joined
+        self.assertEqual([b'a', b'bcd'], self.written)
+        self.transport.writelines.assert_called_once_with(
+            [b'record1', b'record2'])
+        self.assertEqual(0, self.ssl_proto._write_buffer_size)
+        self.assertFalse(self.ssl_proto._write_backlog)
+
+    def test_write_backlog_large_buffers(self):
+        app_transport = self.ssl_proto._app_transport
+        self.blocked = True
+        big = b'x' * sslproto._WRITE_COALESCE_SIZE
+        app_transport.writelines([b'a', b'b', big, b'c'])
+
+        self.blocked = False
+        self.ssl_proto._process_write_backlog()
+        # small buffers are joined up to the size of a record
+        self.assertEqual([b'ab', big, b'c'], self.written)
+
+    def test_write_coalescing(self):
+        app_transport = self.ssl_proto._app_transport
+        app_transport.set_write_coalescing(True)
+        app_transport.write(b'a')
+        app_transport.writelines([b'b', b'c'])
+        self.assertFalse(self.written)
+
+        # the writes are encrypted together by the flush callback
+        test_utils.run_briefly(self.loop)
+        self.assertEqual([b'abc'], self.written)
+        self.transport.writelines.assert_called_once_with([b'record1'])
+
+        app_transport.write(b'd')
+        app_transport.flush()
+        self.assertEqual([b'abc', b'd'], self.written)
+        self.assertIsNone(self.ssl_proto._flush_handle)
+
+        # disabling coalescing flushes the buffered data
+        app_transport.write(b'e')
+        app_transport.set_write_coalescing(False)
+        self.assertEqual([b'abc', b'd', b'e'], self.written)
+        app_transport.write(b'f')
+        self.assertEqual([b'abc', b'd', b'e', b'f'], self.written)
+
+    def test_write_coalescing_close(self):
+        app_transport = self.ssl_proto._app_transport
+        app_transport.set_write_coalescing(True)
+        app_transport.write(b'data')
+        app_transport.close()
+        # the data is sent before the shutdown
+        self.assertEqual([b'data'], self.written)
+        self.assertTrue(self.sslpipe.shutdown.called)
+
+    def test_writelines_type_error(self):
+        app_transport = self.ssl_proto._app_transport
+        self.assertRaises(TypeError, app_transport.writelines,
+                          [b'data', 'str'])
+        self.assertFalse(self.ssl_proto._write_backlog)
+
+
+@unittest.skipIf(ssl is None or not sslproto._is_sslproto_available(),
+                 'No ssl.MemoryBIO')
+class SSLPipeTests(test_utils.TestCase):
+
+    def setUp(self):
+        here = os.path.dirname(__file__)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        server_context.load_cert_chain(os.path.join(here, 'ssl_cert.pem'),
+                                       os.path.join(here, 'ssl_key.pem'))
+        self.server_context = server_context
+        self.client_context = test_utils.dummy_ssl_context()
+        self.server, self.client = self.handshake()
+
+    def handshake(self, session=None):
+        server = sslproto._SSLPipe(self.server_context, True)
+        client = sslproto._SSLPipe(self.client_context, False,
+                                   session=session)
+
+        ssldata = client.do_handshake()
+        server.do_handshake()
+        while not (client.wrapped and server.wrapped):
+            ssldata, appdata = server.feed_ssldata(b''.join(ssldata))
+            self.assertEqual([], appdata)
+            ssldata, appdata = client.feed_ssldata(b''.join(ssldata))
+            self.assertEqual([], appdata)
+        if ssldata:
+            server.feed_ssldata(b''.join(ssldata))
+        return server, client
+
+    def send(self, *chunks):
+        ssldata = []
+        for chunk in chunks:
+            records, offset = self.client.feed_appdata(chunk)
+            self.assertEqual(len(chunk), offset)
+            ssldata.extend(records)
+        return b''.join(ssldata)
+
+    def test_feed_ssldata_single_chunk(self):
+        # the records of one read are returned as one chunk
+        data = self.send(b'abc', b'def', b'ghi')
+        ssldata, appdata = self.server.feed_ssldata(data)
+        self.assertEqual([b'abcdefghi'], appdata)
+
+        read_buffer = self.server._read_buffer
+        data = self.send(b'x' * 40000, b'y' * 10)
+        ssldata, appdata = self.server.feed_ssldata(data)
+        self.assertEqual([b'x' * 40000 + b'y' * 10], appdata)
+        # the read buffer grew and is reused
+        self.assertIs(read_buffer, self.server._read_buffer)
+        self.assertGreaterEqual(len(read_buffer), 40010)
+
+    def test_feed_ssldata_max_size(self):
+        self.server.max_size = 20000
+        data = self.send(b'x' * 50000)
+        ssldata, appdata = self.server.feed_ssldata(data)
+        self.assertEqual([20000, 20000, 10000], [len(chunk)
+                                                 for chunk in appdata])
+
+    def test_feed_ssldata_close_notify(self):
+        data = self.send(b'data')
+        data += b''.join(self.client.shutdown())
+        ssldata, appdata = self.server.feed_ssldata(data)
+        self.assertEqual([b'data', b''], appdata)
+
+    @unittest.skipUnless(hasattr(ssl, 'SSLSession'), 'No ssl.SSLSession')
+    def test_ssl_session(self):
+        # with TLS 1.3, the session ticket comes after the handshake
+        ssldata, offset = self.server.feed_appdata(b'data')
+        self.client.feed_ssldata(b''.join(ssldata))
+        session = self.client.ssl_object.session
+        self.assertFalse(self.client.ssl_object.session_reused)
+
+        server, client = self.handshake(session)
+        self.assertTrue(client.ssl_object.session_reused)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 import gc
 import os
 import socket
+import struct
 import sys
 import unittest
 from unittest import mock
@@ -12,6 +13,7 @@ except ImportError:
     ssl = None
 
 import asyncio
+from asyncio import streams
 from asyncio import test_utils
 
 
@@ -340,6 +342,298 @@ class StreamReaderTests(test_utils.TestCase):
             ValueError, self.loop.run_until_complete, stream.readline())
         self.assertEqual(b'', stream._buffer)
 
+    def test_readline_incremental_search(self):
+        # The buffer is searched for the separator only once, even if
+        # the line arrives in many chunks.
+        stream = asyncio.StreamReader(loop=self.loop)
+        offsets = []
+        find = streams._StreamBuffer.find
+
+        def spy_find(buf, sub, start=0):
+            offsets.append(start)
+            return find(buf, sub, start)
+
+        with mock.patch.object(streams._StreamBuffer, 'find', spy_find):
+            read_task = asyncio.Task(stream.readline(), loop=self.loop)
+            for chunk in (b'ab', b'cd', b'e\nf'):
+                stream.feed_data(chunk)
+                test_utils.run_briefly(self.loop)
+
+        self.assertEqual(b'abcde\n', read_task.result())
+        self.assertEqual([0, 2, 4], offsets)
+        self.assertEqual(b'f', stream._buffer)
+
+    def test_readline_buffer_compaction(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'a\n' * 3 + b'b' * 10)
+
+        line = self.loop.run_until_complete(stream.readline())
+        self.assertEqual(b'a\n', line)
+        # consumed data is not deleted from the front yet
+        self.assertEqual(2, stream._buffer._start)
+        self.assertEqual(b'a\na\n' + b'b' * 10, stream._buffer)
+
+        self.loop.run_until_complete(stream.readline())
+        self.loop.run_until_complete(stream.readline())
+        self.assertEqual(b'b' * 10, stream._buffer)
+
+        data = self.loop.run_until_complete(stream.read(5))
+        self.assertEqual(b'b' * 5, data)
+        # the consumed data is now larger than the remaining data
+        self.assertEqual(0, stream._buffer._start)
+        self.assertEqual(b'b' * 5, bytes(stream._buffer._buf))
+
+    def test_readlines_available(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        read_task = asyncio.Task(stream.readlines_available(),
+                                 loop=self.loop)
+
+        def cb():
+            stream.feed_data(b'line1\nli')
+            stream.feed_data(b'ne2\nline3\nline4')
+        self.loop.call_soon(cb)
+
+        lines = self.loop.run_until_complete(read_task)
+        self.assertEqual([b'line1\n', b'line2\n', b'line3\n'], lines)
+        self.assertEqual(b'line4', stream._buffer)
+
+        stream.feed_eof()
+        lines = self.loop.run_until_complete(stream.readlines_available())
+        self.assertEqual([b'line4'], lines)
+        lines = self.loop.run_until_complete(stream.readlines_available())
+        self.assertEqual([], lines)
+
+    def test_readlines_available_limit(self):
+        stream = asyncio.StreamReader(limit=7, loop=self.loop)
+        stream.feed_data(b'line1\nlong line2\nline3\n')
+
+        # the batch stops before the long line
+        lines = self.loop.run_until_complete(stream.readlines_available())
+        self.assertEqual([b'line1\n'], lines)
+        self.assertRaises(ValueError, self.loop.run_until_complete,
+                          stream.readlines_available())
+        lines = self.loop.run_until_complete(stream.readlines_available())
+        self.assertEqual([b'line3\n'], lines)
+
+    def test_readlines_available_resume_transport(self):
+        stream = asyncio.StreamReader(limit=4, loop=self.loop)
+        transport = mock.Mock()
+        stream.set_transport(transport)
+        stream.feed_data(b'ab\ncd\nef\n')
+        self.assertTrue(stream._paused)
+
+        lines = self.loop.run_until_complete(stream.readlines_available())
+        self.assertEqual([b'ab\n', b'cd\n', b'ef\n'], lines)
+        self.assertFalse(stream._paused)
+
+    @unittest.skipUnless(streams._PY352, 'requires Python 3.5.2')
+    def test_async_iterator(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'line1\nline2\nline3')
+        stream.feed_eof()
+
+        @asyncio.coroutine
+        def read_lines():
+            lines = []
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    line = yield from iterator.__anext__()
+                except StopAsyncIteration:
+                    return lines
+                lines.append(line)
+
+        lines = self.loop.run_until_complete(read_lines())
+        self.assertEqual([b'line1\n', b'line2\n', b'line3'], lines)
+
+    def test_readuntil_separator(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        with self.assertRaisesRegex(ValueError, 'Separator should be'):
+            self.loop.run_until_complete(stream.readuntil(separator=b''))
+        with self.assertRaisesRegex(ValueError, 'Separator should be'):
+            self.loop.run_until_complete(stream.readuntil(separator=()))
+        with self.assertRaisesRegex(ValueError, 'Separator should be'):
+            self.loop.run_until_complete(
+                stream.readuntil(separator=(b'a', b'')))
+
+    def test_readuntil_multi_chunks(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+
+        stream.feed_data(b'lineAAA')
+        data = self.loop.run_until_complete(stream.readuntil(separator=b'AAA'))
+        self.assertEqual(b'lineAAA', data)
+        self.assertEqual(b'', stream._buffer)
+
+        stream.feed_data(b'xxxAAAyyy')
+        data = self.loop.run_until_complete(stream.readuntil(b'AAA'))
+        self.assertEqual(b'xxxAAA', data)
+        self.assertEqual(b'yyy', stream._buffer)
+
+    def test_readuntil_split_separator(self):
+        # The separator arrives in several chunks
+        stream = asyncio.StreamReader(loop=self.loop)
+        read_task = asyncio.Task(stream.readuntil(b'\r\n\r\n'),
+                                 loop=self.loop)
+
+        def cb():
+            stream.feed_data(b'GET / HTTP/1.0\r')
+            stream.feed_data(b'\n\r')
+            stream.feed_data(b'\nbody')
+        self.loop.call_soon(cb)
+
+        data = self.loop.run_until_complete(read_task)
+        self.assertEqual(b'GET / HTTP/1.0\r\n\r\n', data)
+        self.assertEqual(b'body', stream._buffer)
+
+    def test_readuntil_multiple_separators(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'line1\r\nline2\nline3')
+
+        # the separator which ends first wins
+        separators = (b'\n', b'\r\n')
+        data = self.loop.run_until_complete(stream.readuntil(separators))
+        self.assertEqual(b'line1\r\n', data)
+        data = self.loop.run_until_complete(stream.readuntil(separators))
+        self.assertEqual(b'line2\n', data)
+
+        data = self.loop.run_until_complete(stream.readuntil((b'e', b'ne')))
+        self.assertEqual(b'line', data)
+        self.assertEqual(b'3', stream._buffer)
+
+    def test_readuntil_eof(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'some dataAA')
+        stream.feed_eof()
+
+        with self.assertRaises(asyncio.IncompleteReadError) as cm:
+            self.loop.run_until_complete(stream.readuntil(b'AAA'))
+        self.assertEqual(b'some dataAA', cm.exception.partial)
+        self.assertIsNone(cm.exception.expected)
+        self.assertEqual(b'', stream._buffer)
+
+    def test_readuntil_limit_found_sep(self):
+        stream = asyncio.StreamReader(loop=self.loop, limit=3)
+        stream.feed_data(b'some dataAA')
+
+        with self.assertRaisesRegex(asyncio.LimitOverrunError,
+                                    'not found'):
+            self.loop.run_until_complete(stream.readuntil(b'AAA'))
+        self.assertEqual(b'some dataAA', stream._buffer)
+
+        stream.feed_data(b'A')
+        with self.assertRaisesRegex(asyncio.LimitOverrunError,
+                                    'is found') as cm:
+            self.loop.run_until_complete(stream.readuntil(b'AAA'))
+        self.assertEqual(9, cm.exception.consumed)
+        # the data is left in the buffer
+        self.assertEqual(b'some dataAAA', stream._buffer)
+
+    def test_readuntil_resume_transport(self):
+        stream = asyncio.StreamReader(loop=self.loop, limit=4)
+        transport = mock.Mock()
+        stream.set_transport(transport)
+        stream.feed_data(b'abcd;wxyz')
+        self.assertTrue(stream._paused)
+
+        data = self.loop.run_until_complete(stream.readuntil(b';'))
+        self.assertEqual(b'abcd;', data)
+        self.assertFalse(stream._paused)
+        transport.resume_reading.assert_called_with()
+
+    def test_readframe(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        read_task = asyncio.Task(stream.readframe(struct.Struct('!H')),
+                                 loop=self.loop)
+        test_utils.run_briefly(self.loop)
+
+        stream.feed_data(b'\x00')
+        stream.feed_data(b'\x05he')
+        test_utils.run_briefly(self.loop)
+        # a single waiter for the whole frame
+        waiter = stream._waiter
+        self.assertIsNotNone(waiter)
+        stream.feed_data(b'll')
+        self.assertIs(waiter, stream._waiter)
+        self.assertFalse(waiter.done())
+        stream.feed_data(b'o\x00\x01')
+
+        body = self.loop.run_until_complete(read_task)
+        self.assertIsInstance(body, memoryview)
+        self.assertEqual(b'hello', body)
+        self.assertEqual(b'\x00\x01', stream._buffer)
+
+    def test_readframe_zero_copy(self):
+        # A body which ends the buffer is not copied
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'\x00\x00\x00\x04data')
+
+        body = self.loop.run_until_complete(stream.readframe('!I'))
+        self.assertEqual(b'data', body)
+        self.assertIsInstance(body.obj, bytearray)
+        self.assertEqual(b'', stream._buffer)
+
+        stream.feed_data(b'\x00\x00\x00\x00')
+        body = self.loop.run_until_complete(stream.readframe('!I'))
+        self.assertEqual(b'', body)
+
+    def test_readframe_eof(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'\x00\x04da')
+        stream.feed_eof()
+
+        with self.assertRaises(asyncio.IncompleteReadError) as cm:
+            self.loop.run_until_complete(stream.readframe('!H'))
+        self.assertEqual(b'\x00\x04da', cm.exception.partial)
+        self.assertEqual(6, cm.exception.expected)
+        self.assertEqual(b'', stream._buffer)
+
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'\x00')
+        stream.feed_eof()
+        with self.assertRaises(asyncio.IncompleteReadError) as cm:
+            self.loop.run_until_complete(stream.readframe('!H'))
+        self.assertEqual(b'\x00', cm.exception.partial)
+
+    def test_readframe_max_size(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'\x00\x04data')
+
+        with self.assertRaises(asyncio.LimitOverrunError) as cm:
+            self.loop.run_until_complete(
+                stream.readframe('!H', max_size=3))
+        self.assertEqual(6, cm.exception.consumed)
+        self.assertEqual(b'\x00\x04data', stream._buffer)
+
+    def test_readframe_max_size_default(self):
+        # the size of the frame comes from the peer: it is bounded by the
+        # limit of the stream unless max_size is given
+        stream = asyncio.StreamReader(limit=3, loop=self.loop)
+        stream.feed_data(b'\xff\xff\xff\xff')
+        with self.assertRaises(asyncio.LimitOverrunError) as cm:
+            self.loop.run_until_complete(stream.readframe('!I'))
+        self.assertEqual(4 + 0xffffffff, cm.exception.consumed)
+
+    def test_readframe_larger_than_limit(self):
+        # A frame larger than the pause limit must not stall the reader
+        stream = asyncio.StreamReader(loop=self.loop, limit=2)
+        transport = mock.Mock()
+        stream.set_transport(transport)
+        stream.feed_data(b'\x00\x0aabc')
+        self.assertTrue(stream._paused)
+
+        read_task = asyncio.Task(stream.readframe('!H', max_size=10),
+                                 loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        self.assertFalse(stream._paused)
+        transport.resume_reading.assert_called_with()
+
+        stream.feed_data(b'defgh')
+        self.assertFalse(stream._paused)
+        stream.feed_data(b'ij')
+        body = self.loop.run_until_complete(read_task)
+        self.assertEqual(b'abcdefghij', body)
+        self.assertFalse(stream._paused)
+
     def test_readexactly_zero_or_less(self):
         # Read exact number of bytes (zero or less).
         stream = asyncio.StreamReader(loop=self.loop)
@@ -400,6 +694,80 @@ class StreamReaderTests(test_utils.TestCase):
         self.assertRaises(
             ValueError, self.loop.run_until_complete, stream.readexactly(2))
 
+    def test_readexactly_larger_than_limit(self):
+        stream = asyncio.StreamReader(loop=self.loop, limit=4)
+        transport = mock.Mock()
+        stream.set_transport(transport)
+        read_task = asyncio.Task(stream.readexactly(20), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+
+        for i in range(4):
+            stream.feed_data(b'x' * 4)
+            # neither wake up nor pause before the 20 bytes are there
+            self.assertFalse(stream._paused)
+            self.assertIsNotNone(stream._waiter)
+        stream.feed_data(b'x' * 6)
+
+        data = self.loop.run_until_complete(read_task)
+        self.assertEqual(b'x' * 20, data)
+        self.assertEqual(b'xx', stream._buffer)
+        self.assertFalse(stream._paused)
+
+    def test_readinto(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'chunk1')
+        buffer = bytearray(10)
+        read_task = asyncio.Task(stream.readinto(buffer), loop=self.loop)
+        test_utils.run_briefly(self.loop)
+        self.assertEqual(b'chunk1\0\0\0\0', buffer)
+
+        def cb():
+            stream.feed_data(b'chu')
+            stream.feed_data(b'nk2')
+        self.loop.call_soon(cb)
+
+        n = self.loop.run_until_complete(read_task)
+        self.assertEqual(10, n)
+        self.assertEqual(b'chunk1chun', buffer)
+        self.assertEqual(b'k2', stream._buffer)
+
+    def test_readinto_eof(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.feed_data(b'data')
+        stream.feed_eof()
+        buffer = bytearray(8)
+
+        with self.assertRaises(asyncio.IncompleteReadError) as cm:
+            self.loop.run_until_complete(stream.readinto(buffer))
+        self.assertEqual(b'data', cm.exception.partial)
+        self.assertEqual(8, cm.exception.expected)
+        self.assertEqual(b'data\0\0\0\0', buffer)
+
+    def test_readinto_flow_control(self):
+        # Reading into a buffer larger than the pause limit
+        stream = asyncio.StreamReader(loop=self.loop, limit=2)
+        transport = mock.Mock()
+        stream.set_transport(transport)
+        buffer = bytearray(12)
+        read_task = asyncio.Task(stream.readinto(buffer), loop=self.loop)
+
+        for data in (b'abcdef', b'ghijkl'):
+            stream.feed_data(data)
+            self.assertTrue(stream._paused)
+            test_utils.run_briefly(self.loop)
+            self.assertFalse(stream._paused)
+
+        self.assertEqual(12, self.loop.run_until_complete(read_task))
+        self.assertEqual(b'abcdefghijkl', buffer)
+        self.assertEqual(2, transport.resume_reading.call_count)
+
+    def test_readinto_exception(self):
+        stream = asyncio.StreamReader(loop=self.loop)
+        stream.set_exception(ValueError())
+        self.assertRaises(
+            ValueError, self.loop.run_until_complete,
+            stream.readinto(bytearray(2)))
+
     def test_exception(self):
         stream = asyncio.StreamReader(loop=self.loop)
         self.assertIsNone(stream.exception())
@@ -617,6 +985,95 @@ os.close(fd)
         data = self.loop.run_until_complete(reader.read(-1))
         self.assertEqual(data, b'data')
 
+    def test_write_coalescing(self):
+        rsock, wsock = test_utils.socketpair()
+        self.addCleanup(rsock.close)
+        reader, writer = self.loop.run_until_complete(
+            asyncio.open_connection(sock=wsock, loop=self.loop))
+
+        rsock.setblocking(False)
+        writer.set_write_coalescing(True)
+        for i in range(20):
+            writer.write(b'x')
+        # nothing is sent before the flush callback runs or drain()
+        self.assertRaises(BlockingIOError, rsock.recv, 100)
+        self.assertEqual(20, writer.transport.get_write_buffer_size())
+        self.loop.run_until_complete(writer.drain())
+        self.assertEqual(0, writer.transport.get_write_buffer_size())
+
+        self.assertEqual(b'x' * 20, rsock.recv(100))
+        writer.close()
+        test_utils.run_briefly(self.loop)
+
+    def test_drain_flushes_coalesced_writes(self):
+        transport = mock.Mock()
+        protocol = asyncio.StreamReaderProtocol(
+            asyncio.StreamReader(loop=self.loop), loop=self.loop)
+        writer = asyncio.StreamWriter(transport, protocol, None, self.loop)
+
+        self.loop.run_until_complete(writer.drain())
+        self.assertFalse(transport.flush.called)
+
+        writer.set_write_coalescing(True)
+        transport.set_write_coalescing.assert_called_with(True)
+        self.loop.run_until_complete(writer.drain())
+        transport.flush.assert_called_with()
+
+    def test_drain_not_paused(self):
+        protocol = asyncio.StreamReaderProtocol(
+            asyncio.StreamReader(loop=self.loop), loop=self.loop)
+        writer = asyncio.StreamWriter(mock.Mock(), protocol, None, self.loop)
+
+        with mock.patch.object(protocol, '_drain_helper') as helper:
+            self.loop.run_until_complete(writer.drain())
+        self.assertFalse(helper.called)
+
+    def test_drain_shared_waiter(self):
+        protocol = asyncio.StreamReaderProtocol(
+            asyncio.StreamReader(loop=self.loop), loop=self.loop)
+        writer = asyncio.StreamWriter(mock.Mock(), protocol, None, self.loop)
+        protocol.pause_writing()
+
+        drains = [asyncio.Task(writer.drain(), loop=self.loop)
+                  for i in range(3)]
+        test_utils.run_briefly(self.loop)
+        waiter = protocol._drain_waiter
+        self.assertIsNotNone(waiter)
+
+        # cancelling a task does not cancel the shared waiter
+        drains[0].cancel()
+        test_utils.run_briefly(self.loop)
+        self.assertTrue(drains[0].cancelled())
+        self.assertFalse(waiter.cancelled())
+        self.assertFalse(drains[1].done())
+
+        drains.append(asyncio.Task(writer.drain(), loop=self.loop))
+        test_utils.run_briefly(self.loop)
+        self.assertIs(waiter, protocol._drain_waiter)
+
+        protocol.resume_writing()
+        self.loop.run_until_complete(asyncio.wait(drains[1:], loop=self.loop))
+        for task in drains[1:]:
+            self.assertIsNone(task.result())
+
+    def test_drain_connection_lost(self):
+        protocol = asyncio.StreamReaderProtocol(
+            asyncio.StreamReader(loop=self.loop), loop=self.loop)
+        writer = asyncio.StreamWriter(mock.Mock(), protocol, None, self.loop)
+        protocol.pause_writing()
+
+        drains = [asyncio.Task(writer.drain(), loop=self.loop)
+                  for i in range(2)]
+        test_utils.run_briefly(self.loop)
+        exc = ConnectionResetError()
+        protocol.connection_lost(exc)
+        self.loop.run_until_complete(asyncio.wait(drains, loop=self.loop))
+        for task in drains:
+            self.assertIs(exc, task.exception())
+
+        self.assertRaises(ConnectionResetError,
+                          self.loop.run_until_complete, writer.drain())
+
     def test_streamreader_constructor(self):
         self.addCleanup(asyncio.set_event_loop, None)
         asyncio.set_event_loop(self.loop)
@@ -626,6 +1083,50 @@ os.close(fd)
         reader = asyncio.StreamReader()
         self.assertIs(reader._loop, self.loop)
 
+    def test_streamreaderprotocol_get_buffer(self):
+        reader = asyncio.StreamReader(limit=8, loop=self.loop)
+        protocol = asyncio.StreamReaderProtocol(reader, loop=self.loop)
+
+        # the transport receives into the spare room of the reader buffer,
+        # at most the limit
+        buf = protocol.get_buffer(1024)
+        self.assertEqual(8, len(buf))
+        buf[:3] = b'abc'
+        protocol.buffer_updated(3)
+        buf = protocol.get_buffer(2)
+        self.assertEqual(2, len(buf))
+        buf[:2] = b'de'
+        protocol.buffer_updated(2)
+        self.assertEqual(b'abcde', reader._buffer)
+
+        storage = reader._buffer._buf
+        data = self.loop.run_until_complete(reader.read(5))
+        self.assertEqual(b'abcde', data)
+        # the storage is kept for the next reads
+        buf = protocol.get_buffer(1024)
+        self.assertIs(storage, buf.obj)
+        buf[:1] = b'\n'
+        protocol.buffer_updated(1)
+        data = self.loop.run_until_complete(reader.readline())
+        self.assertEqual(b'\n', data)
+
+    def test_streamreaderprotocol_recv_into(self):
+        rsock, wsock = test_utils.socketpair()
+        self.addCleanup(wsock.close)
+        reader, writer = self.loop.run_until_complete(
+            asyncio.open_connection(sock=rsock, loop=self.loop))
+        transport = writer.transport
+        self.assertEqual(transport._read_ready__get_buffer,
+                         transport._read_ready_cb)
+
+        wsock.sendall(b'line1\nline2\n')
+        data = self.loop.run_until_complete(reader.readline())
+        self.assertEqual(b'line1\n', data)
+        data = self.loop.run_until_complete(reader.readline())
+        self.assertEqual(b'line2\n', data)
+        writer.close()
+        test_utils.run_briefly(self.loop)
+
     def test_streamreaderprotocol_constructor(self):
         self.addCleanup(asyncio.set_event_loop, None)
         asyncio.set_event_loop(self.loop)
@@ -0,0 +1,244 @@
+"""Tests for timers.py."""
+
+import collections
+import random
+import unittest
+
+import asyncio
+from asyncio import test_utils
+from asyncio import timers
+
+
+def cb():
+    pass
+
+
+class TimerHeapTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.loop = self.new_test_loop()
+        self.store = timers.TimerHeap()
+
+    def test_push_pop_due(self):
+        h1 = asyncio.TimerHandle(2.0, cb, (), self.loop)
+        h2 = asyncio.TimerHandle(1.0, cb, (), self.loop)
+        self.store.push(h1)
+        self.store.push(h2)
+        self.assertTrue(h1._scheduled)
+        self.assertEqual(1.0, self.store.next_when())
+
+        ready = collections.deque()
+        self.assertEqual((1, 1.0), self.store.pop_due(1.5, ready))
+        self.assertEqual([h2], list(ready))
+        self.assertEqual((0, None), self.store.pop_due(1.5, ready))
+        self.assertFalse(h2._scheduled)
+        self.assertEqual([h1], self.store)
+
+    def test_next_when_drops_cancelled_head(self):
+        h1 = asyncio.TimerHandle(1.0, cb, (), self.loop)
+        h2 = asyncio.TimerHandle(2.0, cb, (), self.loop)
+        self.store.push(h1)
+        self.store.push(h2)
+        h1.cancel()
+        self.store.timer_cancelled(h1)
+        self.assertEqual(2.0, self.store.next_when())
+        self.assertEqual([h2], self.store)
+        self.assertEqual(0, self.store._cancelled_count)
+
+    def test_next_when_empty(self):
+        self.assertIsNone(self.store.next_when())
+
+
+class TimerWheelTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.loop = self.new_test_loop()
+        self.store = timers.TimerWheel(resolution=0.01, slots=4, levels=2)
+
+    def pop_due(self, end_time):
+        ready = collections.deque()
+        self.store.pop_due(end_time, ready)
+        return list(ready)
+
+    def test_ctor_errors(self):
+        self.assertRaises(ValueError, timers.TimerWheel, resolution=0)
+        self.assertRaises(ValueError, timers.TimerWheel, slots=6)
+        self.assertRaises(ValueError, timers.TimerWheel, levels=0)
+
+    def test_push_pop_due(self):
+        h1 = asyncio.TimerHandle(0.025, cb, (), self.loop)
+        h2 = asyncio.TimerHandle(0.021, cb, (), self.loop)
+        self.store.push(h1)
+        self.store.push(h2)
+        self.assertEqual(2, len(self.store))
+        self.assertIn(h1, self.store)
+        self.assertTrue(h1._scheduled)
+
+        # the tick [0.02, 0.03) is not over yet
+        self.assertEqual([], self.pop_due(0.029))
+        self.assertAlmostEqual(0.03, self.store.next_when())
+
+        # handles of a tick are returned in the order of their deadline
+        ready = collections.deque()
+        self.assertEqual((2, 0.021), self.store.pop_due(0.03, ready))
+        self.assertEqual([h2, h1], list(ready))
+        self.assertFalse(h1._scheduled)
+        self.assertEqual(0, len(self.store))
+        self.assertIsNone(self.store.next_when())
+
+    def test_past_deadline(self):
+        self.loop.advance_time(1.0)
+        h = asyncio.TimerHandle(0.5, cb, (), self.loop)
+        self.store.push(h)
+        self.assertAlmostEqual(1.01, self.store.next_when())
+        self.assertEqual([h], self.pop_due(1.01))
+
+    def test_cancel(self):
+        h1 = asyncio.TimerHandle(0.015, cb, (), self.loop)
+        h2 = asyncio.TimerHandle(0.015, cb, (), self.loop)
+        self.assertEqual(h1, h2)
+        self.store.push(h1)
+        self.store.push(h2)
+        self.store.timer_cancelled(h1)
+        self.assertFalse(h1._scheduled)
+        self.assertNotIn(h1, self.store)
+        self.assertEqual([h2], list(self.store))
+        self.assertEqual([h2], self.pop_due(1.0))
+
+    def test_cascade_and_overflow(self):
+        # 4 slots and 2 levels: level 0 spans 4 ticks, level 1 spans 16
+        # ticks, later timers wait in the overflow slot.
+        handles = [asyncio.TimerHandle(when, cb, (), self.loop)
+                   for when in (0.035, 0.125, 0.505, 0.015)]
+        for handle in handles:
+            self.store.push(handle)
+        self.assertEqual([1, 1, 1], [self.store._counts[0] - 1,
+                                     self.store._counts[1],
+                                     self.store._counts[2]])
+
+        self.assertEqual([handles[3]], self.pop_due(0.02))
+        self.assertEqual([handles[0]], self.pop_due(0.1))
+        self.assertEqual([], self.pop_due(0.12))
+        self.assertEqual([handles[1]], self.pop_due(0.13))
+        self.assertEqual([handles[2]], self.pop_due(10.0))
+        self.assertEqual(0, len(self.store))
+        self.assertEqual([0, 0, 0], self.store._counts)
+
+    def test_next_when_upper_level(self):
+        h = asyncio.TimerHandle(0.125, cb, (), self.loop)
+        self.store.push(h)
+        # the loop must wake up when the timer moves down to level 0
+        self.assertAlmostEqual(0.13, self.store.next_when())
+        self.assertEqual([], self.pop_due(0.121))
+        self.assertAlmostEqual(0.13, self.store.next_when())
+        self.assertEqual([h], self.pop_due(0.13))
+
+        h = asyncio.TimerHandle(0.5, cb, (), self.loop)
+        self.store.push(h)
+        # the overflow slot is checked when the top wheel turns around
+        self.assertAlmostEqual(0.17, self.store.next_when())
+
+    def test_next_when_pending_upper_slot(self):
+        # pop_due() stops on the first tick of a level 1 slot: the timers
+        # of this slot have not moved down yet.
+        x = asyncio.TimerHandle(0.065, cb, (), self.loop)
+        self.store.push(x)
+        self.assertEqual([], self.pop_due(0.04))
+        y = asyncio.TimerHandle(0.075, cb, (), self.loop)
+        self.store.push(y)
+        self.assertAlmostEqual(0.05, self.store.next_when())
+        self.assertEqual([], self.pop_due(0.05))
+        self.assertAlmostEqual(0.07, self.store.next_when())
+        self.assertEqual([x], self.pop_due(0.07))
+        self.assertEqual([y], self.pop_due(0.08))
+
+    def test_random_deadlines(self):
+        rnd = random.Random(0)
+        handles = [asyncio.TimerHandle(rnd.uniform(0, 2.0), cb, (), self.loop)
+                   for i in range(500)]
+        for handle in handles:
+            self.store.push(handle)
+        for handle in handles[::3]:
+            handle.cancel()
+            self.store.timer_cancelled(handle)
+
+        fired = []
+        now = 0.0
+        while self.store.next_when() is not None:
+            now = self.store.next_when()
+            due = self.pop_due(now)
+            for handle in due:
+                # never early, at most one tick late
+                self.assertLessEqual(handle._when, now)
+                self.assertLess(now - handle._when, 0.01 + 1e-9)
+            fired.extend(due)
+
+        expected = sorted((h for h in handles if not h._cancelled),
+                          key=lambda h: h._when)
+        self.assertEqual([id(h) for h in expected], [id(h) for h in fired])
+
+    def test_push_resyncs_empty_wheel(self):
+        h = asyncio.TimerHandle(0.015, cb, (), self.loop)
+        self.store.push(h)
+        self.assertEqual([h], self.pop_due(0.02))
+        self.assertEqual(2, self.store._tick)
+
+        # the loop was idle: pop_due() did not run since the wheel emptied
+        self.loop.advance_time(100.0)
+        h = asyncio.TimerHandle(100.015, cb, (), self.loop)
+        self.store.push(h)
+        self.assertEqual(10000, self.store._tick)
+        self.assertEqual(1, self.store._counts[0])
+        self.assertAlmostEqual(100.02, self.store.next_when())
+        self.assertEqual([h], self.pop_due(100.02))
+
+    def test_push_after_cancel_all(self):
+        h = asyncio.TimerHandle(0.015, cb, (), self.loop)
+        self.store.push(h)
+        self.assertAlmostEqual(0.02, self.store.next_when())
+        self.store.timer_cancelled(h)
+
+        # the wakeup of the cancelled timer is forgotten
+        h = asyncio.TimerHandle(0.035, cb, (), self.loop)
+        self.store.push(h)
+        self.assertAlmostEqual(0.04, self.store.next_when())
+
+    def test_clear(self):
+        h = asyncio.TimerHandle(0.5, cb, (), self.loop)
+        self.store.push(h)
+        self.store.clear()
+        self.assertEqual(0, len(self.store))
+        self.assertIsNone(self.store.next_when())
+
+
+class TimerWheelLoopTests(test_utils.TestCase):
+
+    def test_call_later(self):
+        def gen():
+            when = yield
+            self.assertAlmostEqual(0.1, when)
+            when = yield 0
+            self.assertAlmostEqual(0.15, when)
+            when = yield 0
+            self.assertAlmostEqual(0.2, when)
+            yield 0.3
+
+        loop = self.new_test_loop(gen)
+        loop.set_timer_store(timers.TimerWheel())
+
+        calls = []
+        loop.call_later(0.1, calls.append, 1)
+        handle = loop.call_later(0.15, calls.append, 2)
+        loop.call_later(0.2, calls.append, 3)
+        handle.cancel()
+        self.assertEqual(2, len(loop._scheduled))
+
+        loop._run_once()
+        self.assertEqual([], calls)
+        loop._run_once()
+        self.assertEqual([1, 3], calls)
+        self.assertEqual(0, len(loop._scheduled))
+
+
+if __name__ == '__main__':
+    unittest.main()
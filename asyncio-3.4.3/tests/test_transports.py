@@ -37,6 +37,9 @@ class TransportTests(unittest.TestCase):
         self.assertRaises(NotImplementedError,
                           transport.set_write_buffer_limits)
         self.assertRaises(NotImplementedError, transport.get_write_buffer_size)
+        self.assertRaises(NotImplementedError,
+                          transport.set_write_coalescing, True)
+        self.assertRaises(NotImplementedError, transport.flush)
         self.assertRaises(NotImplementedError, transport.write, 'data')
         self.assertRaises(NotImplementedError, transport.write_eof)
         self.assertRaises(NotImplementedError, transport.can_write_eof)
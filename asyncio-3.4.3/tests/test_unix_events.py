@@ -4,6 +4,7 @@ import collections
 import errno
 import io
 import os
+import select
 import signal
 import socket
 import stat
@@ -21,6 +22,10 @@ import asyncio
 from asyncio import log
 from asyncio import test_utils
 from asyncio import unix_events
+try:
+    from test import support
+except ImportError:
+    from asyncio import test_support as support
 
 
 MOCK_ANY = mock.ANY
@@ -36,6 +41,42 @@ def close_pipe_transport(transport):
 
 
 @unittest.skipUnless(signal, 'Signals are not supported')
+@unittest.skipUnless(sys.platform.startswith('linux'), 'need eventfd')
+class SelectorEventLoopEventfdTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.SelectorEventLoop()
+        self.set_event_loop(self.loop)
+
+    def test_make_eventfd(self):
+        fd = unix_events._make_eventfd()
+        self.addCleanup(os.close, fd)
+        os.write(fd, unix_events._EVENTFD_ONE)
+        os.write(fd, unix_events._EVENTFD_ONE)
+        # the counter is read and reset at once
+        self.assertEqual((2).to_bytes(8, sys.byteorder), os.read(fd, 8))
+        self.assertRaises(BlockingIOError, os.read, fd, 8)
+        self.assertFalse(os.get_inheritable(fd))
+
+    def test_wakeup(self):
+        self.assertIsNotNone(self.loop._eventfd)
+        self.loop._write_to_self()
+        self.loop._write_to_self()
+        self.assertTrue(self.loop._self_pipe_pending)
+
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        self.assertFalse(self.loop._self_pipe_pending)
+
+    def test_close(self):
+        efd = self.loop._eventfd
+        self.loop.close()
+        self.assertTrue(efd.closed)
+        self.assertIsNone(self.loop._eventfd)
+        # a late wakeup from another thread is ignored
+        self.loop._write_to_self()
+
+
 class SelectorEventLoopSignalTests(test_utils.TestCase):
 
     def setUp(self):
@@ -228,6 +269,87 @@ class SelectorEventLoopSignalTests(test_utils.TestCase):
         m_signal.set_wakeup_fd.assert_called_once_with(-1)
 
 
+class EchoProtocol(asyncio.Protocol):
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+
+@unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'),
+                     'SO_REUSEPORT is not supported')
+class ServerSupervisorTests(test_utils.TestCase):
+
+    def setUp(self):
+        self.port = support.find_unused_port()
+
+    def test_ctor_errors(self):
+        self.assertRaises(ValueError, asyncio.ServerSupervisor,
+                          EchoProtocol, '127.0.0.1', 0)
+        self.assertRaises(ValueError, asyncio.ServerSupervisor,
+                          EchoProtocol, '127.0.0.1', self.port, workers=0)
+
+    def test_serve(self):
+        supervisor = asyncio.ServerSupervisor(EchoProtocol, '127.0.0.1',
+                                              self.port, workers=2)
+        supervisor.start()
+        self.addCleanup(supervisor.stop, timeout=5)
+        self.assertEqual(2, len(supervisor.get_pids()))
+        self.assertRaises(RuntimeError, supervisor.start)
+
+        for i in range(4):
+            with socket.create_connection(('127.0.0.1', self.port)) as sock:
+                sock.sendall(b'ping')
+                self.assertEqual(b'ping', sock.recv(4))
+
+        stats = supervisor.get_stats()
+        self.assertEqual(2, stats['workers'])
+        self.assertGreater(stats['callbacks'], 0)
+
+        supervisor.stop(timeout=5)
+        self.assertEqual([], supervisor.get_pids())
+        stats = supervisor.get_stats()
+        self.assertEqual(2, stats['workers'])
+        self.assertGreater(stats['iterations'], 0)
+
+    def test_get_stats_timeout(self):
+        supervisor = asyncio.ServerSupervisor(EchoProtocol, '127.0.0.1',
+                                              self.port, workers=2)
+        supervisor.start()
+        self.addCleanup(supervisor.stop, timeout=5)
+        pid = supervisor.get_pids()[0]
+
+        os.kill(pid, signal.SIGSTOP)
+        try:
+            stats = supervisor.get_stats(timeout=0.5)
+        finally:
+            os.kill(pid, signal.SIGCONT)
+        self.assertEqual(1, stats['workers'])
+
+        # wait for the late answer of the stopped worker: it must not be
+        # taken for the answer to the next request
+        pipe = supervisor._workers[pid]
+        self.assertTrue(select.select([pipe], [], [], 5)[0])
+        stats = supervisor.get_stats(timeout=5)
+        self.assertEqual(2, stats['workers'])
+        self.assertEqual(dict.fromkeys(supervisor.get_pids(), 0),
+                         supervisor._stats_pending)
+
+    def test_start_error(self):
+        # a socket without SO_REUSEPORT holds the port
+        sock = socket.socket()
+        self.addCleanup(sock.close)
+        sock.bind(('127.0.0.1', self.port))
+        sock.listen(1)
+
+        supervisor = asyncio.ServerSupervisor(EchoProtocol, '127.0.0.1',
+                                              self.port, workers=2)
+        self.assertRaises(RuntimeError, supervisor.start)
+        self.assertEqual([], supervisor.get_pids())
+
+
 @unittest.skipUnless(hasattr(socket, 'AF_UNIX'),
                      'UNIX Sockets are not supported')
 class SelectorEventLoopUnixSocketTests(test_utils.TestCase):